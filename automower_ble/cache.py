@@ -0,0 +1,127 @@
+"""
+A read-through cache for the results of Get commands
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import time
+from typing import Any
+
+# Commands starting with one of these change the mower, so any cached
+# result from the same protocol major group can be stale afterwards
+MUTATING_PREFIXES = (
+    "Set",
+    "Start",
+    "Stop",
+    "Clear",
+    "Add",
+    "Delete",
+    "Commit",
+    "Reset",
+    "Pause",
+    "Prepare",
+    "Generate",
+    "Enter",
+)
+
+# Suggested TTLs, in seconds, for settings that rarely change
+SETTINGS_CACHE_TTLS = {
+    "GetSerialNumber": 3600.0,
+    "GetModel": 3600.0,
+    "GetCuttingHeight": 300.0,
+    "GetFrostSensorEnabled": 300.0,
+    "GetAllDrivingSettings": 300.0,
+    "GetStartingPoint": 300.0,
+    "GetGarageEnabled": 300.0,
+}
+
+
+def is_mutating(command_name: str) -> bool:
+    return command_name.startswith(MUTATING_PREFIXES)
+
+
+class CommandCache:
+    """
+    Cache parsed command results for a per command TTL.
+
+    Only commands with a TTL in `ttls` are cached. Sending a mutating
+    command with `invalidate()` drops every cached result in the same
+    protocol major group, for example SetCuttingHeight drops
+    GetCuttingHeight as both are in group 4422.
+
+    Every invalidation also moves the group to a new generation. A caller
+    takes `generation()` before sending a command and passes it to `put()`,
+    so a result read before a mutating command changed the group isn't
+    cached when its response arrives afterwards.
+    """
+
+    def __init__(self, ttls: dict[str, float] | None = None):
+        self.ttls = dict(ttls or {})
+        # (command_name, parameters) -> (major, expiry time, value)
+        self._entries: dict[tuple[str, tuple], tuple[int, float, Any]] = {}
+        # major -> number of invalidations of the group
+        self._generations: dict[int, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(command_name: str, kwargs: dict) -> tuple[str, tuple]:
+        return (command_name, tuple(sorted(kwargs.items())))
+
+    def get(self, command_name: str, kwargs: dict) -> tuple[bool, Any]:
+        """Return (True, value) for a fresh cached result, else (False, None)"""
+        if command_name not in self.ttls:
+            return False, None
+
+        entry = self._entries.get(self._key(command_name, kwargs))
+        if entry is None or entry[1] <= time.monotonic():
+            self.misses += 1
+            return False, None
+
+        self.hits += 1
+        value = entry[2]
+        # Callers are free to modify the result they get back
+        return True, dict(value) if isinstance(value, dict) else value
+
+    def generation(self, major: int) -> int:
+        """The current generation of the protocol major group"""
+        return self._generations.get(major, 0)
+
+    def put(
+        self,
+        command_name: str,
+        kwargs: dict,
+        major: int,
+        value: Any,
+        generation: int | None = None,
+    ) -> None:
+        """
+        Cache `value`, unless `generation` is given and the group was
+        invalidated since, as the value can then already be stale
+        """
+        ttl = self.ttls.get(command_name)
+        if ttl is None:
+            return
+        if generation is not None and generation != self.generation(major):
+            return
+        self._entries[self._key(command_name, kwargs)] = (
+            major,
+            time.monotonic() + ttl,
+            dict(value) if isinstance(value, dict) else value,
+        )
+
+    def invalidate(self, major: int) -> None:
+        """Drop every cached result of the protocol major group"""
+        self._generations[major] = self.generation(major) + 1
+        stale = [key for key, entry in self._entries.items() if entry[0] == major]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,342 @@
+"""
+Decode the mower protocol from Bluetooth HCI captures, such as the
+btsnoop_hci.log of an Android phone, without Wireshark.
+
+    python -m automower_ble.capture btsnoop_hci.log
+
+btsnoop files and pcap files with H4 link layers (LINKTYPE_BLUETOOTH_HCI_H4
+and LINKTYPE_BLUETOOTH_HCI_H4_WITH_PHDR) are supported. Frames are
+reassembled with `FrameReassembler` and decoded with the commands in
+protocol.json, so this always matches what the library sends.
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import argparse
+import contextlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from importlib.resources import files
+from pathlib import Path
+
+from .protocol import Command, ResponseResult, _frame_id
+from .reassembler import FrameReassembler
+
+BTSNOOP_MAGIC = b"btsnoop\x00"
+# btsnoop timestamps are microseconds since 0000-01-01
+BTSNOOP_EPOCH_OFFSET = 0x00DCDDB30F2F8000
+BTSNOOP_H1 = 1001
+BTSNOOP_H4 = 1002
+PCAP_H4 = 187
+PCAP_H4_WITH_PHDR = 201
+
+H4_ACL = 0x02
+L2CAP_ATT_CID = 0x0004
+ATT_WRITE_REQUEST = 0x12
+ATT_WRITE_COMMAND = 0x52
+ATT_NOTIFICATION = 0x1B
+ATT_INDICATION = 0x1D
+
+SENT = 0  # Host to mower
+RECEIVED = 1  # Mower to host
+
+_BTSNOOP_RECORD = struct.Struct(">IIIIq")
+_ACL_HEADER = struct.Struct("<HH")
+_L2CAP_HEADER = struct.Struct("<HH")
+
+PACKET_TYPES = {0x00: "request", 0x01: "response", 0x02: "event"}
+
+
+@dataclass
+class CaptureRecord:
+    """A decoded protocol frame from a capture"""
+
+    timestamp: float  # Unix time
+    connection: int  # HCI connection handle
+    packet_type: str  # "request", "response", "event" or "setup"
+    channel_id: int
+    command_id: tuple[int, int] | None
+    name: str | None
+    result: str | None  # Responses only
+    data: dict | None  # Decoded request parameters or response values
+    error: str | None
+    frame: bytes
+
+
+def read_packets(path: str | os.PathLike) -> Iterator[tuple[float, int, memoryview]]:
+    """
+    Yield the (timestamp, direction, H4 packet) of every packet in a btsnoop
+    or pcap capture. The file is memory mapped and the packets are views
+    into it, they are only valid until the next packet is read.
+    """
+    with Path(path).open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if data[:8] == BTSNOOP_MAGIC:
+                yield from _btsnoop_packets(memoryview(data))
+            else:
+                yield from _pcap_packets(memoryview(data))
+        finally:
+            # The caller may still hold the last packet, in which case the
+            # mapping is closed once that is released
+            with contextlib.suppress(BufferError):
+                data.close()
+
+
+def _btsnoop_packets(data: memoryview) -> Iterator[tuple[float, int, memoryview]]:
+    (datalink,) = struct.unpack_from(">I", data, 12)
+    if datalink not in (BTSNOOP_H1, BTSNOOP_H4):
+        raise ValueError(f"Unsupported btsnoop datalink type {datalink}")
+
+    offset = 16
+    while offset + _BTSNOOP_RECORD.size <= len(data):
+        _, length, flags, _, timestamp = _BTSNOOP_RECORD.unpack_from(data, offset)
+        offset += _BTSNOOP_RECORD.size
+        packet = data[offset : offset + length]
+        offset += length
+        if datalink == BTSNOOP_H1:
+            # No H4 type byte, data packets are flagged instead
+            if flags & 0x02:
+                continue
+            packet = memoryview(bytes([H4_ACL]) + packet)
+        yield (
+            (timestamp - BTSNOOP_EPOCH_OFFSET) / 1e6,
+            RECEIVED if flags & 0x01 else SENT,
+            packet,
+        )
+
+
+def _pcap_packets(data: memoryview) -> Iterator[tuple[float, int, memoryview]]:
+    magic = bytes(data[:4])
+    if magic in (b"\xa1\xb2\xc3\xd4", b"\xa1\xb2\x3c\x4d"):
+        endian = ">"
+    elif magic in (b"\xd4\xc3\xb2\xa1", b"\x4d\x3c\xb2\xa1"):
+        endian = "<"
+    else:
+        raise ValueError("Not a btsnoop or pcap capture")
+    nanoseconds = magic in (b"\xa1\xb2\x3c\x4d", b"\x4d\x3c\xb2\xa1")
+    (linktype,) = struct.unpack_from(endian + "I", data, 20)
+    if linktype not in (PCAP_H4, PCAP_H4_WITH_PHDR):
+        raise ValueError(f"Unsupported pcap link type {linktype}")
+
+    record = struct.Struct(endian + "IIII")
+    offset = 24
+    while offset + record.size <= len(data):
+        seconds, fraction, length, _ = record.unpack_from(data, offset)
+        offset += record.size
+        packet = data[offset : offset + length]
+        offset += length
+        direction = SENT
+        if linktype == PCAP_H4_WITH_PHDR:
+            # Big endian direction header, bit 0 set for received packets
+            direction = RECEIVED if packet[3] & 0x01 else SENT
+            packet = packet[4:]
+        yield (
+            seconds + fraction / (1e9 if nanoseconds else 1e6),
+            direction,
+            packet,
+        )
+
+
+class CaptureDecoder:
+    """Turn H4 packets into decoded protocol frames"""
+
+    def __init__(self, protocol: dict | None = None):
+        if protocol is None:
+            with files("automower_ble").joinpath("protocol.json").open("r") as f:
+                protocol = json.load(f)
+        self.commands: dict[tuple[int, int], tuple[str, Command]] = {}
+        for name, parameter in protocol.items():
+            command = Command(0, dict(parameter))
+            self.commands[(command.major, command.minor)] = (name, command)
+        # L2CAP reassembly, by (connection, direction)
+        self._l2cap: dict[tuple[int, int], bytearray] = {}
+        # Protocol frame reassembly, by (connection, direction)
+        self._reassemblers: dict[tuple[int, int], FrameReassembler] = {}
+
+    def feed(
+        self, timestamp: float, direction: int, packet: memoryview
+    ) -> list[CaptureRecord]:
+        value = self.att_value(direction, packet)
+        if value is None:
+            return []
+
+        connection, data = value
+        key = (connection, direction)
+        reassembler = self._reassemblers.get(key)
+        if reassembler is None:
+            reassembler = self._reassemblers[key] = FrameReassembler()
+        return [
+            self.decode_frame(timestamp, connection, frame)
+            for frame in reassembler.feed(data)
+        ]
+
+    def att_value(
+        self, direction: int, packet: memoryview
+    ) -> tuple[int, memoryview] | None:
+        """
+        The connection handle and value of an ATT write, notification or
+        indication in `packet`, once its L2CAP packet is complete
+        """
+        if len(packet) < 5 or packet[0] != H4_ACL:
+            return None
+
+        handle_flags, length = _ACL_HEADER.unpack_from(packet, 1)
+        connection = handle_flags & 0x0FFF
+        key = (connection, direction)
+        payload: memoryview | bytearray = packet[5 : 5 + length]
+        if (handle_flags >> 12) & 0x03 == 0x01:
+            # Continuation of an L2CAP packet
+            pending = self._l2cap.get(key)
+            if pending is None:
+                return None
+            pending += payload
+            payload = pending
+        else:
+            self._l2cap.pop(key, None)
+
+        if len(payload) < _L2CAP_HEADER.size or (
+            len(payload) < _L2CAP_HEADER.size + _L2CAP_HEADER.unpack_from(payload)[0]
+        ):
+            # Only copied when the L2CAP packet is split over ACL packets
+            self._l2cap[key] = (
+                payload if isinstance(payload, bytearray) else bytearray(payload)
+            )
+            return None
+        l2cap_length, cid = _L2CAP_HEADER.unpack_from(payload, 0)
+        self._l2cap.pop(key, None)
+        if cid != L2CAP_ATT_CID or l2cap_length < 3:
+            return None
+
+        att = memoryview(payload)[4 : 4 + l2cap_length]
+        if att[0] not in (
+            ATT_WRITE_REQUEST,
+            ATT_WRITE_COMMAND,
+            ATT_NOTIFICATION,
+            ATT_INDICATION,
+        ):
+            return None
+
+        return connection, att[3:]
+
+    def decode_frame(
+        self, timestamp: float, connection: int, frame: bytearray
+    ) -> CaptureRecord:
+        command_id = _frame_id(frame)
+        if command_id is None:
+            # Only linked frames have a packet type, the others are the
+            # channel setup and handshake
+            packet_type = "setup"
+        else:
+            packet_type = PACKET_TYPES.get(frame[10], str(frame[10]))
+        name = None
+        result = None
+        data: dict | None = None
+        error = None
+
+        command = self.commands.get(command_id) if command_id else None
+        if command is not None:
+            name = command[0]
+            try:
+                if packet_type == "request":
+                    data = command[1].parse_request(frame)
+                elif packet_type == "response":
+                    try:
+                        result = ResponseResult(frame[16]).name
+                    except ValueError:
+                        result = str(frame[16])
+                    if frame[16] == ResponseResult.OK:
+                        data = command[1].parse_response(frame)
+                elif packet_type == "event":
+                    data = command[1].parse_event(frame)
+            except (ValueError, IndexError) as err:
+                error = str(err)
+
+        return CaptureRecord(
+            timestamp,
+            connection,
+            packet_type,
+            int.from_bytes(frame[4:8], byteorder="little"),
+            command_id,
+            name,
+            result,
+            data,
+            error,
+            bytes(frame),
+        )
+
+
+def decode_capture(
+    path: str | os.PathLike, protocol: dict | None = None
+) -> Iterator[CaptureRecord]:
+    """Stream the decoded protocol frames of a capture file"""
+    decoder = CaptureDecoder(protocol)
+    for timestamp, direction, packet in read_packets(path):
+        yield from decoder.feed(timestamp, direction, packet)
+
+
+def _decode_file(path: str) -> list[CaptureRecord]:
+    return list(decode_capture(path))
+
+
+def decode_captures(
+    paths: Iterable[str | os.PathLike], max_workers: int | None = None
+) -> Iterator[tuple[str, list[CaptureRecord]]]:
+    """
+    Decode many capture files in a process pool, yielding (path, records)
+    for each file as it completes
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_decode_file, str(path)): str(path) for path in paths
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _print_record(record: CaptureRecord) -> None:
+    name = record.name or (
+        f"{record.command_id[0]}/{record.command_id[1]}"
+        if record.command_id
+        else "channel"
+    )
+    details = record.error if record.error is not None else record.data
+    print(
+        f"{record.timestamp:.6f} {record.connection:#05x} {record.packet_type:<8} "
+        f"{name} {record.result or ''} {details if details is not None else ''}".rstrip()
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Decode the mower protocol from btsnoop and pcap captures"
+    )
+    parser.add_argument("captures", nargs="+", type=Path)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Worker processes used for several captures",
+    )
+    args = parser.parse_args()
+
+    if len(args.captures) == 1:
+        for record in decode_capture(args.captures[0]):
+            _print_record(record)
+        return
+
+    for path, records in decode_captures(args.captures, args.jobs):
+        print(f"# {path}")
+        for record in records:
+            _print_record(record)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+The identity of a connected mower, read once per connection
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import asyncio
+import datetime as dt
+import logging
+from typing import TYPE_CHECKING, Any
+
+from .models import ModelInformation, MowerModels
+from .protocol import ResponseResult
+
+if TYPE_CHECKING:
+    from .mower import Mower
+
+logger = logging.getLogger(__name__)
+
+# Command that reads each DeviceInfo field, none of them change while the
+# mower is connected
+DEVICE_INFO_COMMANDS = {
+    "serial_number": "GetSerialNumber",
+    "model_information": "GetModel",
+    "software_version": "GetSwVersionStringAppl",
+    "boot_version": "GetSwVersionStringBoot",
+    "sub_version": "GetSwVersionStringSub",
+    "hardware_revision": "GetHardwareRevision",
+    "production_time": "GetProductionTime",
+}
+
+
+def model_information(model: dict) -> ModelInformation:
+    """Look up a GetModel response in MowerModels"""
+    device = (model["deviceType"], model["deviceVariant"])
+    information = MowerModels.get(device)
+    if information is None:
+        return ModelInformation(
+            f"Unknown Manufacturer ({device[0]}, {device[1]})",
+            f"Unknown Model ({device[0]}, {device[1]})",
+        )
+    return information
+
+
+class DeviceInfo:
+    """
+    Serial number, model and versions of the connected mower.
+
+    Each field is read from the mower the first time it is asked for, and
+    `load()` reads several missing fields in one batch. The fields are
+    kept until the mower disconnects or reports a different serial number.
+    """
+
+    def __init__(self, mower: "Mower"):
+        self._mower = mower
+        self.values: dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+        # Bumped by clear(), so reads started before it are dropped
+        self._generation = 0
+
+    def clear(self) -> None:
+        self.values.clear()
+        self._generation += 1
+
+    def update_serial_number(self, serial_number: int) -> None:
+        """Keep the fields only if they belong to `serial_number`"""
+        known = self.values.get("serial_number")
+        if known is not None and known != serial_number:
+            logger.info("Serial number changed from %s to %s", known, serial_number)
+            self.clear()
+        self.values["serial_number"] = serial_number
+
+    async def load(self, *fields: str) -> dict[str, Any]:
+        """
+        Read the given fields, or every field, that aren't known yet and
+        return the known values. Fields the mower can't read stay missing.
+        """
+        fields = fields or tuple(DEVICE_INFO_COMMANDS)
+        async with self._lock:
+            missing = [field for field in fields if field not in self.values]
+            if missing:
+                generation = self._generation
+                results = await self._mower.command_batch(
+                    [(DEVICE_INFO_COMMANDS[field], {}) for field in missing],
+                    warn_on_error=False,
+                )
+                if generation == self._generation:
+                    for field, (result, value) in zip(missing, results, strict=True):
+                        if result is ResponseResult.OK and value is not None:
+                            self._store(field, value)
+        return {field: self.values[field] for field in fields if field in self.values}
+
+    def _store(self, field: str, value: Any) -> None:
+        if field == "serial_number":
+            self.update_serial_number(value)
+        elif field == "model_information":
+            self.values[field] = model_information(value)
+        elif field == "production_time":
+            self.values[field] = dt.datetime.fromtimestamp(value, dt.UTC)
+        else:
+            self.values[field] = value
+
+    async def get(self, field: str) -> Any:
+        if field not in self.values:
+            await self.load(field)
+        return self.values.get(field)
+
+    async def serial_number(self) -> int | None:
+        return await self.get("serial_number")
+
+    async def model_information(self) -> ModelInformation | None:
+        return await self.get("model_information")
+
+    async def manufacturer(self) -> str | None:
+        information = await self.model_information()
+        return information.manufacturer if information is not None else None
+
+    async def model(self) -> str | None:
+        information = await self.model_information()
+        return information.model if information is not None else None
+
+    async def software_version(self) -> str | None:
+        return await self.get("software_version")
+
+    async def boot_version(self) -> str | None:
+        return await self.get("boot_version")
+
+    async def sub_version(self) -> str | None:
+        return await self.get("sub_version")
+
+    async def hardware_revision(self) -> int | None:
+        return await self.get("hardware_revision")
+
+    async def production_time(self) -> dt.datetime | None:
+        return await self.get("production_time")
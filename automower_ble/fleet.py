@@ -0,0 +1,323 @@
+"""
+Manage many mowers from one process.
+
+    fleet = MowerFleet(max_concurrency=4)
+    fleet.add(channel_id, "60:98:66:XX:XX:XX")
+    fleet.add(channel_id, "60:98:66:YY:YY:YY")
+    await fleet.connect_all()
+    async for result in fleet.poll():
+        print(result.address, result.value)
+    await fleet.disconnect_all()
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any
+
+from bleak import BleakScanner
+
+from .metrics import LATENCY_BUCKETS, Metrics
+from .mower import Mower, MowerStatus
+from .protocol import ResponseResult
+
+logger = logging.getLogger(__name__)
+
+# Seconds between the start of two connection attempts
+CONNECT_STAGGER = 0.5
+# Fraction of the keep-alive interval the keep-alives of a fleet are
+# spread over
+KEEP_ALIVE_SPREAD = 0.5
+
+
+@dataclass(frozen=True, slots=True)
+class FleetResult:
+    """The result of an operation on one mower of the fleet"""
+
+    address: str
+    value: Any
+    error: BaseException | None
+    elapsed: float
+
+
+@dataclass(frozen=True, slots=True)
+class MowerHealth:
+    address: str
+    connected: bool
+    idle: float | None  # Seconds since the last response
+    keep_alive_sent: int
+    keep_alive_skipped: int
+    keep_alive_failed: int
+    polls: int
+    poll_failures: int
+    last_error: str | None
+    requests: int
+    timeouts: int
+    latency_mean: float | None
+
+
+@dataclass(frozen=True, slots=True)
+class FleetStats:
+    """
+    Health of every mower and request latency over the whole fleet.
+    `latency_buckets` counts responses per LATENCY_BUCKETS upper bound.
+    """
+
+    mowers: int
+    connected: int
+    requests: int
+    timeouts: int
+    latency_mean: float | None
+    latency_buckets: Mapping[float, int]
+    health: Mapping[str, MowerHealth]
+
+
+class MowerFleet:
+    """
+    Owns many `Mower` connections, which share one loaded protocol.json.
+
+    Connections are started `connect_stagger` seconds apart, keep-alives
+    are spread over part of the keep-alive interval and at most
+    `max_concurrency` mowers are connected to or polled at the same time.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        connect_stagger: float = CONNECT_STAGGER,
+        keep_alive_spread: float = KEEP_ALIVE_SPREAD,
+    ):
+        self.mowers: dict[str, Mower] = {}
+        self.max_concurrency = max_concurrency
+        self.connect_stagger = connect_stagger
+        self.keep_alive_spread = keep_alive_spread
+        self.protocol: dict | None = None
+        # Last status of every mower read by poll()
+        self.status: dict[str, MowerStatus] = {}
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+        self._polls: dict[str, int] = {}
+        self._poll_failures: dict[str, int] = {}
+        self._errors: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.mowers)
+
+    def __iter__(self):
+        return iter(list(self.mowers.values()))
+
+    def __getitem__(self, address: str) -> Mower:
+        return self.mowers[address.upper()]
+
+    def add(self, channel_id: int, address: str, pin=None, **kwargs) -> Mower:
+        """
+        Add a mower, `kwargs` are passed to `Mower`. Request metrics are
+        collected, labelled with the address, unless `metrics` is given.
+        """
+        address = address.upper()
+        if address in self.mowers:
+            raise ValueError(f"{address} is already in the fleet")
+        kwargs.setdefault("metrics", Metrics({"address": address}))
+        mower = Mower(channel_id, address, pin, **kwargs)
+        mower.protocol = self.protocol
+        self.mowers[address] = mower
+        self._stagger_keep_alives()
+        return mower
+
+    async def remove(self, address: str) -> None:
+        """Disconnect a mower and remove it from the fleet"""
+        mower = self.mowers.pop(address.upper())
+        self.status.pop(mower.address, None)
+        self._stagger_keep_alives()
+        if mower.is_connected():
+            await mower.disconnect()
+
+    def _stagger_keep_alives(self) -> None:
+        for i, mower in enumerate(self.mowers.values()):
+            mower.keep_alive_offset = (
+                self.keep_alive_spread * mower.keep_alive_interval * i / len(self)
+            )
+
+    async def _load_protocol(self) -> None:
+        """Load protocol.json once, for every mower"""
+        if self.protocol is None:
+            self.protocol = next(
+                (m.protocol for m in self.mowers.values() if m.protocol is not None),
+                None,
+            )
+        if self.protocol is None and self.mowers:
+            self.protocol = await next(iter(self.mowers.values())).get_protocol()
+        for mower in self.mowers.values():
+            mower.protocol = self.protocol
+
+    async def _run(
+        self,
+        mowers: list[Mower],
+        operation: Callable[[Mower], Awaitable[Any]],
+        stagger: float = 0.0,
+    ) -> AsyncIterator[FleetResult]:
+        """Run `operation` on every mower, yielding the results as they complete"""
+
+        async def run(i: int, mower: Mower) -> FleetResult:
+            if stagger:
+                await asyncio.sleep(i * stagger)
+            async with self._concurrency:
+                start = time.monotonic()
+                try:
+                    value = await operation(mower)
+                except Exception as err:
+                    logger.warning("%s failed: %s", mower.address, err)
+                    self._errors[mower.address] = str(err) or type(err).__name__
+                    return FleetResult(
+                        mower.address, None, err, time.monotonic() - start
+                    )
+                return FleetResult(mower.address, value, None, time.monotonic() - start)
+
+        tasks = [asyncio.create_task(run(i, mower)) for i, mower in enumerate(mowers)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _select(self, addresses: Iterable[str] | None) -> list[Mower]:
+        if addresses is None:
+            return list(self.mowers.values())
+        return [self.mowers[address.upper()] for address in addresses]
+
+    async def connect_all(
+        self,
+        devices: Mapping[str, Any] | None = None,
+        addresses: Iterable[str] | None = None,
+    ) -> dict[str, FleetResult]:
+        """
+        Connect every mower that isn't connected, `connect_stagger` seconds
+        apart. `devices` maps addresses to BLEDevices, mowers without one
+        are found with a scan. Each value is the connect ResponseResult.
+        """
+        await self._load_protocol()
+        devices = {address.upper(): d for address, d in (devices or {}).items()}
+
+        async def connect(mower: Mower) -> ResponseResult:
+            device = devices.get(mower.address)
+            if device is None:
+                device = await BleakScanner.find_device_by_address(mower.address)
+            if device is None:
+                raise LookupError(f"Unable to find {mower.address}")
+            result = await mower.connect(device)
+            if result is not ResponseResult.OK:
+                self._errors[mower.address] = f"connect returned {result.name}"
+            return result
+
+        mowers = [
+            mower for mower in self._select(addresses) if not mower.is_connected()
+        ]
+        return {
+            result.address: result
+            async for result in self._run(mowers, connect, self.connect_stagger)
+        }
+
+    async def disconnect_all(self) -> None:
+        await asyncio.gather(
+            *(
+                mower.disconnect()
+                for mower in self.mowers.values()
+                if mower.is_connected()
+            )
+        )
+
+    async def poll(
+        self,
+        operation: Callable[[Mower], Awaitable[Any]] | None = None,
+        addresses: Iterable[str] | None = None,
+    ) -> AsyncIterator[FleetResult]:
+        """
+        Run `operation` on every connected mower, at most `max_concurrency`
+        at a time, and yield each result as soon as it completes.
+
+        The default operation is `Mower.poll_status()`, with the last
+        status of the mower kept in `status`.
+        """
+        if operation is None:
+
+            async def operation(mower: Mower) -> MowerStatus:
+                status = await mower.poll_status(self.status.get(mower.address))
+                self.status[mower.address] = status
+                return status
+
+        mowers = [mower for mower in self._select(addresses) if mower.is_connected()]
+        async for result in self._run(mowers, operation):
+            self._polls[result.address] = self._polls.get(result.address, 0) + 1
+            if result.error is not None:
+                self._poll_failures[result.address] = (
+                    self._poll_failures.get(result.address, 0) + 1
+                )
+            yield result
+
+    async def poll_all(
+        self,
+        operation: Callable[[Mower], Awaitable[Any]] | None = None,
+        addresses: Iterable[str] | None = None,
+    ) -> dict[str, FleetResult]:
+        """Like `poll()`, but wait for every mower"""
+        return {
+            result.address: result async for result in self.poll(operation, addresses)
+        }
+
+    def health(self, mower: Mower) -> MowerHealth:
+        requests = timeouts = latency_count = 0
+        latency_sum = 0.0
+        if mower.metrics is not None:
+            for metrics in mower.metrics.commands.values():
+                requests += metrics.requests
+                timeouts += metrics.timeouts
+                latency_sum += metrics.latency_sum
+                latency_count += metrics.latency_count
+        return MowerHealth(
+            address=mower.address,
+            connected=mower.is_connected(),
+            idle=(
+                time.monotonic() - mower.last_activity if mower.last_activity else None
+            ),
+            keep_alive_sent=mower.keep_alive_sent,
+            keep_alive_skipped=mower.keep_alive_skipped,
+            keep_alive_failed=mower.keep_alive_failed,
+            polls=self._polls.get(mower.address, 0),
+            poll_failures=self._poll_failures.get(mower.address, 0),
+            last_error=self._errors.get(mower.address),
+            requests=requests,
+            timeouts=timeouts,
+            latency_mean=latency_sum / latency_count if latency_count else None,
+        )
+
+    def stats(self) -> FleetStats:
+        """Health of every mower and the request latency of the fleet"""
+        health = {address: self.health(m) for address, m in self.mowers.items()}
+        buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        latency_sum = 0.0
+        latency_count = 0
+        for mower in self.mowers.values():
+            if mower.metrics is None:
+                continue
+            for metrics in mower.metrics.commands.values():
+                for i, count in enumerate(metrics.buckets):
+                    buckets[i] += count
+                latency_sum += metrics.latency_sum
+                latency_count += metrics.latency_count
+
+        return FleetStats(
+            mowers=len(self.mowers),
+            connected=sum(h.connected for h in health.values()),
+            requests=sum(h.requests for h in health.values()),
+            timeouts=sum(h.timeouts for h in health.values()),
+            latency_mean=latency_sum / latency_count if latency_count else None,
+            latency_buckets=MappingProxyType(
+                dict(zip((*LATENCY_BUCKETS, float("inf")), buckets, strict=True))
+            ),
+            health=MappingProxyType(health),
+        )
@@ -1,5 +1,15 @@
 # Copyright: Alistair Francis <alistair@alistair23.me>
 
+import asyncio
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
 # Lookup table for CRC-8/MAXIM-DOW (Polynomial=0x31, reflected table)
 _CRC_TABLE = [
     0x00,
@@ -261,9 +271,81 @@ _CRC_TABLE = [
 ]
 
 
-def crc(data: bytearray, offset: int, length: int) -> int:
-    """Used to generate CRC-8/MAXIM-DOW checksums for the packets"""
-    checksum = 0
+def crc(data: bytearray, offset: int, length: int, checksum: int = 0) -> int:
+    """
+    Used to generate CRC-8/MAXIM-DOW checksums for the packets
+
+    `checksum` can be used to continue a checksum that was already
+    calculated over the preceding bytes.
+    """
     for byte in data[offset : offset + length]:
         checksum = _CRC_TABLE[checksum ^ byte]
     return checksum
+
+
+class Crc8:
+    """
+    A CRC-8/MAXIM-DOW checksum that is updated as data arrives, so a
+    frame can be checked as soon as its last byte has been received.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: int = 0):
+        self.value = value
+
+    def update(self, data, offset: int = 0, length: int | None = None) -> int:
+        if offset or (length is not None and length != len(data)):
+            # A view of the bytes to check instead of a copy
+            end = len(data) if length is None else offset + length
+            data = memoryview(data)[offset:end]
+        table = _CRC_TABLE
+        checksum = self.value
+        for byte in data:
+            checksum = table[checksum ^ byte]
+        self.value = checksum
+        return checksum
+
+    def reset(self) -> None:
+        self.value = 0
+
+
+async def load_json_entries(
+    path: Path, factory: Callable[..., Any], description: str
+) -> dict[str, Any]:
+    """
+    Read a JSON object of dataclass fields by key, from an executor. A
+    missing file is empty, one that can't be read is logged and empty.
+    """
+
+    def read_file():
+        if not path.exists():
+            return {}
+        with path.open("r") as f:
+            return json.load(f)
+
+    try:
+        entries = await asyncio.get_running_loop().run_in_executor(None, read_file)
+        return {key: factory(**fields) for key, fields in entries.items()}
+    except (OSError, ValueError, TypeError, AttributeError) as err:
+        logger.warning("Unable to read %s %s: %s", description, path, err)
+        return {}
+
+
+async def save_json_entries(path: Path, entries: dict[str, Any], description: str):
+    """
+    Write dataclasses by key as a JSON object, from an executor. The file
+    is replaced at once, so a failed write leaves the old one.
+    """
+    data = {key: asdict(entry) for key, entry in entries.items()}
+
+    def write_file():
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("w") as f:
+            json.dump(data, f, indent=2)
+        tmp_path.replace(path)
+
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, write_file)
+    except OSError as err:
+        logger.warning("Unable to write %s %s: %s", description, path, err)
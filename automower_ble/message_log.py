@@ -0,0 +1,207 @@
+"""
+Read the mower message log incrementally
+
+    log = MessageLog("message_log.json")
+    for message in await log.sync(mower):
+        print(message.time, message.code)
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import datetime as dt
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .error_codes import ErrorCodes
+from .helpers import load_json_entries, save_json_entries
+from .protocol import ResponseResult
+
+if TYPE_CHECKING:
+    from .mower import Mower
+
+logger = logging.getLogger(__name__)
+
+# Most messages read by one sync, older new messages are skipped
+MAX_SYNC_MESSAGES = 50
+
+
+def error_code(code: int) -> ErrorCodes | int:
+    """The ErrorCodes member for `code`, or `code` itself if it is unknown"""
+    try:
+        return ErrorCodes(code)
+    except ValueError:
+        return code
+
+
+@dataclass(frozen=True, slots=True)
+class MowerMessage:
+    """
+    An entry of the message log. `message_id` is the ID the message had
+    when it was read, the newest message is 0.
+    """
+
+    message_id: int
+    time: dt.datetime
+    code: ErrorCodes | int
+    severity: int
+
+
+@dataclass
+class MessageCursor:
+    """How far the message log of a mower has been read"""
+
+    count: int  # Messages in the log at the last sync
+    timestamp: int  # Unix time of the newest message read
+
+
+class MessageLog:
+    """
+    Read only the messages added to a mower message log since the last
+    sync, remembering how far each mower, by serial number, was read.
+
+    The log is numbered from the newest message, so the messages added
+    since the last sync are the first ones and only those are read, in
+    one command batch. Once the log is full its count stays the same, so
+    then the newest message is read and compared with the time of the
+    last message read, and the messages newer than that are read. If the
+    log shrank it was cleared, and the messages newer than the last one
+    read are taken from the start again.
+
+    The cursors are kept in memory, and in a JSON file as well if `path`
+    is given. The file is read on first use and written on every change.
+    """
+
+    def __init__(self, path: str | os.PathLike | None = None):
+        self.path = Path(path) if path is not None else None
+        self._cursors: dict[str, MessageCursor] = {}
+        self._loaded = self.path is None
+
+    async def _load(self) -> None:
+        if self._loaded or self.path is None:
+            return
+        self._loaded = True
+        self._cursors.update(
+            await load_json_entries(self.path, MessageCursor, "message log cursors")
+        )
+
+    async def _save(self) -> None:
+        if self.path is not None:
+            await save_json_entries(self.path, self._cursors, "message log cursors")
+
+    async def get(self, serial_number: int) -> MessageCursor | None:
+        await self._load()
+        return self._cursors.get(str(serial_number))
+
+    async def set(self, serial_number: int, cursor: MessageCursor) -> None:
+        await self._load()
+        if self._cursors.get(str(serial_number)) == cursor:
+            return
+        self._cursors[str(serial_number)] = cursor
+        await self._save()
+
+    async def sync(
+        self, mower: "Mower", max_messages: int = MAX_SYNC_MESSAGES
+    ) -> list[MowerMessage]:
+        """
+        Read the messages added since the last sync of this mower, oldest
+        first. Messages that couldn't be read are read again next time.
+        """
+        serial_number = await mower.device_info.serial_number()
+        if serial_number is None:
+            raise RuntimeError("Unable to read the serial number")
+        result, count = await mower.command_response(
+            "GetNumberOfMessages", warn_on_error=False
+        )
+        if result is not ResponseResult.OK or count is None:
+            raise RuntimeError(f"GetNumberOfMessages returned {result.name}")
+
+        cursor = await self.get(serial_number)
+        if cursor is not None and count == cursor.count:
+            if not count:
+                return []
+            # A full log drops its oldest message for every new one, so
+            # only the time of the newest message tells if one was added
+            newer = await self._read_newer(
+                mower, cursor.timestamp, min(count, max_messages)
+            )
+            if newer:
+                await self.set(serial_number, MessageCursor(count, newer[0][1]["time"]))
+            return self._messages(newer)
+
+        cleared = cursor is not None and count < cursor.count
+        added = count if cursor is None or cleared else count - cursor.count
+        added = min(added, max_messages)
+        if added == 0:
+            if cursor is not None and count != cursor.count:
+                await self.set(serial_number, MessageCursor(count, cursor.timestamp))
+            return []
+
+        results = await mower.command_batch(
+            [("GetMessage", {"messageId": message_id}) for message_id in range(added)],
+            warn_on_error=False,
+        )
+        synced = count
+        messages: list[tuple[int, dict]] = []
+        for message_id, (result, message) in enumerate(results):
+            if result is not ResponseResult.OK or message is None:
+                logger.warning("GetMessage %d returned %s", message_id, result.name)
+                # The cursor can only move past messages older than the
+                # one that failed, the newer ones are read again next time
+                messages.clear()
+                synced = count - message_id - 1
+            else:
+                messages.append((message_id, message))
+
+        timestamp = cursor.timestamp if cursor is not None else 0
+        if cleared:
+            # Skip the messages that were read before the log was cleared
+            messages = [(i, m) for i, m in messages if m["time"] > timestamp]
+        if messages:
+            timestamp = max(timestamp, messages[0][1]["time"])
+        await self.set(serial_number, MessageCursor(synced, timestamp))
+
+        return self._messages(messages)
+
+    async def _read_newer(
+        self, mower: "Mower", timestamp: int, limit: int
+    ) -> list[tuple[int, dict]]:
+        """
+        Read from the newest message until one isn't newer than
+        `timestamp`, in batches. If a read fails nothing is returned, so
+        the same messages are read again next time.
+        """
+        messages: list[tuple[int, dict]] = []
+        batch = 1
+        while len(messages) < limit:
+            start = len(messages)
+            ids = range(start, min(start + batch, limit))
+            results = await mower.command_batch(
+                [("GetMessage", {"messageId": message_id}) for message_id in ids],
+                warn_on_error=False,
+            )
+            for message_id, (result, message) in zip(ids, results, strict=True):
+                if result is not ResponseResult.OK or message is None:
+                    logger.warning("GetMessage %d returned %s", message_id, result.name)
+                    return []
+                if message["time"] <= timestamp:
+                    return messages
+                messages.append((message_id, message))
+            # The first read only checks the newest message
+            batch = mower.max_in_flight
+        return messages
+
+    @staticmethod
+    def _messages(messages: list[tuple[int, dict]]) -> list[MowerMessage]:
+        """Decode (message ID, GetMessage response) pairs, oldest first"""
+        return [
+            MowerMessage(
+                message_id,
+                dt.datetime.fromtimestamp(message["time"], dt.UTC),
+                error_code(message["code"]),
+                message["severity"],
+            )
+            for message_id, message in reversed(messages)
+        ]
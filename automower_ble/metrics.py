@@ -0,0 +1,246 @@
+"""
+Request counters and latency histograms for the BLE protocol layer
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+from bisect import bisect_left
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .reassembler import FrameReassembler
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = "automower_ble"
+
+
+class CommandMetrics:
+    """Everything recorded for one command"""
+
+    __slots__ = (
+        "buckets",
+        "bytes_read",
+        "bytes_written",
+        "latency_count",
+        "latency_sum",
+        "requests",
+        "results",
+        "timeouts",
+        "validation_failures",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.results: dict[str, int] = {}
+        self.timeouts = 0
+        self.validation_failures = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        # Count per bucket in LATENCY_BUCKETS, followed by +Inf
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "results": dict(self.results),
+            "timeouts": self.timeouts,
+            "validation_failures": self.validation_failures,
+            "bytes_written": self.bytes_written,
+            "bytes_read": self.bytes_read,
+            "latency": {
+                "buckets": dict(
+                    zip(
+                        (*LATENCY_BUCKETS, float("inf")),
+                        self.buckets,
+                        strict=True,
+                    )
+                ),
+                "sum": self.latency_sum,
+                "count": self.latency_count,
+            },
+        }
+
+
+class Metrics:
+    """
+    Counters and latency histograms per command, for a `BLEClient`.
+
+    Commands are recorded by (major, minor) command ID, the channel setup
+    and handshake as "channel". The client registers the protocol.json
+    name of every command it compiles so the output uses the names.
+    `labels` are added to every metric, for example the mower address.
+    """
+
+    def __init__(self, labels: dict[str, str] | None = None):
+        self.labels = labels or {}
+        self.commands: dict[tuple[int, int] | None, CommandMetrics] = {}
+        self.names: dict[tuple[int, int] | None, str] = {None: "channel"}
+        self.notification_bytes = 0
+        self._reassemblers: list[FrameReassembler] = []
+
+    def command(self, command_id: tuple[int, int] | None) -> CommandMetrics:
+        metrics = self.commands.get(command_id)
+        if metrics is None:
+            metrics = self.commands[command_id] = CommandMetrics()
+        return metrics
+
+    def register_command(self, command_id: tuple[int, int], name: str) -> None:
+        self.names[command_id] = name
+
+    def observe_reassembler(self, reassembler: "FrameReassembler") -> None:
+        """Report the resync counters of `reassembler`"""
+        if reassembler not in self._reassemblers:
+            self._reassemblers.append(reassembler)
+
+    def request_sent(self, command_id: tuple[int, int] | None, length: int) -> None:
+        metrics = self.command(command_id)
+        metrics.requests += 1
+        metrics.bytes_written += length
+
+    def response_received(
+        self,
+        command_id: tuple[int, int] | None,
+        result: str,
+        length: int,
+        latency: float,
+    ) -> None:
+        metrics = self.command(command_id)
+        metrics.results[result] = metrics.results.get(result, 0) + 1
+        metrics.bytes_read += length
+        metrics.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        metrics.latency_sum += latency
+        metrics.latency_count += 1
+
+    def timed_out(self, command_id: tuple[int, int] | None) -> None:
+        self.command(command_id).timeouts += 1
+
+    def validation_failed(self, command_id: tuple[int, int] | None) -> None:
+        self.command(command_id).validation_failures += 1
+
+    def _name(self, command_id: tuple[int, int] | None) -> str:
+        name = self.names.get(command_id)
+        if name is None and command_id is not None:
+            name = f"{command_id[0]}/{command_id[1]}"
+        return name or "channel"
+
+    def _reassembly(self) -> dict[str, int]:
+        return {
+            "frames": sum(r.frames for r in self._reassemblers),
+            "resyncs": sum(r.resyncs for r in self._reassemblers),
+            "dropped_bytes": sum(r.dropped_bytes for r in self._reassemblers),
+            "crc_errors": sum(r.crc_errors for r in self._reassemblers),
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "labels": dict(self.labels),
+            "commands": {
+                self._name(command_id): metrics.as_dict()
+                for command_id, metrics in self.commands.items()
+            },
+            "notification_bytes": self.notification_bytes,
+            "reassembly": self._reassembly(),
+        }
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, description: str, samples) -> None:
+            lines.append(f"# HELP {PREFIX}_{name} {description}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(
+                    f"{PREFIX}_{name}{suffix}{_labels({**self.labels, **labels})} {value}"
+                )
+
+        commands = [
+            (self._name(command_id), metrics)
+            for command_id, metrics in self.commands.items()
+        ]
+        for name, attribute, description in (
+            ("requests_total", "requests", "Requests sent"),
+            ("timeouts_total", "timeouts", "Requests without a response"),
+            (
+                "validation_failures_total",
+                "validation_failures",
+                "Responses that failed validation",
+            ),
+            ("bytes_written_total", "bytes_written", "Request bytes written"),
+            ("bytes_read_total", "bytes_read", "Response bytes read"),
+        ):
+            metric(
+                name,
+                "counter",
+                description,
+                [
+                    ("", {"command": command}, getattr(metrics, attribute))
+                    for command, metrics in commands
+                ],
+            )
+
+        metric(
+            "responses_total",
+            "counter",
+            "Responses by result",
+            [
+                ("", {"command": command, "result": result}, count)
+                for command, metrics in commands
+                for result, count in metrics.results.items()
+            ],
+        )
+
+        samples = []
+        for command, metrics in commands:
+            cumulative = 0
+            for bound, count in zip(
+                (*LATENCY_BUCKETS, "+Inf"), metrics.buckets, strict=True
+            ):
+                cumulative += count
+                samples.append(
+                    ("_bucket", {"command": command, "le": str(bound)}, cumulative)
+                )
+            samples.append(("_sum", {"command": command}, metrics.latency_sum))
+            samples.append(("_count", {"command": command}, metrics.latency_count))
+        metric(
+            "request_duration_seconds",
+            "histogram",
+            "Time from sending a request to its response",
+            samples,
+        )
+
+        metric(
+            "notification_bytes_total",
+            "counter",
+            "Bytes received in notifications",
+            [("", {}, self.notification_bytes)],
+        )
+        for name, value in self._reassembly().items():
+            metric(
+                f"reassembly_{name}_total",
+                "counter",
+                f"Frame reassembly {name.replace('_', ' ')}",
+                [("", {}, value)],
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in labels.values()
+    )
+    return (
+        "{"
+        + ",".join(
+            f'{name}="{value}"' for name, value in zip(labels, escaped, strict=True)
+        )
+        + "}"
+    )
@@ -11,21 +11,33 @@ import asyncio
 import contextlib
 import datetime as dt
 import logging
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Awaitable, Callable, Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any
 
 from automower_ble.protocol import (
+    DEFAULT_MAX_IN_FLIGHT,
     BLEClient,
     Command,
     MowerState,
     MowerActivity,
     ModeOfOperation,
+    MowerEvent,
     OverrideAction,
     ResponseResult,
     TaskInformation,
 )
-from automower_ble.models import MowerModels
+from automower_ble.cache import CommandCache, is_mutating
+from automower_ble.device_info import DeviceInfo
+from automower_ble.message_log import MessageLog
+from automower_ble.metrics import Metrics
+from automower_ble.recorder import FlightRecorder
 from automower_ble.error_codes import ErrorCodes
 
-from bleak import BleakScanner
+from bleak import BleakError, BleakScanner
 
 logger = logging.getLogger(__name__)
 
@@ -34,11 +46,125 @@ SECONDS_PER_MINUTE = 60
 MINUTES_PER_DAY = 24 * 60
 SPOT_CUT_DURATION_SECONDS = 30 * SECONDS_PER_MINUTE
 
+# Seconds the connection may be idle before a KeepAlive is sent
+KEEP_ALIVE_INTERVAL = 15.0
+MIN_KEEP_ALIVE_INTERVAL = 2.0
+# Keep-alive interval by model, as GetModel reports it, updated when a
+# mower of that model drops an idle connection sooner than expected
+KEEP_ALIVE_INTERVALS: dict[str, float] = {}
+# First schedule task ID by model, some models number tasks from 1
+TASK_ID_BASES: dict[str, int] = {}
+# Longest time a mower of each model needed before answering the channel
+# setup. This is for diagnostics only, the setup is probed the same way
+# whatever the model.
+READY_TIMES: dict[str, float] = {}
+
+
+# Commands read by `Mower.poll_status()`, by MowerStatus field
+STATUS_COMMANDS = {
+    "battery_level": "GetBatteryLevel",
+    "is_charging": "IsCharging",
+    "state": "GetState",
+    "activity": "GetActivity",
+    "mode": "GetMode",
+    "override": "GetOverride",
+    "next_start_time": "GetNextStartTime",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class MowerStatus:
+    """
+    A snapshot of the mower status returned by `Mower.poll_status()`.
+
+    `timestamp` and the read times in `updated` are `time.monotonic()`
+    values. `errors` holds the reason a field couldn't be read, the
+    ResponseResult name, UNPARSABLE for an OK response whose payload
+    couldn't be decoded or UNKNOWN_VALUE for a value that isn't known.
+    """
+
+    timestamp: float
+    battery_level: int | None
+    is_charging: bool | None
+    state: MowerState | None
+    activity: MowerActivity | None
+    mode: ModeOfOperation | None
+    override: dict[str, int | OverrideAction] | None
+    next_start_time: dt.datetime | None
+    updated: Mapping[str, float]
+    errors: Mapping[str, str]
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleWriteReport:
+    """
+    What `Mower.set_tasks()` did. `written` is empty when the schedule on
+    the mower already matched and it wasn't written.
+    """
+
+    changed: bool
+    written: tuple[TaskInformation, ...]
+    added: int  # Requested tasks that weren't on the mower
+    removed: int  # Tasks on the mower that weren't requested
+    resumed: bool  # The schedule was resumed from a permanent park
+
+
+def _task_key(task: TaskInformation) -> tuple:
+    """A task as the mower stores it, whole minutes and weekday flags"""
+    return (
+        int(task.start_time_in_minutes),
+        int(task.duration_in_minutes),
+        bool(task.on_monday),
+        bool(task.on_tuesday),
+        bool(task.on_wednesday),
+        bool(task.on_thursday),
+        bool(task.on_friday),
+        bool(task.on_saturday),
+        bool(task.on_sunday),
+    )
+
 
 class Mower(BLEClient):
-    def __init__(self, channel_id: int, address, pin=None):
-        super().__init__(channel_id, address, pin)
+    def __init__(
+        self,
+        channel_id: int,
+        address,
+        pin=None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        cache_ttls: dict[str, float] | None = None,
+        *,
+        keep_alive_interval: float | None = None,
+        metrics: Metrics | None = None,
+        recorder: FlightRecorder | None = None,
+    ):
+        super().__init__(
+            channel_id,
+            address,
+            pin,
+            max_in_flight,
+            metrics=metrics,
+            recorder=recorder,
+        )
+        # Results of the commands in `cache_ttls` are reused for their TTL
+        self.cache = CommandCache(cache_ttls)
+        # Serial number, model and versions, read once per connection
+        self.device_info = DeviceInfo(self)
         self.keep_alive_event = asyncio.Event()
+        # Fixed keep-alive interval, or None to use the one of the model
+        self._keep_alive_override = keep_alive_interval
+        self.keep_alive_interval = keep_alive_interval or KEEP_ALIVE_INTERVAL
+        # Seconds a keep-alive is sent before the interval is up, used by
+        # MowerFleet so its mowers don't send keep-alives at the same time
+        self.keep_alive_offset = 0.0
+        # Model read from the mower once connected, the key of the per model
+        # settings learned from other mowers
+        self.model_name: str | None = None
+        self._model_lookup_failed = False
+        self.keep_alive_sent = 0
+        self.keep_alive_skipped = 0
+        self.keep_alive_failed = 0
+        # First schedule task ID, once it is known
+        self.task_id_base: int | None = None
         self.task: asyncio.Task | None = None
         self._connect_lock = asyncio.Lock()
 
@@ -59,9 +185,40 @@ class Mower(BLEClient):
 
             status = await super().connect(device)
             if status == ResponseResult.OK:
+                # The model is read on the first keep-alive, not on every
+                # connect, but the one of an earlier connection is known
+                self._model_lookup_failed = False
+                if self.model_name is not None:
+                    self._apply_model(self.model_name)
                 self._ensure_keep_alive()
             return status
 
+    async def _load_model(self) -> str | None:
+        """
+        Read the model once, and use the settings learned from other mowers
+        of that model. Returns None if the model can't be read.
+        """
+        if self.model_name is None:
+            # The advertised name can be changed by the owner, the model is
+            # what the mower reports itself
+            model = await self.device_info.model()
+            if model is not None:
+                self.model_name = model
+                self._apply_model(model)
+        return self.model_name
+
+    def _apply_model(self, model: str) -> None:
+        if self.ready_time is not None:
+            READY_TIMES[model] = max(READY_TIMES.get(model, 0.0), self.ready_time)
+        if self._keep_alive_override is not None:
+            return
+        known = KEEP_ALIVE_INTERVALS.get(model, KEEP_ALIVE_INTERVAL)
+        if self.keep_alive_interval < known:
+            # Learned from a disconnect before the model was known
+            KEEP_ALIVE_INTERVALS[model] = self.keep_alive_interval
+        else:
+            self.keep_alive_interval = known
+
     def _ensure_keep_alive(self) -> None:
         """Start one keep-alive task for the active mower connection."""
         self.keep_alive_event.clear()
@@ -74,6 +231,8 @@ class Mower(BLEClient):
         `connect()` before the Python script exits
         """
         self.keep_alive_event.set()
+        self.cache.clear()
+        self.device_info.clear()
         try:
             return await super().disconnect()
         finally:
@@ -85,26 +244,110 @@ class Mower(BLEClient):
 
     async def _keep_alive(self):
         """
-        Keep the connection alive by sending a request every 15 seconds.
-        This is needed to prevent the connection from being closed by the mower.
+        Keep the connection alive by sending KeepAlive once it has been idle
+        for `keep_alive_interval` seconds. This is needed to prevent the
+        connection from being closed by the mower.
+
+        Any response from the mower counts as traffic, so nothing is sent
+        while the mower is being polled. A keep-alive is also skipped while
+        another request is being sent or waits for its response, rather
+        than queueing behind it on the lock.
         """
         while not self.keep_alive_event.is_set():
+            interval = self.keep_alive_interval
+            if self._reads_model_on_keep_alive() and KEEP_ALIVE_INTERVALS:
+                # Until the model is known, don't wait longer than any
+                # known model allows
+                interval = min(interval, *KEEP_ALIVE_INTERVALS.values())
+            interval = max(0.0, interval - self.keep_alive_offset)
+            idle = time.monotonic() - self.last_activity
+            if idle < interval:
+                await asyncio.sleep(interval - idle)
+                if time.monotonic() - self.last_activity < interval:
+                    self.keep_alive_skipped += 1
+                continue
+
+            if not self.is_connected():
+                await asyncio.sleep(self.keep_alive_interval)
+                continue
+
+            if self.lock.locked() or self._pending:
+                self.keep_alive_skipped += 1
+                await asyncio.sleep(min(1.0, self.keep_alive_interval))
+                continue
+
+            if self._reads_model_on_keep_alive():
+                # Any response keeps the connection alive, so reading the
+                # model replaces this keep-alive
+                logger.debug("Reading the model as keep alive")
+                try:
+                    model = await self._load_model()
+                except Exception as e:
+                    logger.warning("Failed to read the model: %s", e)
+                    model = None
+                if model is not None:
+                    self.keep_alive_sent += 1
+                    continue
+                # Don't try again on this connection, send KeepAlive instead
+                self._model_lookup_failed = True
+
+            logger.debug("Sending keep alive")
             try:
-                if self.is_connected():
-                    logger.debug("Sending keep alive")
-                    await self.command("KeepAlive")
+                result, _ = await self.command_response("KeepAlive")
             except Exception as e:
                 logger.warning("Failed to send keep alive: %s", e)
-            await asyncio.sleep(15)
+                result = ResponseResult.UNKNOWN_ERROR
+            if result is not ResponseResult.OK:
+                self.keep_alive_failed += 1
+                # Don't retry straight away
+                await asyncio.sleep(self.keep_alive_interval)
+            else:
+                self.keep_alive_sent += 1
+
+    def _reads_model_on_keep_alive(self) -> bool:
+        return (
+            self.model_name is None
+            and self._keep_alive_override is None
+            and not self._model_lookup_failed
+        )
+
+    def _on_disconnected(self, client) -> None:
+        super()._on_disconnected(client)
+        if client is self.client:
+            self.device_info.clear()
+        if self.keep_alive_event.is_set():
+            # We disconnected
+            return
+
+        # The mower closed a connection that was idle for less than the
+        # keep-alive interval, so keep-alives need to be sent sooner
+        idle = time.monotonic() - self.last_activity
+        if MIN_KEEP_ALIVE_INTERVAL <= idle < self.keep_alive_interval:
+            logger.info("Mower closed the connection after %.1fs idle", idle)
+            if self._keep_alive_override is None:
+                self.keep_alive_interval = max(MIN_KEEP_ALIVE_INTERVAL, idle * 0.75)
+                logger.info(
+                    "Reducing the keep-alive interval to %.1fs",
+                    self.keep_alive_interval,
+                )
+                # Without the model it is recorded once the model is read
+                if self.model_name is not None:
+                    KEEP_ALIVE_INTERVALS[self.model_name] = self.keep_alive_interval
 
     async def command(self, command_name: str, **kwargs):
         """
         This function is used to simplify the communication of the mower using the commands found in protocol.json.
         It will send a request to the mower and then wait for a response. The response will be parsed and returned to the caller.
         """
-        command = Command(self.channel_id, (await self.get_protocol())[command_name])
+        cached, value = self.cache.get(command_name, kwargs)
+        if cached:
+            return value
+
+        command = await self.get_command(command_name)
         request = command.generate_request(**kwargs)
+        generation = self.cache.generation(command.major)
         response = await self._request_response(request)
+        self._invalidate_cache(command_name, command)
         if response is None:
             return None
 
@@ -112,13 +355,22 @@ class Mower(BLEClient):
             # Just log if the response is invalid as this has been seen with user
             # logs from official apps. I.e. it is somewhat expected.
             logger.warning("Response failed validation for %s", command_name)
+            if self.metrics is not None:
+                self.metrics.validation_failed((command.major, command.minor))
+            if self.recorder is not None:
+                self.recorder.trigger("validation")
 
         response_dict = command.parse_response(response)
+        value = response_dict
         if (
             response_dict is not None and len(response_dict) == 1
         ):  # If there is only one key in the response, return the value
-            return response_dict["response"]
-        return response_dict
+            value = response_dict["response"]
+        if response[16] == ResponseResult.OK:
+            self.cache.put(command_name, kwargs, command.major, value, generation)
+            if command_name == "GetSerialNumber":
+                self.device_info.update_serial_number(value)
+        return value
 
     async def command_response(
         self, command_name: str, warn_on_error: bool = True, **kwargs
@@ -129,36 +381,130 @@ class Mower(BLEClient):
         This is useful for command buttons where Home Assistant should surface a
         clear command failure instead of only logging a low-level protocol warning.
         """
-        command = Command(self.channel_id, (await self.get_protocol())[command_name])
+        cached, value = self.cache.get(command_name, kwargs)
+        if cached:
+            return ResponseResult.OK, value
+
+        command = await self.get_command(command_name)
         request = command.generate_request(**kwargs)
+        generation = self.cache.generation(command.major)
         response = await self._request_response(request)
-        if response is None:
-            return ResponseResult.UNKNOWN_ERROR, None
-
-        result = ResponseResult(response[16])
-        if result is not ResponseResult.OK:
-            if warn_on_error:
-                logger.warning("%s returned %s", command_name, result.name)
-            else:
-                logger.debug("%s returned %s", command_name, result.name)
-            return result, None
-
-        try:
-            response_dict = command.parse_response(response)
-        except ValueError as err:
-            logger.debug("%s returned unparsable payload: %s", command_name, err)
-            return result, None
-        if response_dict is not None and len(response_dict) == 1:
-            return result, response_dict["response"]
-        return result, response_dict
+        return self._command_result(
+            command_name,
+            command,
+            kwargs,
+            response,
+            generation=generation,
+            warn_on_error=warn_on_error,
+        )
 
     async def command_response_locked(
         self, command_name: str, warn_on_error: bool = True, **kwargs
     ):
         """Send a command while the caller already holds the BLE command lock."""
-        command = Command(self.channel_id, (await self.get_protocol())[command_name])
+        cached, value = self.cache.get(command_name, kwargs)
+        if cached:
+            return ResponseResult.OK, value
+
+        command = await self.get_command(command_name)
         request = command.generate_request(**kwargs)
+        generation = self.cache.generation(command.major)
         response = await self._request_response_locked(request)
+        return self._command_result(
+            command_name,
+            command,
+            kwargs,
+            response,
+            generation=generation,
+            warn_on_error=warn_on_error,
+        )
+
+    async def command_batch(
+        self,
+        commands: list[tuple[str, dict]],
+        max_in_flight: int | None = None,
+        warn_on_error: bool = True,
+    ) -> list[tuple[ResponseResult, Any]]:
+        """
+        Send several commands back to back and return their results in order.
+
+        `commands` is a list of (command_name, kwargs) and each result is the
+        (ResponseResult, parsed data) tuple `command_response()` returns. At
+        most `max_in_flight` commands wait for a response at the same time,
+        which defaults to the limit of the client. A command that fails gets
+        an UNKNOWN_ERROR result without disconnecting from the mower.
+        """
+        # Generate every request first, so invalid parameters are raised
+        # before anything is sent
+        requests = []
+        for command_name, kwargs in commands:
+            command = await self.get_command(command_name)
+            requests.append(
+                (command_name, command, kwargs, command.generate_request(**kwargs))
+            )
+
+        in_flight = asyncio.Semaphore(max_in_flight or self.max_in_flight)
+
+        async def send(
+            command_name: str, command: Command, kwargs: dict, request: bytearray
+        ):
+            cached, value = self.cache.get(command_name, kwargs)
+            if cached:
+                return ResponseResult.OK, value
+
+            async with in_flight:
+                generation = self.cache.generation(command.major)
+                try:
+                    response = await self._request_response(
+                        request, disconnect_on_error=False
+                    )
+                except BleakError as err:
+                    logger.warning("%s failed: %s", command_name, err)
+                    response = None
+            return self._command_result(
+                command_name,
+                command,
+                kwargs,
+                response,
+                generation=generation,
+                warn_on_error=warn_on_error,
+            )
+
+        return list(await asyncio.gather(*(send(*request) for request in requests)))
+
+    async def subscribe_events(
+        self,
+        command_name: str,
+        event_id: tuple[int, int],
+        callback: Callable[[MowerEvent], Awaitable[None]],
+    ) -> ResponseResult:
+        """
+        Send a subscribe command, such as SubscribeDrivingSettingsEvents,
+        and pass the `event_id` events the mower sends to `callback`. The
+        callback is removed again if the mower refuses the subscription.
+        """
+        self.add_event_callback(event_id, callback)
+        result, _ = await self.command_response(command_name)
+        if result is not ResponseResult.OK:
+            self.remove_event_callback(event_id, callback)
+        return result
+
+    def _command_result(
+        self,
+        command_name: str,
+        command: Command,
+        kwargs: dict,
+        response,
+        *,
+        generation: int,
+        warn_on_error: bool,
+    ) -> tuple[ResponseResult, Any]:
+        """
+        Turn a raw response into the (ResponseResult, parsed data) tuple.
+        `generation` is the cache generation of the command group when the
+        request was sent.
+        """
+        self._invalidate_cache(command_name, command)
         if response is None:
             return ResponseResult.UNKNOWN_ERROR, None
 
@@ -175,37 +521,26 @@ class Mower(BLEClient):
         except ValueError as err:
             logger.debug("%s returned unparsable payload: %s", command_name, err)
             return result, None
+        value: Any = response_dict
         if response_dict is not None and len(response_dict) == 1:
-            return result, response_dict["response"]
-        return result, response_dict
+            value = response_dict["response"]
+        self.cache.put(command_name, kwargs, command.major, value, generation)
+        if command_name == "GetSerialNumber":
+            self.device_info.update_serial_number(value)
+        return result, value
+
+    def _invalidate_cache(self, command_name: str, command: Command) -> None:
+        """Drop cached results that a mutating command may have changed"""
+        if is_mutating(command_name):
+            self.cache.invalidate(command.major)
 
     async def get_manufacturer(self) -> str | None:
         """Get the mower manufacturer"""
-        model = await self.command("GetModel")
-        if model is None:
-            return None
-
-        model_information = MowerModels.get(
-            (model["deviceType"], model["deviceVariant"])
-        )
-        if model_information is None:
-            return f"Unknown Manufacturer ({model['deviceType']}, {model['deviceVariant']})"
-
-        return model_information.manufacturer
+        return await self.device_info.manufacturer()
 
     async def get_model(self) -> str | None:
         """Get the mower model"""
-        model = await self.command("GetModel")
-        if model is None:
-            return None
-
-        model_information = MowerModels.get(
-            (model["deviceType"], model["deviceVariant"])
-        )
-        if model_information is None:
-            return f"Unknown Model ({model['deviceType']}, {model['deviceVariant']})"
-
-        return model_information.model
+        return await self.device_info.model()
 
     async def is_charging(self) -> bool:
         """Get the mower charging status"""
@@ -227,7 +562,15 @@ class Mower(BLEClient):
     ) -> dt.datetime | None:
         """Query the mower next start time"""
         next_start_time = await self.command("GetNextStartTime")
-        if next_start_time is None or next_start_time == 0:
+        if next_start_time is None:
+            return None
+        return self._next_start_time(next_start_time, timezone)
+
+    @staticmethod
+    def _next_start_time(
+        next_start_time: int, timezone: dt.tzinfo | None
+    ) -> dt.datetime | None:
+        if next_start_time == 0:
             return None
         # The mower reports this value as seconds since epoch in local time, not
         # UTC. Decode the timestamp as a UTC wall-clock value, then attach the
@@ -264,7 +607,10 @@ class Mower(BLEClient):
         )
         if result is not ResponseResult.OK or override is None:
             return None
+        return self._override_status(override)
 
+    @staticmethod
+    def _override_status(override: dict) -> dict[str, int | OverrideAction]:
         try:
             action = OverrideAction(override["action"])
         except ValueError:
@@ -278,6 +624,65 @@ class Mower(BLEClient):
             "reserved": override["reserved"],
         }
 
+    async def poll_status(
+        self,
+        previous: MowerStatus | None = None,
+        timezone: dt.tzinfo | None = None,
+    ) -> MowerStatus:
+        """
+        Read the battery level, charging status, state, activity, mode,
+        override status and next start time in one pipelined round.
+
+        A field that can't be read is None and has an entry in `errors`. If
+        a `previous` snapshot is given, its value and read time are kept for
+        that field instead.
+        """
+        converters: dict[str, Callable[[Any], Any]] = {
+            "battery_level": int,
+            "is_charging": bool,
+            "state": MowerState,
+            "activity": MowerActivity,
+            "mode": ModeOfOperation,
+            "override": self._override_status,
+            "next_start_time": lambda value: self._next_start_time(value, timezone),
+        }
+        results = await self.command_batch(
+            [(command_name, {}) for command_name in STATUS_COMMANDS.values()],
+            warn_on_error=False,
+        )
+        now = time.monotonic()
+
+        values: dict[str, Any] = {}
+        updated: dict[str, float] = {}
+        errors: dict[str, str] = {}
+        for field, (result, value) in zip(STATUS_COMMANDS, results, strict=True):
+            if result is ResponseResult.OK and value is not None:
+                try:
+                    values[field] = converters[field](value)
+                    updated[field] = now
+                    continue
+                except ValueError:
+                    logger.debug("Unknown mower %s: %s", field, value)
+                    errors[field] = f"UNKNOWN_VALUE({value})"
+            elif result is ResponseResult.OK:
+                # The mower answered, but the payload couldn't be decoded
+                errors[field] = "UNPARSABLE"
+            else:
+                errors[field] = result.name
+
+            if previous is not None and field in previous.updated:
+                values[field] = getattr(previous, field)
+                updated[field] = previous.updated[field]
+            else:
+                values[field] = None
+
+        return MowerStatus(
+            timestamp=now,
+            updated=MappingProxyType(updated),
+            errors=MappingProxyType(errors),
+            **values,
+        )
+
     @staticmethod
     def is_permanently_parked_state(
         mode: ModeOfOperation | None, override: dict | None
@@ -478,6 +883,10 @@ class Mower(BLEClient):
         )
         if result is not ResponseResult.OK or task is None:
             return None
+        return self._task_information(task)
+
+    @staticmethod
+    def _task_information(task: dict) -> TaskInformation:
         return TaskInformation(
             task["start"] // SECONDS_PER_MINUTE,
             (task["duration"] + SECONDS_PER_MINUTE - 1) // SECONDS_PER_MINUTE,
@@ -490,34 +899,154 @@ class Mower(BLEClient):
             task["useOnSunday"],
         )
 
+    def _known_task_id_base(self) -> int | None:
+        if self.task_id_base is not None:
+            return self.task_id_base
+        return TASK_ID_BASES.get(self.model_name or "")
+
+    def _remember_task_id_base(self, base: int) -> None:
+        self.task_id_base = base
+        if self.model_name is not None:
+            TASK_ID_BASES[self.model_name] = base
+
+    async def _first_task(self) -> tuple[int, TaskInformation | None]:
+        """
+        Find the first task ID when it isn't known yet, by reading task 0.
+        Returns the task ID base and task 0 if it could be read.
+        """
+        first = await self.get_task(0)
+        return (0, first) if first is not None else (1, None)
+
     async def get_tasks(self) -> list[TaskInformation]:
         """Get all weekly schedule tasks from the mower."""
+        return await self._read_tasks() or []
+
+    async def _read_tasks(self) -> list[TaskInformation] | None:
+        """
+        The weekly schedule tasks, or None if they couldn't be read. Every
+        GetTask request is sent together once the first task ID is known.
+        """
         task_count = await self.command("GetNumberOfTasks")
         if task_count is None:
-            return []
+            return None
         logger.debug("Mower reported %s schedule tasks", task_count)
+        if not task_count:
+            return []
 
-        for first_task_id in (0, 1):
-            tasks: list[TaskInformation] = []
-            for task_id in range(first_task_id, first_task_id + task_count):
-                task = await self.get_task(task_id)
-                if task is None:
-                    logger.debug("Unable to read schedule task %s", task_id)
-                    break
-                tasks.append(task)
-            if len(tasks) == task_count:
+        # The first task ID is remembered by model
+        await self._load_model()
+        base = self._known_task_id_base()
+        tasks = await self._read_tasks_from(base, task_count)
+        if tasks is None and base is not None:
+            # The remembered first task ID may not be right for this mower
+            tasks = await self._read_tasks_from(None, task_count)
+        if tasks is None:
+            logger.debug("Unable to read mower schedule tasks")
+        return tasks
+
+    async def _read_tasks_from(
+        self, base: int | None, task_count: int
+    ) -> list[TaskInformation] | None:
+        tasks: list[TaskInformation] = []
+        if base is None:
+            base, first = await self._first_task()
+            if first is not None:
+                tasks.append(first)
+
+        results = await self.command_batch(
+            [
+                ("GetTask", {"taskId": task_id})
+                for task_id in range(base + len(tasks), base + task_count)
+            ],
+            warn_on_error=False,
+        )
+        for result, task in results:
+            if result is not ResponseResult.OK or task is None:
                 logger.debug(
-                    "Read %s schedule tasks starting at task id %s",
-                    len(tasks),
-                    first_task_id,
+                    "Unable to read schedule tasks starting at task id %s", base
                 )
-                return tasks
+                return None
+            tasks.append(self._task_information(task))
 
-        logger.debug("Unable to read mower schedule tasks")
-        return []
+        logger.debug("Read %s schedule tasks starting at task id %s", len(tasks), base)
+        self._remember_task_id_base(base)
+        return tasks
+
+    async def iter_tasks(self) -> AsyncIterator[TaskInformation]:
+        """
+        Yield the weekly schedule tasks in order, each as soon as it has
+        been read. Every GetTask request is sent together, the iteration
+        stops early if a task can't be read.
+        """
+        task_count = await self.command("GetNumberOfTasks")
+        if not task_count:
+            return
+
+        # The first task ID is remembered by model
+        await self._load_model()
+        base = self._known_task_id_base()
+        if base is not None:
+            read = 0
+            async for task in self._iter_tasks_from(base, base, task_count):
+                read += 1
+                yield task
+            if read:
+                return
+            # The remembered first task ID may not be right for this mower
+
+        base, first = await self._first_task()
+        start = base
+        if first is not None:
+            start += 1
+            yield first
+        async for task in self._iter_tasks_from(base, start, task_count):
+            yield task
+
+    async def _iter_tasks_from(
+        self, base: int, start: int, task_count: int
+    ) -> AsyncIterator[TaskInformation]:
+        async def read_task(task_id: int) -> TaskInformation | None:
+            ((result, task),) = await self.command_batch(
+                [("GetTask", {"taskId": task_id})], warn_on_error=False
+            )
+            if result is not ResponseResult.OK or task is None:
+                return None
+            return self._task_information(task)
+
+        reads = [
+            asyncio.create_task(read_task(task_id))
+            for task_id in range(start, base + task_count)
+        ]
+        try:
+            for task_id, read in enumerate(reads, start):
+                task = await read
+                if task is None:
+                    logger.debug("Unable to read schedule task %s", task_id)
+                    return
+                yield task
+            self._remember_task_id_base(base)
+        finally:
+            # Unneeded reads are finished rather than cancelled, a late
+            # response to a cancelled GetTask would be taken as the response
+            # to the next one
+            await asyncio.gather(*reads, return_exceptions=True)
 
-    async def set_tasks(self, tasks: list[TaskInformation]) -> None:
-        """Replace the weekly schedule tasks on the mower."""
+    async def set_tasks(
+        self,
+        tasks: list[TaskInformation],
+        current: list[TaskInformation] | None = None,
+        force: bool = False,
+    ) -> ScheduleWriteReport:
+        """
+        Replace the weekly schedule tasks on the mower.
+
+        The schedule is only written if it differs from the tasks on the
+        mower, which are read unless the caller passes a `current` read.
+        Tasks are compared in whole minutes, as `get_task()` returns them,
+        and in any order. `force` writes the schedule regardless. A mower
+        that is parked until further notice is resumed whenever `tasks`
+        isn't empty, even if the schedule was already on the mower.
+        """
         if len(tasks) > MAX_SCHEDULE_TASKS:
             raise ValueError(
                 f"A maximum of {MAX_SCHEDULE_TASKS} schedule tasks is supported"
@@ -537,10 +1066,24 @@ class Mower(BLEClient):
                     "Schedule duration must be between 1 minute and 24 hours"
                 )
 
+        if current is None and not force:
+            current = await self._read_tasks()
+        wanted = Counter(_task_key(task) for task in tasks)
+        existing = Counter(_task_key(task) for task in current or ())
+        added = sum((wanted - existing).values())
+        removed = sum((existing - wanted).values())
+        unchanged = current is not None and not force and not added and not removed
+
         was_permanently_parked = False
         if tasks:
             was_permanently_parked = await self.mower_is_permanently_parked()
 
+        if unchanged:
+            logger.debug("Schedule is unchanged, not writing %s tasks", len(tasks))
+            if was_permanently_parked:
+                await self._resume_schedule()
+            return ScheduleWriteReport(False, (), 0, 0, was_permanently_parked)
+
         await self._expect_ok("StartTaskTransaction")
         await self._expect_ok("DeleteAllTask")
 
@@ -574,10 +1117,20 @@ class Mower(BLEClient):
             )
 
         await self._expect_ok("CommitTaskTransaction")
-        if tasks and was_permanently_parked:
-            result = await self.mower_resume_schedule()
-            if result is not ResponseResult.OK:
-                raise RuntimeError(f"SetMode returned {result.name}")
+        if was_permanently_parked:
+            await self._resume_schedule()
+
+        if current is None:
+            # The schedule on the mower is unknown, everything is counted
+            added, removed = len(tasks), 0
+        return ScheduleWriteReport(
+            True, tuple(tasks), added, removed, was_permanently_parked
+        )
+
+    async def _resume_schedule(self) -> None:
+        result = await self.mower_resume_schedule()
+        if result is not ResponseResult.OK:
+            raise RuntimeError(f"SetMode returned {result.name}")
 
     async def clear_tasks(self) -> None:
         """Remove all weekly schedule tasks from the mower."""
@@ -610,26 +1163,24 @@ async def main(mower: Mower):
     model = await mower.get_model()
     print("Mower model: " + (model or "Unknown model"))
 
-    charging = await mower.is_charging()
-    if charging:
+    status = await mower.poll_status()
+    if status.is_charging:
         print("Mower is charging")
     else:
         print("Mower is not charging")
 
-    battery_level = await mower.battery_level()
-    print("Battery is: " + str(battery_level) + "%")
+    print("Battery is: " + str(status.battery_level) + "%")
 
-    state = await mower.mower_state()
-    if state is not None:
-        print("Mower state: " + state.name)
+    if status.state is not None:
+        print("Mower state: " + status.state.name)
 
-    activity = await mower.mower_activity()
-    if activity is not None:
-        print("Mower activity: " + activity.name)
+    if status.activity is not None:
+        print("Mower activity: " + status.activity.name)
 
-    next_start_time = await mower.mower_next_start_time()
-    if next_start_time:
-        print("Next start time: " + next_start_time.strftime("%Y-%m-%d %H:%M:%S"))
+    if status.next_start_time:
+        print(
+            "Next start time: " + status.next_start_time.strftime("%Y-%m-%d %H:%M:%S")
+        )
     else:
         print("No next start time")
 
@@ -637,7 +1188,7 @@ async def main(mower: Mower):
     for status, value in statuses.items():
         print(status, value)
 
-    serial_number = await mower.command("GetSerialNumber")
+    serial_number = await mower.device_info.serial_number()
     print("Serial number: " + str(serial_number))
 
     mower_name = await mower.command("GetUserMowerNameAsAsciiString")
@@ -676,15 +1227,12 @@ async def main(mower: Mower):
         print("command result = " + str(cmd_result))
 
     # moved last message after command, this seems to cause all future commands/queries to fail
-    last_message = await mower.command("GetMessage", messageId=0)
-    print("Last message: ")
-    print(
-        "\t"
-        + dt.datetime.fromtimestamp(last_message["time"], dt.UTC).strftime(
-            "%Y-%m-%d %H:%M:%S"
-        )
-    )
-    print("\t" + ErrorCodes(last_message["code"]).name)
+    messages = await MessageLog().sync(mower, max_messages=1)
+    if messages:
+        print("Last message: ")
+        print("\t" + messages[0].time.strftime("%Y-%m-%d %H:%M:%S"))
+        code = messages[0].code
+        print("\t" + (code.name if isinstance(code, ErrorCodes) else str(code)))
 
     await mower.disconnect()
 
@@ -1,7 +1,19 @@
-import binascii
 from .helpers import crc
+from .metrics import Metrics
+from .recorder import NOTIFY, WRITE, FlightRecorder, HexBytes
+from .scheduler import (
+    ConnectionScheduler,
+    ConnectionSlot,
+    adapter_name,
+)
+from .reassembler import FrameReassembler
 from enum import IntEnum
+from dataclasses import dataclass
 import asyncio
+import contextlib
+import struct
+import time
+from collections import deque
 import logging
 import json
 from importlib.resources import files
@@ -11,6 +23,7 @@ from bleak_retry_connector import establish_connection, BleakClientWithServiceCa
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
     from bleak import BleakClient
 
 logger = logging.getLogger(__name__)
@@ -18,6 +31,15 @@ logger = logging.getLogger(__name__)
 GARDENA_WRITE_CHAR = "98bd0002-0b0e-421a-84e5-ddbf75dc6de4"
 GARDENA_READ_CHAR = "98bd0003-0b0e-421a-84e5-ddbf75dc6de4"
 GARDENA_PROTOCOL_DESCRIPTOR_CHAR = "98bd0004-0b0e-421a-84e5-ddbf75dc6de4"
+RESPONSE_TIMEOUT = 10
+# Longest time to wait for the mower to answer the channel setup after
+# subscribing to notifications
+READY_TIMEOUT = 10.0
+# Time to wait for an answer to a single channel setup probe
+READY_PROBE_TIMEOUT = 0.5
+# Delays between channel setup probes, the last one is repeated
+READY_BACKOFF = (0.05, 0.1, 0.25, 0.5)
+DEFAULT_MAX_IN_FLIGHT = 4
 GATT_AUTH_ERROR_TEXT = (
     "Insufficient authentication",
     "Insufficient authorization",
@@ -25,6 +47,26 @@ GATT_AUTH_ERROR_TEXT = (
 )
 
 
+# struct format characters for the protocol.json request types
+_REQUEST_FORMATS = {
+    "uint32": "I",
+    "uint16": "H",
+    "uint8": "B",
+    "bool": "?",
+}
+
+
+# struct format characters for the fixed size protocol.json response types
+_RESPONSE_FORMATS = {
+    "uint32": "I",
+    "tUnixTime": "I",
+    "uint16": "H",
+    "sint16": "h",
+    "uint8": "B",
+    "bool": "B",
+}
+
+
 class ModeOfOperation(IntEnum):
     # ProtocolTypes$IMowerAppMowerMode, used in modeOfOperation: 4586, 1
     # Comments from: https://developer.husqvarnagroup.cloud/apis/Automower+Connect+API?tab=status%20description%20and%20error%20codes#user-content-mode
@@ -91,10 +133,41 @@ def _response_result_label(value: int) -> str:
     return f"{result.name}({value})"
 
 
+def _response_result_name(frame: bytearray) -> str:
+    if _frame_id(frame) is None:
+        # The channel setup and handshake responses don't carry a result
+        return ResponseResult.OK.name
+    try:
+        return ResponseResult(frame[16]).name
+    except ValueError:
+        return str(frame[16])
+
+
+def _frame_id(frame: bytes | bytearray) -> tuple[int, int] | None:
+    """Return the (major, minor) command ID of a linked request or response"""
+    if len(frame) < 15 or frame[8] != 0x01:
+        return None
+    return (frame[12] | (frame[13] << 8), frame[14])
+
+
 def _is_gatt_auth_error(err: Exception) -> bool:
     return any(text in str(err) for text in GATT_AUTH_ERROR_TEXT)
 
 
+@dataclass(frozen=True, slots=True)
+class MowerEvent:
+    """
+    An event frame pushed by the mower. `data` is decoded with the
+    protocol.json command of the same (major, minor) ID when there is one,
+    otherwise it is the raw payload.
+    """
+
+    event_id: tuple[int, int] | None
+    name: str | None
+    data: dict[str, int | str] | bytes | None
+    frame: bytes
+
+
 class TaskInformation:
     def __init__(
         self,
@@ -137,133 +210,273 @@ class Command:
             self.response_data_type = parameter["responseType"]
         self.request_data = bytearray()
 
-    def generate_request(self, **kwargs) -> bytearray:
-        self.request_data = bytearray(18)
-        self.request_data[0] = 0x02  # Hard coded value (start of packet)
-        self.request_data[1] = 0xFD  # 0xFD = LINKED_PACKET_TYPE
-        self.request_data[2] = 0x00  # Length, low byte, updated later
-        self.request_data[3] = 0x00  # Length, high byte, updated later
-
-        # ChannelID
-        self.request_data[4:8] = self.channel_id.to_bytes(4, byteorder="little")
+        self._compile_request()
+        self._compile_response()
 
-        self.request_data[8] = 0x01  # is_linked (usually 0x01)
+    def _compile_request(self) -> None:
+        """
+        Precompute everything about the request frame that does not depend
+        on the request parameters, so `generate_request()` only has to pack
+        the parameters and finish the CRC.
+        """
+        self._request_names: tuple[str, ...] = ()
+        self._request_error: str | None = None
+        fmt = "<"
+        if self.request_data_type is not None:
+            self._request_names = tuple(self.request_data_type)
+            for request_type in self.request_data_type.values():
+                if request_type not in _REQUEST_FORMATS:
+                    self._request_error = "Unknown request type: " + request_type
+                    break
+                fmt += _REQUEST_FORMATS[request_type]
+        self._request_struct = struct.Struct(fmt)
+        request_length = self._request_struct.size
+
+        header = bytearray(18)
+        header[0] = 0x02  # Hard coded value (start of packet)
+        header[1] = 0xFD  # 0xFD = LINKED_PACKET_TYPE
+        header[2] = 16 + request_length  # Length, low byte
+        header[3] = 0x00  # Length, high byte
 
-        self.request_data[9] = 0x00  # CRC, Updated later
-        self.request_data[10] = (
-            0x00  # Packet type (0x00 = request, 0x01 = response, 0x02 = event)
-        )
-        self.request_data[11] = 0xAF  # Hard coded value
+        # ChannelID
+        header[4:8] = self.channel_id.to_bytes(4, byteorder="little")
 
-        major_bytes = self.major.to_bytes(2, byteorder="little")
+        header[8] = 0x01  # is_linked (usually 0x01)
+        header[9] = crc(header, 1, 8)  # CRC of the fixed header
+        header[10] = 0x00  # Packet type (0x00 = request, 0x01 = response, 0x02 = event)
+        header[11] = 0xAF  # Hard coded value
 
-        self.request_data[12] = major_bytes[0]  # low byte of 'module'
-        self.request_data[13] = major_bytes[1]  # high byte of 'module'
-        self.request_data[14] = self.minor  # low byte of 'command'
-        self.request_data[15] = 0x00  # high byte of 'command'
+        header[12:14] = self.major.to_bytes(2, byteorder="little")  # 'module'
+        header[14] = self.minor  # low byte of 'command'
+        header[15] = 0x00  # high byte of 'command'
 
         # Byte 16 represents length of request data type
-        request_length = 0
-        request_data = bytearray()
-        if self.request_data_type is not None:
-            for request_name, request_type in self.request_data_type.items():
-                if request_name not in kwargs:
-                    raise ValueError(
-                        "Missing request parameter: "
-                        + request_name
-                        + " for command ("
-                        + str(self.major)
-                        + ", "
-                        + str(self.minor)
-                        + ")"
-                    )
+        header[16] = request_length
+        header[17] = 0x00  # high byte of request_length
 
-                if request_type == "uint32":
-                    request_length += 4
-                    request_data += kwargs[request_name].to_bytes(4, byteorder="little")
-                elif request_type == "uint16":
-                    request_length += 2
-                    request_data += kwargs[request_name].to_bytes(2, byteorder="little")
-                elif request_type == "uint8":
-                    request_length += 1
-                    request_data += kwargs[request_name].to_bytes(1, byteorder="little")
-                elif request_type == "bool":
-                    request_length += 1
-                    request_data += (1 if kwargs[request_name] else 0).to_bytes(
-                        1, byteorder="little"
-                    )
-                else:
-                    raise ValueError("Unknown request type: " + request_type)
-        self.request_data[16] = request_length
-
-        self.request_data[17] = 0x00  # high byte of request_length
-        if request_length > 0:
-            self.request_data += request_data
+        # Two last bytes are crc and 0x03
+        self._request_template = bytes(header + bytes(request_length) + b"\x00\x03")
+        self._request_crc_offset = 18 + request_length
+        # CRC state after the header, the parameters are added on top of this
+        self._request_checksum = crc(header, 1, 17)
 
-        self.request_data[2] = len(self.request_data) - 2  # Length
+        self._request_frame: bytes | None = None
+        if request_length == 0 and self._request_error is None:
+            frame = bytearray(self._request_template)
+            frame[self._request_crc_offset] = self._request_checksum
+            self._request_frame = bytes(frame)
 
-        self.request_data[9] = crc(self.request_data, 1, 8)  # CRC
+    def generate_request(self, **kwargs) -> bytearray:
+        if self._request_frame is not None:
+            self.request_data = bytearray(self._request_frame)
+            return self.request_data
 
-        # Two last bytes are crc and 0x03
-        self.request_data.append(crc(self.request_data, 1, len(self.request_data) - 1))
-        self.request_data.append(0x03)  # Hard coded value
+        try:
+            values = [kwargs[name] for name in self._request_names]
+        except KeyError as err:
+            raise ValueError(
+                "Missing request parameter: "
+                + err.args[0]
+                + " for command ("
+                + str(self.major)
+                + ", "
+                + str(self.minor)
+                + ")"
+            ) from err
+
+        if self._request_error is not None:
+            raise ValueError(self._request_error)
+
+        self.request_data = bytearray(self._request_template)
+        try:
+            self._request_struct.pack_into(self.request_data, 18, *values)
+        except struct.error as err:
+            raise ValueError(
+                f"Invalid request parameters for command ({self.major}, {self.minor}): {err}"
+            ) from err
+        self.request_data[self._request_crc_offset] = crc(
+            self.request_data,
+            18,
+            self._request_struct.size,
+            self._request_checksum,
+        )
 
         return self.request_data
 
-    def parse_response(self, response_data: bytearray) -> dict[str, int | str] | None:
-        response_length = response_data[17]
-        data = response_data[19 : 19 + response_length]
-        response: dict[str, int | str] = {}
-        dpos = 0  # data position
+    def _compile_response(self) -> None:
+        """
+        Build a single struct layout for the fixed size response fields.
+
+        Variable length types (remaining_uint, ascii and utf16) can only be
+        the last field and are decoded from whatever follows the fixed part.
+        Problems with the schema are reported when a response is parsed.
+        """
+        self._response_names: tuple[str, ...] = ()
+        self._response_tail: tuple[str, str] | None = None
+        self._response_error: str | None = None
+        self._no_response = False
+        self._response_min_length = 0
+        names: list[str] = []
+        fmt = "<"
         for name, dtype in self.response_data_type.items():
             if dtype == "no_response":
-                return None
-            if (dtype == "tUnixTime") or (dtype == "uint32"):
-                response[name] = int.from_bytes(
-                    data[dpos : dpos + 4], byteorder="little"
-                )
-                dpos += 4
-            elif dtype == "uint16":
-                response[name] = int.from_bytes(
-                    data[dpos : dpos + 2], byteorder="little"
-                )
-                dpos += 2
-            elif dtype == "sint16":
-                response[name] = int.from_bytes(
-                    data[dpos : dpos + 2], byteorder="little", signed=True
-                )
-                dpos += 2
+                self._no_response = True
+                break
+            if self._response_tail is not None:
+                self._response_error = f"Response type {self._response_tail[1]} must be the last response type"
+                break
+            if dtype in _RESPONSE_FORMATS:
+                names.append(name)
+                fmt += _RESPONSE_FORMATS[dtype]
+                if fmt[-1] == "B":
+                    # Single byte fields can't be read from a partial payload
+                    self._response_min_length = struct.calcsize(fmt)
             elif dtype == "remaining_uint":
-                response[name] = int.from_bytes(data[dpos:], byteorder="little")
-                dpos = len(data)
-            elif (dtype == "uint8") or (dtype == "bool"):
-                response[name] = data[dpos]
-                dpos += 1
+                self._response_tail = (name, dtype)
             elif dtype == "ascii":
                 if len(self.response_data_type) != 1:
-                    raise ValueError(
-                        "ASCII response type can currently only be used when there is only one response type"
-                    )
-                response[name] = data.decode("ascii").rstrip(
-                    "\x00"
-                )  # Remove trailing null bytes
-                dpos += len(data)
+                    self._response_error = "ASCII response type can currently only be used when there is only one response type"
+                    break
+                self._response_tail = (name, dtype)
             elif dtype == "utf16":
                 if len(self.response_data_type) != 1:
-                    raise ValueError(
-                        "UTF-16 response type can currently only be used when there is only one response type"
-                    )
-                try:
-                    response[name] = data.decode("utf-16-le").rstrip("\x00")
-                except UnicodeDecodeError as err:
-                    raise ValueError("Unable to decode UTF-16 response") from err
-                dpos += len(data)
+                    self._response_error = "UTF-16 response type can currently only be used when there is only one response type"
+                    break
+                self._response_tail = (name, dtype)
             else:
-                raise ValueError("Unknown data type: " + dtype)
-        if dpos != len(data):
-            raise ValueError(f"Data length mismatch. Read {dpos} bytes of {len(data)}")
+                self._response_error = "Unknown data type: " + dtype
+                break
+        self._response_names = tuple(names)
+        self._response_struct = struct.Struct(fmt)
+
+    def parse_response(self, response_data: bytearray) -> dict[str, int | str] | None:
+        if self._no_response:
+            return None
+        if self._response_error is not None:
+            raise ValueError(self._response_error)
+
+        # The payload starts at byte 19, decode it in place without copying
+        response_length = max(min(response_data[17], len(response_data) - 19), 0)
+        size = self._response_struct.size
+        source: bytes | bytearray = response_data
+        offset = 19
+        if response_length != size and (
+            self._response_tail is None or response_length < size
+        ):
+            if (
+                self._response_tail is None
+                or self._response_tail[1] != "remaining_uint"
+                or response_length < self._response_min_length
+            ):
+                raise ValueError(
+                    f"Data length mismatch. Read {size} bytes of {response_length}"
+                )
+            # A truncated payload ahead of a remaining_uint has always been
+            # accepted, the missing bytes read as zero.
+            source = bytes(response_data[19 : 19 + response_length]).ljust(size, b"\0")
+            offset = 0
+
+        response: dict[str, int | str] = dict(
+            zip(
+                self._response_names,
+                self._response_struct.unpack_from(source, offset),
+                strict=True,
+            )
+        )
+        if self._response_tail is None:
+            return response
+
+        name, dtype = self._response_tail
+        tail = memoryview(response_data)[19 + size : 19 + response_length]
+        if dtype == "remaining_uint":
+            response[name] = int.from_bytes(tail, byteorder="little")
+        elif dtype == "ascii":
+            # Remove trailing null bytes
+            response[name] = str(tail, "ascii").rstrip("\x00")
+        else:
+            try:
+                response[name] = str(tail, "utf-16-le").rstrip("\x00")
+            except UnicodeDecodeError as err:
+                raise ValueError("Unable to decode UTF-16 response") from err
         return response
 
+    def parse_request(self, request_data: bytearray) -> dict[str, int | bool]:
+        """Decode the parameters of a request built by `generate_request()`"""
+        if self._request_error is not None:
+            raise ValueError(self._request_error)
+        try:
+            values = self._request_struct.unpack_from(request_data, 18)
+        except struct.error as err:
+            raise ValueError(
+                f"Data length mismatch. Read {self._request_struct.size} bytes "
+                f"of {max(len(request_data) - 20, 0)}"
+            ) from err
+        return dict(zip(self._request_names, values, strict=True))
+
+    def parse_event(self, event_data: bytearray) -> dict[str, int | str] | None:
+        """
+        Decode an event frame with the response type of this command.
+        Events carry their payload like a request, without a result byte.
+        """
+        return self.parse_response(event_data[:16] + b"\x00" + event_data[16:])
+
+    def generate_response(self, result: int = ResponseResult.OK, **kwargs) -> bytearray:
+        """
+        Build the response the mower sends for this command, the inverse of
+        `parse_response()`. Response fields that aren't given are zero, and
+        the payload is left out unless the result is OK. The last field can
+        also be given as raw bytes.
+        """
+        if self._response_error is not None:
+            raise ValueError(self._response_error)
+
+        payload = bytearray()
+        if result == ResponseResult.OK and not self._no_response:
+            try:
+                payload += self._response_struct.pack(
+                    *(kwargs.get(name, 0) for name in self._response_names)
+                )
+            except struct.error as err:
+                raise ValueError(
+                    f"Invalid response values for command ({self.major}, {self.minor}): {err}"
+                ) from err
+            if self._response_tail is not None:
+                name, dtype = self._response_tail
+                value = kwargs.get(name)
+                if isinstance(value, (bytes, bytearray)):
+                    payload += value
+                elif dtype == "remaining_uint":
+                    value = value or 0
+                    payload += value.to_bytes(
+                        max((value.bit_length() + 7) // 8, 1), byteorder="little"
+                    )
+                elif dtype == "ascii":
+                    payload += (value or "").encode("ascii") + b"\x00"
+                else:
+                    payload += (value or "").encode("utf-16-le") + b"\x00\x00"
+
+        response_data = bytearray(self._request_template[:16])
+        response_data[2:4] = (17 + len(payload)).to_bytes(2, byteorder="little")
+        response_data[9] = crc(response_data, 1, 8)
+        response_data[10] = 0x01  # Response
+        response_data.append(result)
+        response_data += len(payload).to_bytes(2, byteorder="little")
+        response_data += payload
+        response_data.append(crc(response_data, 1, len(response_data) - 1))
+        response_data.append(0x03)
+        return response_data
+
+    def generate_event(self, **kwargs) -> bytearray:
+        """Build an event frame for this command, the inverse of `parse_event()`"""
+        response_data = self.generate_response(ResponseResult.OK, **kwargs)
+        event_data = response_data[:16] + response_data[17:-2]
+        event_data[2:4] = (len(event_data) - 2).to_bytes(2, byteorder="little")
+        event_data[9] = crc(event_data, 1, 8)
+        event_data[10] = 0x02  # Event
+        event_data.append(crc(event_data, 1, len(event_data) - 1))
+        event_data.append(0x03)
+        return event_data
+
     def validate_command_response(self, response_data: bytearray) -> bool:
         if response_data[0] != 0x02:
             return False
@@ -317,17 +530,78 @@ class Command:
 
 
 class BLEClient:
-    def __init__(self, channel_id: int, address, pin=None):
+    def __init__(
+        self,
+        channel_id: int,
+        address,
+        pin=None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        *,
+        metrics: Metrics | None = None,
+        recorder: FlightRecorder | None = None,
+    ):
         self.channel_id = channel_id
         self.address = address
         self.pin = pin
+        # MTU to assume when the connection can't tell the negotiated one
         self.MTU_SIZE = 20
+        # Bytes written per write_gatt_char(), set from the MTU on connect
+        self.chunk_size = self.MTU_SIZE - 3
 
+        # Held while writing a request. Hold it across several requests to
+        # keep other requests from being sent in between.
         self.lock = asyncio.Lock()
-        self.queue: asyncio.Queue[bytearray] = asyncio.Queue()
+        self.max_in_flight = max_in_flight
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        # Requests waiting for a response, by (major, minor) command ID or
+        # None for the channel setup and handshake. Each entry keeps the
+        # order the requests were sent in.
+        self._pending: dict[
+            tuple[int, int] | None,
+            deque[tuple[int, asyncio.Future[bytearray | None]]],
+        ] = {}
+        self._request_count = 0
+        # Log every GATT service and read every readable characteristic
+        # while connecting, this costs a round trip per characteristic
+        self.dump_characteristics = False
+        # Ceiling for the channel setup probing in connect()
+        self.ready_timeout = READY_TIMEOUT
+        # Time the mower needed to answer the channel setup on the last connect
+        self.ready_time: float | None = None
+        # time.monotonic() of the last response from the mower
+        self.last_activity = 0.0
+        # Timed out requests that may still be answered late, by command ID,
+        # as the time.monotonic() until which their answer is expected
+        self._expired: dict[tuple[int, int] | None, deque[float]] = {}
+        # Responses that matched neither a pending nor a timed out request
+        self.unmatched_responses = 0
+        self.reassembler = FrameReassembler()
+        # Request metrics, None when they aren't collected
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.observe_reassembler(self.reassembler)
+        # Keeps the last raw frames, None when they aren't recorded
+        self.recorder = recorder
+
+        # Limits the connections of each adapter when set, share one
+        # between the clients of an event loop
+        self.scheduler: ConnectionScheduler | None = None
+        # Clients with a higher priority get a connection slot first
+        self.connect_priority = 0
+        self._connection_slot: ConnectionSlot | None = None
+        # Async callbacks for event frames, by (major, minor) event ID
+        self._event_callbacks: dict[
+            tuple[int, int] | None, list[Callable[[MowerEvent], Awaitable[None]]]
+        ] = {}
+        self._event_tasks: set[asyncio.Task] = set()
+        self._command_names: dict[tuple[int, int], str] | None = None
 
         self.client: BleakClient | None = None
-        self.protocol = None
+        # Opens the connection, called like bleak_retry_connector's
+        # establish_connection(). The simulator replaces it.
+        self.connector: Callable[..., Awaitable[BleakClient]] = establish_connection
+        self.protocol: dict | None = None
+        self._commands: dict[str, Command] = {}
         self.write_char: BleakGATTCharacteristic | None = None
         self.read_char: BleakGATTCharacteristic | None = None
         self._notify_started = False
@@ -346,115 +620,315 @@ class BLEClient:
             )
         return self.protocol
 
-    async def _get_response(self):
-        try:
-            data = await asyncio.wait_for(self.queue.get(), timeout=10)
-
-        except TimeoutError:
-            logger.warning("Unable to get response from device: '%s'", self.address)
-            return None
-
-        return data
-
-    async def _write_data(self, data):
-        logger.debug("Writing: %s", str(binascii.hexlify(data)))
-
-        chunk_size = self.MTU_SIZE - 3
-        for chunk in (
-            data[i : i + chunk_size] for i in range(0, len(data), chunk_size)
-        ):
-            await self.client.write_gatt_char(self.write_char, chunk, response=False)
-
-        logger.debug("Finished writing")
-
-    async def _read_data(self):
-        data = await self._get_response()
-
-        if data is None:
-            return None
+    async def get_command(self, command_name: str) -> Command:
+        """
+        Return the compiled `Command` for a protocol.json command name.
 
-        while data and data[0] != 0x02:
-            packet_start = data.find(b"\x02")
-            if packet_start >= 0:
-                logger.debug(
-                    "Discarding stale response prefix: %s",
-                    binascii.hexlify(data[:packet_start]),
+        Commands are compiled once per client (and so per channel ID) and
+        reused for every following request.
+        """
+        command = self._commands.get(command_name)
+        if command is None:
+            command = Command(
+                self.channel_id, (await self.get_protocol())[command_name]
+            )
+            self._commands[command_name] = command
+            if self.metrics is not None:
+                self.metrics.register_command(
+                    (command.major, command.minor), command_name
                 )
-                data = data[packet_start:]
-                break
+        return command
 
-            logger.debug(
-                "Discarding stale response fragment: %s", binascii.hexlify(data)
+    async def _write_data(self, data):
+        logger.debug("Writing: %s", HexBytes(data))
+        if self.recorder is not None:
+            self.recorder.record(WRITE, data)
+
+        chunk_size = self.chunk_size
+        view = memoryview(data)
+        for i in range(0, len(view), chunk_size):
+            await self.client.write_gatt_char(
+                self.write_char, view[i : i + chunk_size], response=False
             )
-            data = await self._get_response()
-            if data is None:
-                return None
-
-        while len(data) < 3:
-            # We got such a small amount of data, let's try again.
-            chunk = await self._get_response()
-            if chunk is None:
-                return None
-            data += chunk
 
-        length = data[2] + 4
+        logger.debug("Finished writing")
 
-        logger.debug("Waiting for %d bytes", length)
+    def _handle_notification(
+        self, characteristic: BleakGATTCharacteristic, data: bytearray
+    ) -> None:
+        logger.debug("Received: %s", HexBytes(data))
+        if self.recorder is not None:
+            self.recorder.record(NOTIFY, data)
+        if self.metrics is not None:
+            self.metrics.notification_bytes += len(data)
+        for frame in self.reassembler.feed(data):
+            self._dispatch_frame(frame)
+
+    def _dispatch_frame(self, frame: bytearray) -> None:
+        """Hand a complete frame to the request that is waiting for it"""
+        frame_id = _frame_id(frame)
+        # Only linked frames have a packet type, the channel setup and
+        # handshake answers are never events
+        if frame_id is not None and frame[10] == 0x02:
+            # Events are pushed by the mower, they never answer a request
+            self.last_activity = time.monotonic()
+            self._dispatch_event(frame)
+            return
+
+        if frame_id in self._expired and self._take_expired(frame_id):
+            # The mower answers the requests with one command ID in order,
+            # so the next answer belongs to the request that timed out, not
+            # to one that was sent after it
+            logger.debug("Discarding late response: %s", HexBytes(frame))
+            return
+        if frame_id not in self._pending:
+            # A response answers a request with the same command ID, any
+            # other frame would be handed to the wrong caller
+            self.unmatched_responses += 1
+            logger.debug("Discarding unexpected response: %s", HexBytes(frame))
+            return
+
+        waiters = self._pending[frame_id]
+        _, future = waiters.popleft()
+        if not waiters:
+            del self._pending[frame_id]
+        self.last_activity = time.monotonic()
+        if not future.done():
+            future.set_result(frame)
+
+    def _take_expired(self, frame_id: tuple[int, int] | None) -> bool:
+        """
+        Use up the late answer expected for a timed out request, if there
+        is one. An answer that is more than RESPONSE_TIMEOUT late is taken
+        to be lost, so it doesn't take the answers of later requests.
+        """
+        deadlines = self._expired[frame_id]
+        now = time.monotonic()
+        while deadlines and deadlines[0] <= now:
+            deadlines.popleft()
+        taken = bool(deadlines)
+        if taken:
+            deadlines.popleft()
+        if not deadlines:
+            del self._expired[frame_id]
+        return taken
+
+    def add_event_callback(
+        self,
+        event_id: tuple[int, int],
+        callback: "Callable[[MowerEvent], Awaitable[None]]",
+    ) -> None:
+        """
+        Call the async `callback` with every event the mower sends with the
+        (major, minor) `event_id`. Callbacks are kept across reconnects,
+        but subscriptions on the mower side have to be sent again.
+        """
+        self._event_callbacks.setdefault(event_id, []).append(callback)
 
-        while len(data) < length:
+    def remove_event_callback(
+        self,
+        event_id: tuple[int, int],
+        callback: "Callable[[MowerEvent], Awaitable[None]]",
+    ) -> None:
+        callbacks = self._event_callbacks.get(event_id)
+        if callbacks is not None and callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self._event_callbacks[event_id]
+
+    def _dispatch_event(self, frame: bytearray) -> None:
+        event_id = _frame_id(frame)
+        callbacks = self._event_callbacks.get(event_id)
+        if not callbacks:
+            logger.debug("Discarding event without a callback: %s", HexBytes(frame))
+            return
+        task = asyncio.create_task(self._run_event_callbacks(bytes(frame), callbacks))
+        self._event_tasks.add(task)
+        task.add_done_callback(self._event_tasks.discard)
+
+    async def _run_event_callbacks(
+        self,
+        frame: bytes,
+        callbacks: "list[Callable[[MowerEvent], Awaitable[None]]]",
+    ) -> None:
+        event = await self._decode_event(frame)
+        for callback in list(callbacks):
             try:
-                data = data + await asyncio.wait_for(self.queue.get(), timeout=5)
-            except TimeoutError:
-                logger.error(
-                    "Unable to get full response from device '%s', currently have %s",
-                    self.address,
-                    str(binascii.hexlify(data)),
-                )
-                logger.error("Expecting %d bytes, only have %d", length, len(data))
-                return None
+                await callback(event)
+            except Exception:
+                logger.exception("Event callback for %s failed", event.event_id)
+
+    async def _decode_event(self, frame: bytes) -> MowerEvent:
+        event_id = _frame_id(frame)
+        if self._command_names is None:
+            names = {}
+            for command_name, parameter in (await self.get_protocol()).items():
+                names[(parameter["major"], parameter["minor"])] = command_name
+            self._command_names = names
+
+        name = self._command_names.get(event_id) if event_id else None
+        data: dict[str, int | str] | bytes | None = bytes(frame[18:-2])
+        if name is not None:
+            try:
+                parsed = (await self.get_command(name)).parse_event(bytearray(frame))
+            except ValueError as err:
+                logger.debug("Unable to decode %s event: %s", name, err)
+            else:
+                if parsed is not None:
+                    data = parsed
+        return MowerEvent(event_id, name, data, frame)
 
-        logger.debug("Final response: %s", str(binascii.hexlify(data)))
+    def _add_waiter(self, request_data: bytearray) -> asyncio.Future:
+        future: asyncio.Future[bytearray | None] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._request_count += 1
+        self._pending.setdefault(_frame_id(request_data), deque()).append(
+            (self._request_count, future)
+        )
+        return future
 
-        return data
+    def _remove_waiter(
+        self, request_data: bytearray, future: asyncio.Future, expired: bool = False
+    ) -> None:
+        """
+        Stop waiting for a response. If the request `expired` while the
+        connection is kept, a late response to it will be discarded.
+        """
+        frame_id = _frame_id(request_data)
+        waiters = self._pending.get(frame_id)
+        if waiters is None:
+            return
+        for waiter in waiters:
+            if waiter[1] is future:
+                waiters.remove(waiter)
+                if expired:
+                    self._expired.setdefault(frame_id, deque()).append(
+                        time.monotonic() + RESPONSE_TIMEOUT
+                    )
+                break
+        if not waiters:
+            del self._pending[frame_id]
+
+    def _fail_pending(self) -> None:
+        """Wake up every request that is still waiting for a response"""
+        pending = self._pending
+        self._pending = {}
+        self._expired.clear()
+        for waiters in pending.values():
+            for _, future in waiters:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _request_response(self, request_data, disconnect_on_error=True):
+        """
+        Send a request and wait for the response.
 
-    async def _request_response(self, request_data):
+        The lock is only held while the request is written, so other
+        requests can be sent while this one is waiting for its response.
+        """
         async with self.lock:
-            return await self._request_response_locked(request_data)
+            sent = time.monotonic()
+            future = await self._send_request_locked(request_data, disconnect_on_error)
+        if future is None:
+            return None
+        return await self._wait_for_response(
+            request_data, future, disconnect_on_error, sent
+        )
 
-    async def _request_response_locked(self, request_data):
+    async def _request_response_locked(self, request_data, disconnect_on_error=True):
         """Send a request while the caller already holds the BLE command lock."""
-        try:
-            # If there are previous responses, flush them out
-            while not self.queue.empty():
-                await self.queue.get()
+        sent = time.monotonic()
+        future = await self._send_request_locked(request_data, disconnect_on_error)
+        if future is None:
+            return None
+        return await self._wait_for_response(
+            request_data, future, disconnect_on_error, sent
+        )
 
+    async def _send_request_locked(
+        self, request_data, disconnect_on_error: bool
+    ) -> asyncio.Future | None:
+        await self._in_flight.acquire()
+        future = self._add_waiter(request_data)
+        try:
             await self._write_data(request_data)
-
-            response_data = await self._read_data()
-            if response_data is None:
-                logger.warning("Unable to communicate with device: '%s'", self.address)
-                if self.is_connected():
+        except BaseException as err:
+            # Nothing waits for a response to a request that wasn't written
+            self._remove_waiter(request_data, future)
+            self._in_flight.release()
+            if isinstance(err, asyncio.exceptions.CancelledError):
+                logger.debug("Received CancelledError")
+                if disconnect_on_error and self.is_connected():
                     await self.disconnect()
                 return None
+            if isinstance(err, BleakError):
+                logger.warning("BLE communication failed: %s", err)
+                if disconnect_on_error and self.is_connected():
+                    await self.disconnect()
+            raise
+        if self.metrics is not None:
+            self.metrics.request_sent(_frame_id(request_data), len(request_data))
+        return future
 
+    async def _wait_for_response(
+        self,
+        request_data,
+        future: asyncio.Future,
+        disconnect_on_error: bool,
+        sent: float,
+    ):
+        try:
+            response_data = await asyncio.wait_for(future, timeout=RESPONSE_TIMEOUT)
+        except TimeoutError:
+            self._remove_waiter(request_data, future, expired=True)
+            if self.metrics is not None:
+                self.metrics.timed_out(_frame_id(request_data))
+            if self.recorder is not None:
+                self.recorder.trigger("timeout")
+            logger.warning("Unable to get response from device: '%s'", self.address)
+            if len(self.reassembler):
+                # The partial frame may belong to another request that is
+                # still in flight, the reassembler resyncs by itself if it
+                # is broken
+                logger.error(
+                    "Unable to get full response from device '%s', %d bytes pending",
+                    self.address,
+                    len(self.reassembler),
+                )
+            response_data = None
         except asyncio.exceptions.CancelledError:
+            self._remove_waiter(request_data, future, expired=True)
             logger.debug("Received CancelledError")
-            if self.is_connected():
+            if disconnect_on_error and self.is_connected():
                 await self.disconnect()
             return None
-        except BleakError as err:
-            logger.warning("BLE communication failed: %s", err)
-            if self.is_connected():
+        finally:
+            self._in_flight.release()
+
+        if response_data is None:
+            logger.warning("Unable to communicate with device: '%s'", self.address)
+            if disconnect_on_error and self.is_connected():
                 await self.disconnect()
-            raise
+            return None
+
+        if self.metrics is not None:
+            self.metrics.response_received(
+                _frame_id(request_data),
+                _response_result_name(response_data),
+                len(response_data),
+                time.monotonic() - sent,
+            )
 
+        logger.debug("Final response: %s", HexBytes(response_data))
         return response_data
 
     async def connect(self, device) -> ResponseResult:
         """
         Connect to a device and setup the channel
 
-        Returns a ResponseResult
+        Returns a ResponseResult. Raises `SlotTimeout` if a `scheduler` is
+        set and no connection slot became free in time.
         """
         if self.is_connected():
             logger.debug("Already connected")
@@ -469,13 +943,24 @@ class BLEClient:
         self.write_char = None
         self.read_char = None
         self._notify_started = False
+        self.reassembler.reset()
+        self._fail_pending()
 
+        adapter = adapter_name(device)
+        self._release_connection_slot()
+        self._connection_slot = await self._take_connection_slot(adapter)
         logger.info("connecting to device...")
-        self.client = await establish_connection(
-            BleakClientWithServiceCache,
-            device,
-            device.name or "Unknown Device",
-        )
+        try:
+            async with self._connect_attempt(adapter):
+                self.client = await self.connector(
+                    BleakClientWithServiceCache,
+                    device,
+                    device.name or "Unknown Device",
+                    disconnected_callback=self._on_disconnected,
+                )
+        except BaseException:
+            self._release_connection_slot()
+            raise
         logger.info("connected")
 
         logger.info("pairing device...")
@@ -487,60 +972,11 @@ class BLEClient:
             if not self.client.is_connected:
                 return ResponseResult.UNKNOWN_ERROR
 
-        # This is not safe, _mtu_size is not defined in BaseBleakClient but may
-        # be defined in subclasses.
-        self.client._backend._mtu_size = self.MTU_SIZE  # type: ignore[attr-defined]
-
-        for service in self.client.services:
-            logger.info("[Service] %s", service)
-
-            for char in service.characteristics:
-                if char.uuid == GARDENA_WRITE_CHAR:
-                    self.write_char = char
+        if self.dump_characteristics:
+            await self._dump_characteristics(self.client)
 
-                if char.uuid == GARDENA_READ_CHAR:
-                    self.read_char = char
-
-                if char.uuid in (GARDENA_WRITE_CHAR, GARDENA_READ_CHAR):
-                    logger.debug(
-                        "  [Characteristic] %s (%s)",
-                        char,
-                        ",".join(char.properties),
-                    )
-                    continue
-
-                if "read" in char.properties:
-                    try:
-                        value = await self.client.read_gatt_char(char.uuid)
-                        logger.debug(
-                            "  [Characteristic] %s (%s), Value: %r",
-                            char,
-                            ",".join(char.properties),
-                            value,
-                        )
-                    except Exception as e:
-                        logger.debug(
-                            "  [Characteristic] %s (%s), Error: %s",
-                            char,
-                            ",".join(char.properties),
-                            e,
-                        )
-                        if (
-                            char.uuid == "98bd0002-0b0e-421a-84e5-ddbf75dc6de4"
-                            or char.uuid == "98bd0003-0b0e-421a-84e5-ddbf75dc6de4"
-                        ):
-                            return ResponseResult.NOT_ALLOWED
-
-                else:
-                    logger.debug(
-                        "  [Characteristic] %s (%s)", char, ",".join(char.properties)
-                    )
-
-        async def notification_handler(
-            characteristic: BleakGATTCharacteristic, data: bytearray
-        ):
-            logger.debug("Received: %s", str(binascii.hexlify(data)))
-            await self.queue.put(data)
+        self.write_char = self.client.services.get_characteristic(GARDENA_WRITE_CHAR)
+        self.read_char = self.client.services.get_characteristic(GARDENA_READ_CHAR)
 
         if self.write_char is None or self.read_char is None:
             logger.error("Gardena protocol characteristics not found")
@@ -548,8 +984,11 @@ class BLEClient:
                 await self.disconnect()
             return ResponseResult.UNKNOWN_ERROR
 
+        self.chunk_size = await self._negotiated_mtu(self.client) - 3
+        logger.debug("Writing requests in chunks of %d bytes", self.chunk_size)
+
         try:
-            await self.client.start_notify(self.read_char, notification_handler)
+            await self.client.start_notify(self.read_char, self._handle_notification)
             self._notify_started = True
         except BleakError as err:
             if _is_gatt_auth_error(err):
@@ -560,7 +999,9 @@ class BLEClient:
                 try:
                     await self.client.pair()
                     await asyncio.sleep(1.0)
-                    await self.client.start_notify(self.read_char, notification_handler)
+                    await self.client.start_notify(
+                        self.read_char, self._handle_notification
+                    )
                     self._notify_started = True
                 except BleakError as retry_err:
                     logger.warning(
@@ -577,11 +1018,10 @@ class BLEClient:
                     await self.disconnect()
                 return ResponseResult.NOT_ALLOWED
 
-        await asyncio.sleep(5.0)
-
-        request = self.generate_request_setup_channel_id()
-        response = await self._request_response(request)
+        response = await self._wait_until_ready(device.name or "Unknown Device")
         if response is None:
+            if self.is_connected():
+                await self.disconnect()
             return ResponseResult.UNKNOWN_ERROR
 
         request = self.generate_request_handshake()
@@ -590,9 +1030,7 @@ class BLEClient:
             return ResponseResult.UNKNOWN_ERROR
 
         if self.pin is not None:
-            command = Command(
-                self.channel_id, (await self.get_protocol())["EnterOperatorPin"]
-            )
+            command = await self.get_command("EnterOperatorPin")
             request = command.generate_request(code=self.pin)
             response = await self._request_response(request)
             if response is None:
@@ -607,6 +1045,194 @@ class BLEClient:
 
         return ResponseResult.OK
 
+    async def _wait_until_ready(self, name: str) -> bytearray | None:
+        """
+        Send the channel setup until the mower answers it. Mowers ignore
+        requests for a while after notifications are enabled, how long
+        depends on the model.
+        """
+        request = self.generate_request_setup_channel_id()
+        start = time.monotonic()
+        attempts = 0
+        # Probes that haven't been answered yet, with the time they were
+        # sent. A late answer to an earlier probe is as good as an answer
+        # to the current one, the mower answers them in order.
+        probes: list[tuple[asyncio.Future, float]] = []
+
+        try:
+            while True:
+                remaining = self.ready_timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    logger.warning(
+                        "Device '%s' not ready after %.1fs and %d channel setup attempts",
+                        self.address,
+                        self.ready_timeout,
+                        attempts,
+                    )
+                    return None
+
+                attempts += 1
+                future = await self._send_probe(request)
+                if future is not None:
+                    probes.append((future, time.monotonic()))
+                response, sent = await self._probe_answer(
+                    probes, min(READY_PROBE_TIMEOUT, remaining)
+                )
+                if response is not None:
+                    if self.validate_setup_response(response):
+                        break
+                    logger.warning(
+                        "Invalid channel setup response: %s", HexBytes(response)
+                    )
+
+                delay = READY_BACKOFF[min(attempts, len(READY_BACKOFF)) - 1]
+                await asyncio.sleep(
+                    min(delay, max(0, self.ready_timeout - (time.monotonic() - start)))
+                )
+
+            # The answers to the other probes would be taken as the answer
+            # to the handshake, wait for them to arrive first. The mower
+            # answers them one after the other, a probe that isn't answered
+            # within two round trips of the last answer was ignored. The
+            # answer came at least as long after the last probe sent before it.
+            answered_at = self.last_activity
+            last_sent = max([sent] + [t for _, t in probes if t <= answered_at])
+            round_trip = 2 * (answered_at - last_sent)
+            unanswered = {future for future, _ in probes}
+            while unanswered:
+                remaining = self.ready_timeout - (time.monotonic() - start)
+                answered, unanswered = await asyncio.wait(
+                    unanswered,
+                    timeout=max(0, min(round_trip, remaining)),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not answered:
+                    break
+        finally:
+            # Probes that are still unanswered were ignored by a mower that
+            # wasn't ready yet. Expecting late answers to them would take
+            # the answer to the handshake.
+            for future, _ in probes:
+                if not future.done():
+                    self._remove_waiter(request, future)
+
+        self.ready_time = time.monotonic() - start
+        logger.info(
+            "%s ready after %.2fs and %d channel setup attempts",
+            name,
+            self.ready_time,
+            attempts,
+        )
+        return response
+
+    async def _send_probe(self, request_data) -> asyncio.Future | None:
+        """Send one channel setup probe, a failed write isn't an error"""
+        try:
+            async with self.lock:
+                future = await self._send_request_locked(request_data, False)
+        except BleakError:
+            return None
+        if future is not None:
+            # The probe keeps waiting for its answer without taking one of
+            # the requests in flight
+            self._in_flight.release()
+        return future
+
+    async def _probe_answer(
+        self, probes: list[tuple[asyncio.Future, float]], wait: float
+    ) -> tuple[bytearray | None, float]:
+        """
+        Wait up to `wait` seconds for any probe to be answered, return the
+        first answer and the time its probe was sent
+        """
+        if probes and not any(future.done() for future, _ in probes):
+            await asyncio.wait([future for future, _ in probes], timeout=wait)
+        for probe in probes:
+            future, sent = probe
+            if future.done():
+                probes.remove(probe)
+                return future.result(), sent
+        return None, 0.0
+
+    async def _negotiated_mtu(self, client: "BleakClient") -> int:
+        """The MTU of the connection, or MTU_SIZE if it isn't known"""
+        # BlueZ only knows the MTU after a write has been acquired, without
+        # it mtu_size returns the minimum MTU of 23
+        backend = getattr(client, "_backend", None)
+        if backend is not None and getattr(backend, "_mtu_size", 0) is None:
+            acquire_mtu = getattr(backend, "_acquire_mtu", None)
+            if acquire_mtu is not None:
+                try:
+                    await acquire_mtu()
+                except Exception as err:
+                    logger.debug("Unable to acquire the MTU: %s", err)
+            if backend._mtu_size is None:
+                return self.MTU_SIZE
+
+        try:
+            mtu = client.mtu_size
+        except Exception as err:
+            logger.debug("Unable to read the MTU: %s", err)
+            return self.MTU_SIZE
+        return max(mtu, self.MTU_SIZE)
+
+    def _on_disconnected(self, client: "BleakClient") -> None:
+        """Called by bleak when the connection is closed, by either side"""
+        logger.debug(
+            "Disconnected from '%s' after %.1fs idle",
+            self.address,
+            time.monotonic() - self.last_activity,
+        )
+        if client is self.client:
+            self._release_connection_slot()
+
+    async def _take_connection_slot(self, adapter: str) -> ConnectionSlot | None:
+        if self.scheduler is None:
+            return None
+        return await self.scheduler.connection(adapter, self.connect_priority)
+
+    def _connect_attempt(
+        self, adapter: str
+    ) -> contextlib.AbstractAsyncContextManager[None]:
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.attempt(adapter, self.connect_priority)
+
+    def _release_connection_slot(self) -> None:
+        if self._connection_slot is not None:
+            self._connection_slot.release()
+            self._connection_slot = None
+
+    async def _dump_characteristics(self, client: "BleakClient") -> None:
+        """Log every service and the value of every readable characteristic"""
+        for service in client.services:
+            logger.info("[Service] %s", service)
+
+            for char in service.characteristics:
+                properties = ",".join(char.properties)
+                if char.uuid in (GARDENA_WRITE_CHAR, GARDENA_READ_CHAR):
+                    logger.debug("  [Characteristic] %s (%s)", char, properties)
+                    continue
+
+                if "read" in char.properties:
+                    try:
+                        value = await client.read_gatt_char(char.uuid)
+                        logger.debug(
+                            "  [Characteristic] %s (%s), Value: %r",
+                            char,
+                            properties,
+                            value,
+                        )
+                    except Exception as e:
+                        logger.debug(
+                            "  [Characteristic] %s (%s), Error: %s",
+                            char,
+                            properties,
+                            e,
+                        )
+                else:
+                    logger.debug("  [Characteristic] %s (%s)", char, properties)
+
     def is_connected(self) -> bool:
         return bool(self.client and self.client.is_connected)
 
@@ -615,13 +1241,23 @@ class BLEClient:
         if device is None:
             raise BleakError(f"Could not find device with address '{self.address}'")
 
-        client = await establish_connection(
-            BleakClientWithServiceCache,
-            device,
-            device.name or "Unknown Device",
-            max_attempts=3,  # Will retry up to 3 times with backoff
-        )
-        logger.info("connected")
+        adapter = adapter_name(device)
+        slot = await self._take_connection_slot(adapter)
+        try:
+            async with self._connect_attempt(adapter):
+                client = await establish_connection(
+                    BleakClientWithServiceCache,
+                    device,
+                    device.name or "Unknown Device",
+                    max_attempts=3,  # Will retry up to 3 times with backoff
+                )
+            logger.info("connected")
+            return await self._probe_client(client)
+        finally:
+            if slot is not None:
+                slot.release()
+
+    async def _probe_client(self, client: "BleakClient"):
 
         manufacture = None
         model = None
@@ -689,14 +1325,18 @@ class BLEClient:
         """
 
         logger.info("disconnecting...")
-        await self.client.disconnect()
+        try:
+            await self.client.disconnect()
+        finally:
+            self._release_connection_slot()
         logger.info("disconnected")
         self.client = None
         self.write_char = None
         self.read_char = None
+        self.chunk_size = self.MTU_SIZE - 3
         self._notify_started = False
-
-        await self.queue.put(None)
+        self.reassembler.reset()
+        self._fail_pending()
 
     def generate_request_setup_channel_id(self) -> bytearray:
         """
@@ -769,10 +1409,26 @@ class BLEClient:
 
         return True
 
+    def validate_setup_response(self, response_data: bytearray) -> bool:
+        """Check that a frame can be the answer to the channel setup"""
+        return (
+            len(response_data) >= 12
+            and response_data[0] == 0x02
+            and response_data[1] == 0xFD
+            and response_data[2] + 4 == len(response_data)
+            and response_data[8] != 0x01  # Not a response to a command
+            and response_data[9] == crc(response_data, 1, 8)
+            and response_data[-1] == 0x03
+        )
+
     def get_response_result(self, response_data: bytearray) -> ResponseResult:
         if self.validate_response(response_data) is False:
             # Just log if the response is invalid as this has been seen with user
             # logs from official apps. I.e. it is somewhat expected.
             logger.warning("Response failed validation")
+            if self.metrics is not None:
+                self.metrics.validation_failed(_frame_id(response_data))
+            if self.recorder is not None:
+                self.recorder.trigger("validation")
 
         return ResponseResult(response_data[16])
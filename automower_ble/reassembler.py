@@ -0,0 +1,132 @@
+"""
+Reassemble protocol frames from the BLE notification stream
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+from .helpers import Crc8, crc
+
+# Start byte, length, channel ID, is_linked and header CRC
+HEADER_LENGTH = 10
+
+
+class FrameReassembler:
+    """
+    Incrementally reassemble frames from BLE notification chunks.
+
+    Chunks are appended to a preallocated buffer that only grows when a
+    frame doesn't fit. Every call to `feed()` returns the frames completed
+    by that chunk, which can be none, one or several. Frames are only
+    returned once both CRCs and the end byte have been checked, anything
+    that doesn't look like a frame is skipped until the next start byte.
+
+    The frame CRC is updated as each chunk arrives, so completing a frame
+    only needs the CRC of the last chunk.
+    """
+
+    def __init__(self, size: int = 256):
+        self._buffer = bytearray(size)
+        self._start = 0  # First byte that hasn't been consumed yet
+        self._end = 0  # End of the buffered data
+        # The header at _start has been checked and the frame CRC covers
+        # the bytes up to _checked
+        self._header_checked = False
+        self._checked = 0
+        self._checksum = Crc8()
+
+        self.frames = 0
+        self.resyncs = 0
+        self.dropped_bytes = 0
+        self.crc_errors = 0
+
+    def __len__(self) -> int:
+        """Number of bytes buffered towards the next frame"""
+        return self._end - self._start
+
+    def reset(self) -> None:
+        """Drop any partially received frame, the counters are kept"""
+        self._start = 0
+        self._end = 0
+        self._header_checked = False
+
+    def _append(self, data) -> None:
+        length = len(data)
+        if self._end + length > len(self._buffer):
+            pending = self._end - self._start
+            if pending + length > len(self._buffer):
+                # Grow the buffer, keeping only the unconsumed bytes
+                buffer = bytearray(max(2 * len(self._buffer), pending + length))
+                buffer[:pending] = self._buffer[self._start : self._end]
+                self._buffer = buffer
+            else:
+                # Move the unconsumed bytes to the start of the buffer
+                self._buffer[:pending] = self._buffer[self._start : self._end]
+            self._checked -= self._start
+            self._start = 0
+            self._end = pending
+        self._buffer[self._end : self._end + length] = data
+        self._end += length
+
+    def _drop(self, count: int) -> None:
+        self._start += count
+        self._header_checked = False
+        self.dropped_bytes += count
+        self.resyncs += 1
+
+    def feed(self, data) -> list[bytearray]:
+        """Add a notification chunk and return every frame it completed"""
+        self._append(data)
+
+        buffer = self._buffer
+        frames: list[bytearray] = []
+        while self._start < self._end:
+            start = self._start
+            if buffer[start] != 0x02:
+                packet_start = buffer.find(b"\x02", start, self._end)
+                self._drop((self._end if packet_start < 0 else packet_start) - start)
+                continue
+
+            if not self._header_checked:
+                if self._end - start < HEADER_LENGTH:
+                    break
+
+                if (
+                    buffer[start + 9] != crc(buffer, start + 1, 8)
+                    # Too short for the frame CRC and end byte
+                    or buffer[start + 2] + (buffer[start + 3] << 8) + 4
+                    < HEADER_LENGTH + 2
+                ):
+                    # Not a frame header, look for the next start byte
+                    self._drop(1)
+                    continue
+
+                # Adding the matching header CRC byte brings the checksum
+                # back to zero, the frame CRC continues from there
+                self._header_checked = True
+                self._checksum.reset()
+                self._checked = start + HEADER_LENGTH
+
+            length = buffer[start + 2] + (buffer[start + 3] << 8) + 4
+            end = start + length
+            checked = min(self._end, end - 2)
+            if checked > self._checked:
+                self._checksum.update(buffer, self._checked, checked - self._checked)
+                self._checked = checked
+            if self._end < end:
+                break
+
+            if buffer[end - 1] != 0x03 or buffer[end - 2] != self._checksum.value:
+                self.crc_errors += 1
+                self._drop(1)
+                continue
+
+            frames.append(buffer[start:end])
+            self._start = end
+            self._header_checked = False
+            self.frames += 1
+
+        if self._start == self._end:
+            self._start = 0
+            self._end = 0
+
+        return frames
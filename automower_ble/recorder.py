@@ -0,0 +1,124 @@
+"""
+Keep the last raw frames sent to and received from a mower, so they can
+be written to a file when something goes wrong
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import asyncio
+import binascii
+import logging
+import os
+import struct
+import time
+from collections import deque
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Direction of a recorded frame
+WRITE = 0  # Request written to the mower
+NOTIFY = 1  # Notification received from the mower
+
+MAGIC = b"AMBLEFR1"
+# Timestamp, direction and length before the data of every record
+_RECORD = struct.Struct("<dBH")
+
+
+class HexBytes:
+    """Hex formats bytes only when the log message is actually emitted"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self) -> str:
+        return str(binascii.hexlify(self.data))
+
+
+class FlightRecorder:
+    """
+    A ring buffer of the last `size` requests and notifications, each with
+    a wall clock timestamp and direction.
+
+    `dump()` writes the buffer to a compact binary file that `load()`
+    reads back. When `directory` is set, `trigger()` dumps the buffer to
+    a new file in it, at most `max_dumps` times.
+    """
+
+    def __init__(
+        self,
+        size: int = 256,
+        directory: str | os.PathLike | None = None,
+        max_dumps: int = 10,
+    ):
+        self._records: deque[tuple[float, int, bytes]] = deque(maxlen=size)
+        self.directory = Path(directory) if directory is not None else None
+        self.max_dumps = max_dumps
+        self.dumps = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def record(self, direction: int, data) -> None:
+        self._records.append((time.time(), direction, bytes(data)))
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def dump(self, path: str | os.PathLike, records=None) -> None:
+        """Write the recorded frames, or `records`, to `path`"""
+        if records is None:
+            records = list(self._records)
+        with Path(path).open("wb") as f:
+            f.write(MAGIC)
+            for timestamp, direction, data in records:
+                f.write(_RECORD.pack(timestamp, direction, len(data)))
+                f.write(data)
+
+    @staticmethod
+    def load(path: str | os.PathLike) -> list[tuple[float, int, bytes]]:
+        """Read a file written by `dump()`"""
+        data = Path(path).read_bytes()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"{path} is not a flight recorder dump")
+
+        records = []
+        offset = len(MAGIC)
+        while offset < len(data):
+            timestamp, direction, length = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            records.append((timestamp, direction, data[offset : offset + length]))
+            offset += length
+        return records
+
+    def trigger(self, reason: str) -> asyncio.Future | None:
+        """
+        Dump the recorded frames to a new file in `directory`, from an
+        executor so the event loop isn't blocked
+        """
+        if self.directory is None or self.dumps >= self.max_dumps:
+            return None
+        self.dumps += 1
+
+        path = self.directory / f"flight-{time.time_ns() // 1_000_000}-{reason}.bin"
+        records = list(self._records)
+
+        def write_dump():
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self.dump(path, records)
+                logger.info("Wrote %d frames to %s", len(records), path)
+            except OSError as err:
+                logger.warning("Unable to write flight recorder dump: %s", err)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            write_dump()
+            return None
+        return loop.run_in_executor(None, write_dump)
@@ -0,0 +1,347 @@
+"""
+Play a recorded session back to a `BLEClient`, to reproduce how a mower
+behaved without the mower.
+
+    recording = Recording.load("flight-1700000000000-timeout.bin")
+    replay = Replay(recording)
+    mower = Mower(recording.channel_id, replay.address)
+    replay.attach(mower)
+    await mower.connect(replay.device)
+
+Recordings are flight recorder dumps or btsnoop/pcap captures. Every
+request the client sends is matched to the next identical request in the
+recording and answered with the notifications recorded after it, with
+their original timing unless `realtime` is False. Requests that don't
+match the recording are reported in `Replay.divergences`.
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import asyncio
+import logging
+import os
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from bleak import BleakError
+
+from .capture import RECEIVED, CaptureDecoder, read_packets
+from .protocol import BLEClient, _frame_id
+from .reassembler import FrameReassembler
+from .recorder import MAGIC, NOTIFY, WRITE, FlightRecorder, HexBytes
+from .simulator import SimulatedDevice, SimulatedServices
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Exchange:
+    """A recorded request and the notifications that answered it"""
+
+    request: bytes
+    timestamp: float  # When the last chunk of the request was written
+    # Notification chunks, by delay in seconds after the request
+    notifications: list[tuple[float, bytes]] = field(default_factory=list)
+
+
+@dataclass
+class Divergence:
+    """A request that doesn't match the recording"""
+
+    index: int  # Number of the request sent by the client
+    reason: str
+    request: bytes
+    expected: bytes | None  # The next unanswered request in the recording
+
+
+class ReplayDivergence(Exception):
+    def __init__(self, divergence: Divergence):
+        super().__init__(divergence.reason)
+        self.divergence = divergence
+
+
+class Recording:
+    """The requests of a recorded session, in order, with their responses"""
+
+    def __init__(self, exchanges: list[Exchange], mtu: int = 23):
+        self.exchanges = exchanges
+        self.mtu = mtu
+
+    def __len__(self) -> int:
+        return len(self.exchanges)
+
+    @property
+    def channel_id(self) -> int:
+        """The channel ID the recorded client used"""
+        for exchange in self.exchanges:
+            if exchange.request[8] == 0x01:
+                return int.from_bytes(exchange.request[4:8], byteorder="little")
+        raise ValueError("The recording has no commands")
+
+    @classmethod
+    def from_records(cls, records: Iterable[tuple[float, int, bytes]]) -> "Recording":
+        """
+        Build a recording from (timestamp, direction, data) records, as
+        kept by a `FlightRecorder`
+        """
+        requests = FrameReassembler()
+        responses = FrameReassembler()
+        exchanges: list[Exchange] = []
+        unanswered: list[Exchange] = []
+        chunks: list[tuple[float, bytes]] = []
+        mtu = 23
+
+        for timestamp, direction, data in records:
+            if direction == WRITE:
+                mtu = max(mtu, len(data) + 3)
+                for frame in requests.feed(data):
+                    exchange = Exchange(bytes(frame), timestamp)
+                    exchanges.append(exchange)
+                    unanswered.append(exchange)
+                continue
+
+            chunks.append((timestamp, bytes(data)))
+            for frame in responses.feed(data):
+                # Responses belong to the oldest unanswered request for the
+                # same command, anything else, such as events, follows the
+                # latest request
+                frame_id = _frame_id(frame)
+                owner = next(
+                    (e for e in unanswered if _frame_id(e.request) == frame_id),
+                    None,
+                )
+                if owner is not None:
+                    unanswered.remove(owner)
+                elif exchanges:
+                    owner = exchanges[-1]
+                else:
+                    chunks = []
+                    continue
+                owner.notifications.extend(
+                    (max(0.0, chunk_time - owner.timestamp), chunk)
+                    for chunk_time, chunk in chunks
+                )
+                chunks = []
+
+        return cls(exchanges, mtu)
+
+    @classmethod
+    def from_capture(
+        cls, path: str | os.PathLike, connection: int | None = None
+    ) -> "Recording":
+        """
+        Build a recording from a btsnoop or pcap capture. Only the first
+        connection in the capture is used unless `connection` is given.
+        """
+        decoder = CaptureDecoder({})
+        records = []
+        for timestamp, direction, packet in read_packets(path):
+            value = decoder.att_value(direction, packet)
+            if value is None:
+                continue
+            if connection is None:
+                connection = value[0]
+            if value[0] == connection:
+                records.append(
+                    (
+                        timestamp,
+                        NOTIFY if direction == RECEIVED else WRITE,
+                        bytes(value[1]),
+                    )
+                )
+        return cls.from_records(records)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike) -> "Recording":
+        """Load a flight recorder dump or a capture"""
+        with Path(path).open("rb") as f:
+            magic = f.read(len(MAGIC))
+        if magic == MAGIC:
+            return cls.from_records(FlightRecorder.load(path))
+        return cls.from_capture(path)
+
+
+class Replay:
+    """
+    Answers the requests of a client from a `Recording`.
+
+    With `realtime` the notifications are sent with their recorded delays,
+    otherwise as fast as possible. With `strict` a request that diverges
+    from the recording raises `ReplayDivergence` from the write, otherwise
+    it is logged, added to `divergences` and left unanswered. Channel setup
+    probes are resent until the mower answers, so how many are sent
+    depends on timing, extra ones are never raised.
+    """
+
+    def __init__(
+        self,
+        recording: Recording,
+        realtime: bool = True,
+        strict: bool = False,
+        address: str = "00:00:00:00:00:00",
+        name: str = "Replayed Automower",
+    ):
+        self.recording = recording
+        self.realtime = realtime
+        self.strict = strict
+        self.address = address
+        self.name = name
+        self.divergences: list[Divergence] = []
+        self.requests = 0
+        self._used = [False] * len(recording.exchanges)
+        # Recorded exchanges already reported as skipped
+        self._skipped: set[int] = set()
+        # First exchange that hasn't been replayed
+        self._position = 0
+        # The channel setup probe of the attached client
+        self._probe: bytes | None = None
+
+    @property
+    def device(self) -> SimulatedDevice:
+        return SimulatedDevice(self.address, self.name)
+
+    @property
+    def remaining(self) -> list[Exchange]:
+        """Recorded exchanges that haven't been replayed"""
+        return [
+            exchange
+            for exchange, used in zip(self.recording.exchanges, self._used, strict=True)
+            if not used
+        ]
+
+    def attach(self, client: BLEClient) -> None:
+        """Connect `client` to this replay instead of a real mower"""
+        # ReplayBleakClient only implements the parts of BleakClient that
+        # BLEClient uses
+        client.connector = self.establish_connection  # type: ignore[assignment]
+        self._probe = bytes(client.generate_request_setup_channel_id())
+
+    async def establish_connection(
+        self, client_class, device, name, disconnected_callback=None, **kwargs
+    ) -> "ReplayBleakClient":
+        """Drop in replacement for bleak_retry_connector.establish_connection"""
+        return ReplayBleakClient(self, disconnected_callback)
+
+    def match(self, request: bytes) -> Exchange | None:
+        """Find the recorded exchange for a request sent by the client"""
+        index = self.requests
+        self.requests += 1
+        exchanges = self.recording.exchanges
+        expected = (
+            exchanges[self._position].request
+            if self._position < len(exchanges)
+            else None
+        )
+
+        for i in range(self._position, len(exchanges)):
+            if not self._used[i] and exchanges[i].request == request:
+                break
+        else:
+            self._diverge(Divergence(index, "unexpected request", request, expected))
+            return None
+
+        skipped = [
+            j
+            for j in range(self._position, i)
+            if not self._used[j] and j not in self._skipped
+        ]
+        if skipped:
+            self._skipped.update(skipped)
+            self._diverge(
+                Divergence(
+                    index,
+                    f"skipped {len(skipped)} recorded requests",
+                    request,
+                    expected,
+                )
+            )
+        self._used[i] = True
+        while self._position < len(exchanges) and self._used[self._position]:
+            self._position += 1
+        return exchanges[i]
+
+    def _diverge(self, divergence: Divergence) -> None:
+        logger.warning(
+            "Request %d diverged from the recording, %s: %s, expected %s",
+            divergence.index,
+            divergence.reason,
+            HexBytes(divergence.request),
+            HexBytes(divergence.expected or b""),
+        )
+        self.divergences.append(divergence)
+        if self.strict and divergence.request != self._probe:
+            raise ReplayDivergence(divergence)
+
+
+class ReplayBleakClient:
+    """The parts of BleakClient used by BLEClient, connected to a Replay"""
+
+    def __init__(
+        self,
+        replay: Replay,
+        disconnected_callback: Callable[[Any], None] | None = None,
+    ):
+        self.replay = replay
+        self.address = replay.address
+        self.services = SimulatedServices()
+        self.is_connected = True
+        self._disconnected_callback = disconnected_callback
+        self._notify: Callable[[Any, bytearray], None] | None = None
+        self._reassembler = FrameReassembler()
+        # Notification chunks with the loop time to send them at
+        self._queue: asyncio.Queue[tuple[float, bytes]] = asyncio.Queue()
+        self._sender: asyncio.Task | None = None
+
+    @property
+    def mtu_size(self) -> int:
+        return self.replay.recording.mtu
+
+    async def pair(self) -> bool:
+        return True
+
+    async def read_gatt_char(self, char) -> bytearray:
+        return bytearray()
+
+    async def start_notify(self, char, callback) -> None:
+        self._notify = callback
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_notifications())
+
+    async def stop_notify(self, char) -> None:
+        self._notify = None
+
+    async def write_gatt_char(self, char, data, response=False) -> None:
+        if not self.is_connected:
+            raise BleakError("Not connected")
+        now = asyncio.get_running_loop().time()
+        for request in self._reassembler.feed(data):
+            exchange = self.replay.match(bytes(request))
+            if exchange is None:
+                continue
+            for delay, chunk in exchange.notifications:
+                self._queue.put_nowait(
+                    (now + delay if self.replay.realtime else 0.0, chunk)
+                )
+
+    async def _send_notifications(self) -> None:
+        """Send the notifications in order, each no earlier than recorded"""
+        loop = asyncio.get_running_loop()
+        while True:
+            send_at, chunk = await self._queue.get()
+            await asyncio.sleep(max(0.0, send_at - loop.time()))
+            if self._notify is not None:
+                self._notify(self.services.characteristics[1], bytearray(chunk))
+
+    async def disconnect(self) -> bool:
+        if not self.is_connected:
+            return True
+        self.is_connected = False
+        self._notify = None
+        if self._sender is not None:
+            self._sender.cancel()
+            self._sender = None
+        if self._disconnected_callback is not None:
+            self._disconnected_callback(self)
+        return True
@@ -0,0 +1,191 @@
+"""
+Limit the connection attempts and connections of each Bluetooth adapter.
+
+BlueZ adapters only sustain a few connections and establish one at a time.
+Clients given the same scheduler take a slot from it before connecting, so
+they don't start more connections than an adapter sustains.
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import time
+from collections.abc import AsyncIterator
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Connection attempts at the same time, per adapter
+MAX_CONNECTING = 1
+# Open connections, per adapter
+MAX_CONNECTIONS = 5
+# Seconds a client waits for a slot before giving up
+SLOT_TIMEOUT = 60.0
+
+DEFAULT_ADAPTER = "default"
+
+
+class SlotTimeout(TimeoutError):
+    """No slot became free before the wait timed out"""
+
+
+def adapter_name(device: Any) -> str:
+    """The adapter a BLEDevice was found on, such as "hci0" on BlueZ"""
+    details = getattr(device, "details", None)
+    if isinstance(details, dict):
+        # BlueZ details hold the D-Bus path, /org/bluez/hci0/dev_XX_XX_...
+        path = details.get("path")
+        if isinstance(path, str) and path.startswith("/org/bluez/"):
+            return path.split("/")[3]
+    return DEFAULT_ADAPTER
+
+
+class _Slots:
+    """A semaphore that serves waiters by priority, then in order of arrival"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._order = itertools.count()
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(not future.done() for _, _, future in self._waiters)
+
+    async def acquire(self, priority: int, wait: float | None) -> None:
+        if self.used < self.limit and not self.queued:
+            self.used += 1
+            return
+
+        logger.debug("Waiting for a slot, %d already waiting", self.queued)
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._order), future))
+        try:
+            async with asyncio.timeout(wait):
+                await future
+        except BaseException as err:  # Also give the slot up when cancelled
+            if future.done() and not future.cancelled():
+                # The slot was handed over as the wait ended
+                self.release()
+            else:
+                future.cancel()
+            if isinstance(err, TimeoutError):
+                self.timeouts += 1
+                raise SlotTimeout(f"No slot free after {wait}s") from err
+            raise
+        finally:
+            waited = time.monotonic() - start
+            self.waits += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self.used -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "used": self.used,
+            "queued": self.queued,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "max_wait": self.max_wait,
+            "timeouts": self.timeouts,
+        }
+
+
+class ConnectionSlot:
+    """An open connection counted against its adapter, until released"""
+
+    def __init__(self, slots: _Slots, adapter: str):
+        self._slots: _Slots | None = slots
+        self.adapter = adapter
+
+    def release(self) -> None:
+        """Give the slot back, releasing it more than once is harmless"""
+        if self._slots is not None:
+            self._slots.release()
+            self._slots = None
+
+
+class _AdapterSlots:
+    def __init__(self, max_connecting: int, max_connections: int):
+        self.connecting = _Slots(max_connecting)
+        self.connections = _Slots(max_connections)
+
+
+class ConnectionScheduler:
+    """
+    Connection slots for every adapter.
+
+    A client first takes one of `max_connections` connection slots, which
+    it keeps until it disconnects, then one of `max_connecting` attempt
+    slots while the connection is being established. Waiters with a higher
+    `priority` are served first, others in the order they arrived, and
+    give up with `SlotTimeout` after `wait` seconds.
+    """
+
+    def __init__(
+        self,
+        max_connecting: int = MAX_CONNECTING,
+        max_connections: int = MAX_CONNECTIONS,
+        wait: float | None = SLOT_TIMEOUT,
+    ):
+        self.max_connecting = max_connecting
+        self.max_connections = max_connections
+        self.wait = wait
+        self._adapters: dict[str, _AdapterSlots] = {}
+
+    def _slots(self, adapter: str) -> _AdapterSlots:
+        slots = self._adapters.get(adapter)
+        if slots is None:
+            slots = self._adapters[adapter] = _AdapterSlots(
+                self.max_connecting, self.max_connections
+            )
+        return slots
+
+    async def connection(
+        self, adapter: str = DEFAULT_ADAPTER, priority: int = 0
+    ) -> ConnectionSlot:
+        """Wait for a connection slot on `adapter`"""
+        slots = self._slots(adapter).connections
+        await slots.acquire(priority, self.wait)
+        return ConnectionSlot(slots, adapter)
+
+    @contextlib.asynccontextmanager
+    async def attempt(
+        self, adapter: str = DEFAULT_ADAPTER, priority: int = 0
+    ) -> AsyncIterator[None]:
+        """Hold a connection attempt slot on `adapter`"""
+        slots = self._slots(adapter).connecting
+        await slots.acquire(priority, self.wait)
+        try:
+            yield
+        finally:
+            slots.release()
+
+    def stats(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """Slot usage, queue depth and wait times, by adapter"""
+        return {
+            adapter: {
+                "connecting": slots.connecting.stats(),
+                "connections": slots.connections.stats(),
+            }
+            for adapter, slots in self._adapters.items()
+        }
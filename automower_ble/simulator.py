@@ -0,0 +1,414 @@
+"""
+An in-process mower that speaks the BLE protocol, for testing and
+benchmarking without a mower or a Bluetooth adapter.
+
+    simulator = SimulatedMower()
+    mower = Mower(channel_id, simulator.address)
+    simulator.attach(mower)
+    await mower.connect(simulator.device)
+
+Requests are decoded with the commands in protocol.json and answered from
+the state in `SimulatedMower`.
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from importlib.resources import files
+from typing import Any
+
+from bleak import BleakError
+
+from .protocol import (
+    GARDENA_PROTOCOL_DESCRIPTOR_CHAR,
+    GARDENA_READ_CHAR,
+    GARDENA_WRITE_CHAR,
+    BLEClient,
+    Command,
+    ModeOfOperation,
+    MowerActivity,
+    MowerState,
+    OverrideAction,
+    ResponseResult,
+    _frame_id,
+)
+from .reassembler import FrameReassembler
+
+logger = logging.getLogger(__name__)
+
+STATISTICS_COMMANDS = {
+    "GetTotalRunningTime": "totalRunningTime",
+    "GetTotalCuttingTime": "totalCuttingTime",
+    "GetTotalChargingTime": "totalChargingTime",
+    "GetTotalSearchingTime": "totalSearchingTime",
+    "GetNumberOfCollisions": "numberOfCollisions",
+    "GetNumberOfChargingCycles": "numberOfChargingCycles",
+}
+
+
+@dataclass
+class SimulatedDevice:
+    """Stands in for the BLEDevice found by a scan"""
+
+    address: str
+    name: str
+
+
+class SimulatedCharacteristic:
+    def __init__(self, uuid: str, handle: int, properties: list[str]):
+        self.uuid = uuid
+        self.handle = handle
+        self.properties = properties
+
+    def __str__(self) -> str:
+        return f"{self.uuid} (Handle: {self.handle})"
+
+
+class SimulatedServices:
+    """Stands in for the BleakGATTServiceCollection of the mower"""
+
+    def __init__(self):
+        self.characteristics = [
+            SimulatedCharacteristic(
+                GARDENA_WRITE_CHAR, 12, ["write-without-response", "write"]
+            ),
+            SimulatedCharacteristic(GARDENA_READ_CHAR, 14, ["notify"]),
+            SimulatedCharacteristic(GARDENA_PROTOCOL_DESCRIPTOR_CHAR, 16, ["read"]),
+        ]
+        self.uuid = "98bd0001-0b0e-421a-84e5-ddbf75dc6de4"
+
+    def __iter__(self):
+        return iter([self])
+
+    def get_characteristic(self, specifier):
+        for char in self.characteristics:
+            if specifier in (char.handle, char.uuid):
+                return char
+        return None
+
+
+@dataclass
+class SimulatedMower:
+    """
+    The state of a simulated mower and how its radio link behaves.
+
+    `latency` is the delay before each notification, `mtu` sets the size of
+    the notifications unless `fragment_size` is given and `ready_after` is
+    how long the mower ignores requests after notifications are enabled.
+    Any command without its own state answers with the values in
+    `responses`, by command name, or zeros.
+    """
+
+    address: str = "00:00:00:00:00:00"
+    name: str = "Simulated Automower"
+    pin: int | None = None
+
+    battery_level: int = 100
+    is_charging: bool = False
+    state: MowerState = MowerState.IN_OPERATION
+    activity: MowerActivity = MowerActivity.PARKED
+    mode: ModeOfOperation = ModeOfOperation.AUTO
+    next_start_time: int = 0
+    override: dict[str, int] = field(
+        default_factory=lambda: {
+            "action": OverrideAction.NONE,
+            "startTime": 0,
+            "duration": 0,
+        }
+    )
+    device_type: int = 12
+    device_variant: int = 0
+    serial_number: int = 1234567
+    tasks: list[dict[str, int]] = field(default_factory=list)
+    # Some models number their schedule tasks from 1
+    task_id_base: int = 0
+    messages: list[dict[str, int]] = field(default_factory=list)
+    statistics: dict[str, int] = field(
+        default_factory=lambda: {
+            "totalRunningTime": 0,
+            "totalCuttingTime": 0,
+            "totalChargingTime": 0,
+            "totalSearchingTime": 0,
+            "numberOfCollisions": 0,
+            "numberOfChargingCycles": 0,
+            "cuttingBladeUsageTime": 0,
+        }
+    )
+    responses: dict[str, Any] = field(default_factory=dict)
+
+    latency: float = 0.0
+    mtu: int = 23
+    fragment_size: int | None = None
+    ready_after: float = 0.0
+
+    # Number of requests answered, by command name
+    requests: dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            protocol = json.load(f)
+        self._protocol = protocol
+        self._commands: dict[int, dict[tuple[int, int], tuple[str, Command]]] = {}
+        self._pending_tasks: list[dict[str, int]] | None = None
+        self.handlers: dict[str, Callable[[dict], Any]] = {
+            "GetBatteryLevel": lambda _: self.battery_level,
+            "IsCharging": lambda _: self.is_charging,
+            "GetState": lambda _: self.state,
+            "GetActivity": lambda _: self.activity,
+            "GetMode": lambda _: self.mode,
+            "SetMode": self._set_mode,
+            "GetNextStartTime": lambda _: self.next_start_time,
+            "GetOverride": lambda _: self.override,
+            "SetOverrideMow": self._set_override_mow,
+            "SetOverridePark": self._set_override_park,
+            "SetOverrideParkUntilNextStart": self._set_override_park,
+            "ClearOverride": self._clear_override,
+            "StartTrigger": self._start_trigger,
+            "Pause": self._pause,
+            "GetModel": lambda _: {
+                "deviceType": self.device_type,
+                "deviceVariant": self.device_variant,
+            },
+            "GetSerialNumber": lambda _: self.serial_number,
+            "GetNumberOfTasks": lambda _: len(self.tasks),
+            "GetTask": self._get_task,
+            "StartTaskTransaction": self._start_task_transaction,
+            "DeleteAllTask": self._delete_all_tasks,
+            "AddTask": self._add_task,
+            "CommitTaskTransaction": self._commit_task_transaction,
+            "GetNumberOfMessages": lambda _: len(self.messages),
+            "GetMessage": self._get_message,
+            "GetAllStatistics": lambda _: self.statistics,
+            "ResetCuttingBladeUsageTime": self._reset_blade_usage,
+            "EnterOperatorPin": self._enter_operator_pin,
+        }
+        for name, key in STATISTICS_COMMANDS.items():
+            self.handlers[name] = lambda _, key=key: self.statistics[key]
+
+    @property
+    def device(self) -> SimulatedDevice:
+        return SimulatedDevice(self.address, self.name)
+
+    def attach(self, client: BLEClient) -> None:
+        """Connect `client` to this simulator instead of a real mower"""
+        # SimulatedBleakClient only implements the parts of BleakClient
+        # that BLEClient uses
+        client.connector = self.establish_connection  # type: ignore[assignment]
+
+    async def establish_connection(
+        self, client_class, device, name, disconnected_callback=None, **kwargs
+    ) -> "SimulatedBleakClient":
+        """Drop in replacement for bleak_retry_connector.establish_connection"""
+        return SimulatedBleakClient(self, disconnected_callback)
+
+    def _command(self, channel_id: int, frame: bytearray) -> tuple[str, Command]:
+        commands = self._commands.get(channel_id)
+        if commands is None:
+            commands = {}
+            for command_name, parameter in self._protocol.items():
+                command = Command(channel_id, dict(parameter))
+                commands[(command.major, command.minor)] = (command_name, command)
+            self._commands[channel_id] = commands
+        return commands[_frame_id(frame)]  # type: ignore[index]
+
+    def respond(self, request_data: bytearray) -> bytearray | None:
+        """Build the response to a complete request frame"""
+        if request_data[8] != 0x01:
+            # The channel setup and handshake, the client only waits for
+            # an answer so they are echoed back
+            return bytearray(request_data)
+
+        channel_id = int.from_bytes(request_data[4:8], byteorder="little")
+        try:
+            name, command = self._command(channel_id, request_data)
+        except KeyError:
+            logger.warning("Unknown command %s", _frame_id(request_data))
+            return None
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+        try:
+            parameters = command.parse_request(request_data)
+        except ValueError:
+            return command.generate_response(ResponseResult.INVALID_VALUE)
+
+        handler = self.handlers.get(name)
+        if handler is not None:
+            value = handler(parameters)
+        elif name in self.responses:
+            value = self.responses[name]
+        else:
+            value = None
+            if name.startswith("Set") and len(parameters) == 1:
+                # Remember the setting for the matching Get command
+                self.responses["Get" + name[3:]] = next(iter(parameters.values()))
+
+        if isinstance(value, ResponseResult):
+            return command.generate_response(value)
+        if isinstance(value, dict):
+            return command.generate_response(**value)
+        if value is None:
+            return command.generate_response()
+        return command.generate_response(response=value)
+
+    def _set_mode(self, parameters: dict) -> None:
+        self.mode = ModeOfOperation(parameters["mode"])
+
+    def _set_override_mow(self, parameters: dict) -> None:
+        self.override = {
+            "action": OverrideAction.FORCEDMOW,
+            "startTime": int(time.time()),
+            "duration": parameters["duration"],
+        }
+        self.activity = MowerActivity.GOING_OUT
+
+    def _set_override_park(self, parameters: dict) -> None:
+        self.override = {
+            "action": OverrideAction.FORCEDPARK,
+            "startTime": int(time.time()),
+            "duration": parameters.get("duration", 0),
+        }
+        self.activity = MowerActivity.GOING_HOME
+
+    def _clear_override(self, parameters: dict) -> None:
+        self.override = {"action": OverrideAction.NONE, "startTime": 0, "duration": 0}
+
+    def _start_trigger(self, parameters: dict) -> None:
+        self.state = MowerState.IN_OPERATION
+        self.activity = MowerActivity.MOWING
+
+    def _pause(self, parameters: dict) -> None:
+        self.state = MowerState.PAUSED
+        self.activity = MowerActivity.STOPPED_IN_GARDEN
+
+    def _get_task(self, parameters: dict) -> dict | ResponseResult:
+        task_id = parameters["taskId"] - self.task_id_base
+        if not 0 <= task_id < len(self.tasks):
+            return ResponseResult.INVALID_ID
+        return self.tasks[task_id]
+
+    def _start_task_transaction(self, parameters: dict) -> None:
+        self._pending_tasks = list(self.tasks)
+
+    def _delete_all_tasks(self, parameters: dict) -> ResponseResult | None:
+        if self._pending_tasks is None:
+            return ResponseResult.NOT_ALLOWED
+        self._pending_tasks.clear()
+        return None
+
+    def _add_task(self, parameters: dict) -> ResponseResult | None:
+        if self._pending_tasks is None:
+            return ResponseResult.NOT_ALLOWED
+        self._pending_tasks.append(
+            {name: int(value) for name, value in parameters.items()}
+        )
+        return None
+
+    def _commit_task_transaction(self, parameters: dict) -> ResponseResult | None:
+        if self._pending_tasks is None:
+            return ResponseResult.NOT_ALLOWED
+        self.tasks = self._pending_tasks
+        self._pending_tasks = None
+        return None
+
+    def _get_message(self, parameters: dict) -> dict | ResponseResult:
+        message_id = parameters["messageId"]
+        if message_id >= len(self.messages):
+            return ResponseResult.INVALID_ID
+        return self.messages[message_id]
+
+    def _reset_blade_usage(self, parameters: dict) -> None:
+        self.statistics["cuttingBladeUsageTime"] = 0
+
+    def _enter_operator_pin(self, parameters: dict) -> ResponseResult | None:
+        if self.pin is not None and parameters["code"] != self.pin:
+            return ResponseResult.UNKNOWN_ERROR
+        return None
+
+
+class SimulatedBleakClient:
+    """The parts of BleakClient used by BLEClient, connected to a SimulatedMower"""
+
+    def __init__(
+        self,
+        mower: SimulatedMower,
+        disconnected_callback: Callable[[Any], None] | None = None,
+    ):
+        self.mower = mower
+        self.address = mower.address
+        self.services = SimulatedServices()
+        self.is_connected = True
+        self._disconnected_callback = disconnected_callback
+        self._notify: Callable[[Any, bytearray], None] | None = None
+        self._ready_at = 0.0
+        self._reassembler = FrameReassembler()
+        self._queue: asyncio.Queue[bytearray] = asyncio.Queue()
+        self._sender: asyncio.Task | None = None
+        # Raw chunks written by the client
+        self.written: list[bytes] = []
+        # Characteristics read by the client
+        self.reads: list[str] = []
+
+    @property
+    def mtu_size(self) -> int:
+        return self.mower.mtu
+
+    async def pair(self) -> bool:
+        return True
+
+    async def read_gatt_char(self, char) -> bytearray:
+        self.reads.append(char)
+        return bytearray()
+
+    async def start_notify(self, char, callback) -> None:
+        self._notify = callback
+        self._ready_at = time.monotonic() + self.mower.ready_after
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_notifications())
+
+    async def stop_notify(self, char) -> None:
+        self._notify = None
+
+    async def write_gatt_char(self, char, data, response=False) -> None:
+        if not self.is_connected:
+            raise BleakError("Not connected")
+        self.written.append(bytes(data))
+        for request in self._reassembler.feed(data):
+            if self._notify is None or time.monotonic() < self._ready_at:
+                # Not listening yet
+                continue
+            response = self.mower.respond(request)
+            if response is not None:
+                self._queue.put_nowait(response)
+
+    def send_event(self, event_data: bytearray) -> None:
+        """Push an event frame to the client, after any queued responses"""
+        self._queue.put_nowait(event_data)
+
+    async def _send_notifications(self) -> None:
+        """Send responses in order, split into notifications"""
+        while True:
+            response = await self._queue.get()
+            size = self.mower.fragment_size or self.mower.mtu - 3
+            for i in range(0, len(response), size):
+                if self.mower.latency:
+                    await asyncio.sleep(self.mower.latency)
+                if self._notify is None:
+                    break
+                self._notify(self.services.characteristics[1], response[i : i + size])
+
+    async def disconnect(self) -> bool:
+        if not self.is_connected:
+            return True
+        self.is_connected = False
+        self._notify = None
+        if self._sender is not None:
+            self._sender.cancel()
+            self._sender = None
+        if self._disconnected_callback is not None:
+            self._disconnected_callback(self)
+        return True
@@ -0,0 +1,206 @@
+"""
+Benchmark the request/response codec, the CRC and the frame reassembly
+over a frame for every command in protocol.json.
+
+    python -m benchmarks.codec --output before.json
+    python -m benchmarks.codec --compare before.json
+
+Every benchmark reports calls per second, the peak memory allocated by a
+single call and the number of memory blocks each call leaves allocated.
+"""
+
+# Copyright: Alistair Francis <alistair@alistair23.me>
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from importlib.resources import files
+from pathlib import Path
+
+from automower_ble.helpers import Crc8, crc
+from automower_ble.protocol import Command
+from automower_ble.reassembler import FrameReassembler
+
+CHANNEL_ID = 0x13A51453
+# Notification payload size with the default 23 byte MTU
+NOTIFICATION_SIZE = 20
+
+
+def load_corpus() -> list[tuple[str, Command, dict, bytearray, bytearray]]:
+    """A (name, command, parameters, request, response) tuple per command"""
+    with files("automower_ble").joinpath("protocol.json").open("r") as f:
+        protocol = json.load(f)
+
+    corpus = []
+    for name, parameter in protocol.items():
+        command = Command(CHANNEL_ID, parameter)
+        parameters = dict.fromkeys(parameter.get("requestType", {}), 0)
+        corpus.append(
+            (
+                name,
+                command,
+                parameters,
+                command.generate_request(**parameters),
+                command.generate_response(),
+            )
+        )
+    return corpus
+
+
+def measure(function: Callable[[], object], calls: int, iterations: int) -> dict:
+    """Time `function`, which makes `calls` calls, over `iterations` runs"""
+    function()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        function()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    # Keep the results, so only what the calls leave allocated is counted
+    blocks = sys.getallocatedblocks()
+    results = [function() for _ in range(10)]
+    blocks = sys.getallocatedblocks() - blocks
+    del results
+
+    return {
+        "ops_per_sec": round(calls * iterations / elapsed),
+        "peak_bytes_per_call": round(peak / calls, 1),
+        "blocks_per_call": round(blocks / (10 * calls), 2),
+    }
+
+
+def benchmarks(corpus) -> dict[str, tuple[Callable[[], object], int]]:
+    """Each benchmark runs over the whole corpus, returns the results"""
+    requests = [(command, parameters) for _, command, parameters, _, _ in corpus]
+    responses = [(command, response) for _, command, _, _, response in corpus]
+    frames = [response for _, _, _, _, response in corpus]
+    stream = b"".join(frames)
+    notifications = [
+        stream[i : i + NOTIFICATION_SIZE]
+        for i in range(0, len(stream), NOTIFICATION_SIZE)
+    ]
+    reassembler = FrameReassembler()
+    chunked_frames = [
+        [
+            frame[i : i + NOTIFICATION_SIZE]
+            for i in range(0, len(frame), NOTIFICATION_SIZE)
+        ]
+        for frame in frames
+    ]
+    checksum = Crc8()
+
+    def crc_incremental():
+        result = []
+        for chunks in chunked_frames:
+            checksum.reset()
+            for chunk in chunks:
+                checksum.update(chunk)
+            result.append(checksum.value)
+        return result
+
+    def reassemble():
+        result = []
+        for notification in notifications:
+            result += reassembler.feed(notification)
+        return result
+
+    return {
+        "generate_request": (
+            lambda: [
+                command.generate_request(**parameters)
+                for command, parameters in requests
+            ],
+            len(requests),
+        ),
+        "parse_response": (
+            lambda: [
+                command.parse_response(response) for command, response in responses
+            ],
+            len(responses),
+        ),
+        "validate_command_response": (
+            lambda: [
+                command.validate_command_response(response)
+                for command, response in responses
+            ],
+            len(responses),
+        ),
+        "crc": (
+            lambda: [crc(frame, 1, len(frame) - 3) for frame in frames],
+            len(frames),
+        ),
+        "crc_incremental": (crc_incremental, len(frames)),
+        "reassembly": (reassemble, len(frames)),
+    }
+
+
+def run(iterations: int = 200, only: list[str] | None = None) -> dict:
+    corpus = load_corpus()
+    results = {}
+    for name, (function, calls) in benchmarks(corpus).items():
+        if only and name not in only:
+            continue
+        results[name] = measure(function, calls, iterations)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "commands": len(corpus),
+        "iterations": iterations,
+        "results": results,
+    }
+
+
+def compare(previous: dict, current: dict) -> None:
+    print(f"{'benchmark':<28}{'before':>12}{'after':>12}{'change':>10}")
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if before is None:
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        print(
+            f"{name:<28}{before['ops_per_sec']:>12}{result['ops_per_sec']:>12}"
+            f"{change:>+10.1%}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--iterations", type=int, default=200, help="Passes over the corpus"
+    )
+    parser.add_argument("--only", nargs="*", help="Only run these benchmarks")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    parser.add_argument(
+        "--compare", type=Path, help="Compare with an earlier JSON result"
+    )
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.only)
+
+    if args.output is not None:
+        with args.output.open("w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare is not None:
+        with args.compare.open("r") as f:
+            compare(json.load(f), results)
+    else:
+        print(json.dumps(results["results"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import unittest
+from benchmarks.codec import run
+
+
+class TestCodecBenchmarks(unittest.TestCase):
+    def test_run(self):
+        results = run(iterations=1)
+
+        self.assertEqual(
+            set(results["results"]),
+            {
+                "generate_request",
+                "parse_response",
+                "validate_command_response",
+                "crc",
+                "crc_incremental",
+                "reassembly",
+            },
+        )
+        for result in results["results"].values():
+            self.assertGreater(result["ops_per_sec"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
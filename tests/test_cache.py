@@ -0,0 +1,121 @@
+import asyncio
+import json
+import unittest
+from importlib.resources import files
+from unittest.mock import patch
+from automower_ble.cache import CommandCache
+from automower_ble.mower import Mower
+from automower_ble.protocol import ResponseResult
+from tests.test_client import FakeBleakClient, response_frame
+
+
+class TestCommandCache(unittest.TestCase):
+    def test_only_configured_commands_are_cached(self):
+        cache = CommandCache({"GetCuttingHeight": 60})
+
+        cache.put("GetCuttingHeight", {}, 4422, 5)
+        cache.put("GetBatteryLevel", {}, 4106, 80)
+
+        self.assertEqual(cache.get("GetCuttingHeight", {}), (True, 5))
+        self.assertEqual(cache.get("GetBatteryLevel", {}), (False, None))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 0)
+
+    def test_entries_expire(self):
+        cache = CommandCache({"GetCuttingHeight": 60})
+
+        with patch("automower_ble.cache.time.monotonic", return_value=100.0):
+            cache.put("GetCuttingHeight", {}, 4422, 5)
+        with patch("automower_ble.cache.time.monotonic", return_value=159.0):
+            self.assertEqual(cache.get("GetCuttingHeight", {}), (True, 5))
+        with patch("automower_ble.cache.time.monotonic", return_value=160.0):
+            self.assertEqual(cache.get("GetCuttingHeight", {}), (False, None))
+        self.assertEqual(cache.misses, 1)
+
+    def test_entries_are_keyed_by_parameters(self):
+        cache = CommandCache({"GetStartingPoint": 60})
+
+        cache.put("GetStartingPoint", {"startingPointId": 1}, 4706, {"wire": 1})
+
+        self.assertEqual(
+            cache.get("GetStartingPoint", {"startingPointId": 1}), (True, {"wire": 1})
+        )
+        self.assertEqual(
+            cache.get("GetStartingPoint", {"startingPointId": 2}), (False, None)
+        )
+
+    def test_invalidate_major_group(self):
+        cache = CommandCache({"GetCuttingHeight": 60, "GetGarageEnabled": 60})
+
+        cache.put("GetCuttingHeight", {}, 4422, 5)
+        cache.put("GetGarageEnabled", {}, 4692, 1)
+        cache.invalidate(4422)
+
+        self.assertEqual(cache.get("GetCuttingHeight", {}), (False, None))
+        self.assertEqual(cache.get("GetGarageEnabled", {}), (True, 1))
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_put_after_invalidate_is_dropped(self):
+        cache = CommandCache({"GetCuttingHeight": 60})
+        generation = cache.generation(4422)
+
+        cache.invalidate(4422)
+        cache.put("GetCuttingHeight", {}, 4422, 5, generation)
+        self.assertEqual(cache.get("GetCuttingHeight", {}), (False, None))
+
+        cache.put("GetCuttingHeight", {}, 4422, 6, cache.generation(4422))
+        self.assertEqual(cache.get("GetCuttingHeight", {}), (True, 6))
+
+
+class TestMowerCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            protocol = json.load(f)
+
+        self.mower = Mower(
+            0x13A51453, "00:00:00:00:00:00", cache_ttls={"GetCuttingHeight": 60}
+        )
+        self.mower.protocol = protocol
+        self.fake = FakeBleakClient(
+            {
+                (4422, 2): b"\x05",  # GetCuttingHeight
+                (4422, 3): b"",  # SetCuttingHeight
+            }
+        )
+        self.fake.notify = self.mower._handle_notification
+        self.mower.client = self.fake  # type: ignore[assignment]
+        self.mower.write_char = "write"  # type: ignore[assignment]
+
+    async def test_read_through_and_invalidate(self):
+        self.assertEqual(await self.mower.command("GetCuttingHeight"), 5)
+        self.assertEqual(
+            await self.mower.command_response("GetCuttingHeight"),
+            (ResponseResult.OK, 5),
+        )
+        sent = len(self.fake.requests)
+
+        await self.mower.command_response("SetCuttingHeight", height=6)
+        self.assertEqual(await self.mower.command("GetCuttingHeight"), 5)
+
+        # One write for SetCuttingHeight and one for the new GetCuttingHeight
+        self.assertEqual(len(self.fake.requests), sent + 2)
+        self.assertEqual(self.mower.cache.hits, 1)
+        self.assertEqual(self.mower.cache.misses, 2)
+
+    async def test_result_overtaken_by_set_is_not_cached(self):
+        del self.fake.responses[(4422, 2)]
+        read = asyncio.create_task(self.mower.command("GetCuttingHeight"))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        request = self.fake.requests[-1]
+
+        # The height is changed before the answer to the read arrives
+        await self.mower.command_response("SetCuttingHeight", height=6)
+        self.mower._handle_notification(None, response_frame(request, b"\x05"))  # type: ignore[arg-type]
+
+        self.assertEqual(await read, 5)
+        self.assertEqual(len(self.mower.cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
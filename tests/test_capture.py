@@ -0,0 +1,152 @@
+import json
+import struct
+import tempfile
+import unittest
+from importlib.resources import files
+from pathlib import Path
+from automower_ble.capture import (
+    BTSNOOP_EPOCH_OFFSET,
+    BTSNOOP_H4,
+    BTSNOOP_MAGIC,
+    PCAP_H4_WITH_PHDR,
+    RECEIVED,
+    SENT,
+    CaptureDecoder,
+    decode_capture,
+    decode_captures,
+)
+from automower_ble.protocol import BLEClient, Command, ModeOfOperation
+
+CHANNEL_ID = 0x13A51453
+CONNECTION = 0x0040
+
+
+def acl_packets(opcode: int, handle: int, value: bytes, size: int = 27) -> list:
+    """Wrap `value` in an ATT PDU, split over ACL packets of `size` bytes"""
+    att = bytes([opcode]) + struct.pack("<H", handle) + value
+    l2cap = struct.pack("<HH", len(att), 0x0004) + att
+    packets = []
+    for offset in range(0, len(l2cap), size):
+        flags = 0x2000 if offset == 0 else 0x1000
+        chunk = l2cap[offset : offset + size]
+        packets.append(
+            b"\x02" + struct.pack("<HH", CONNECTION | flags, len(chunk)) + chunk
+        )
+    return packets
+
+
+def write_btsnoop(path: Path, packets: list) -> None:
+    with path.open("wb") as f:
+        f.write(BTSNOOP_MAGIC + struct.pack(">II", 1, BTSNOOP_H4))
+        for i, (direction, packet) in enumerate(packets):
+            timestamp = BTSNOOP_EPOCH_OFFSET + 1_700_000_000_000_000 + i
+            f.write(
+                struct.pack(">IIIIq", len(packet), len(packet), direction, 0, timestamp)
+            )
+            f.write(packet)
+
+
+def write_pcap(path: Path, packets: list) -> None:
+    with path.open("wb") as f:
+        f.write(
+            struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, PCAP_H4_WITH_PHDR)
+        )
+        for i, (direction, packet) in enumerate(packets):
+            record = struct.pack(">I", direction) + packet
+            f.write(struct.pack("<IIII", 1_700_000_000, i, len(record), len(record)))
+            f.write(record)
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            self.protocol = json.load(f)
+
+        set_mode = Command(CHANNEL_ID, self.protocol["SetMode"])
+        battery = Command(CHANNEL_ID, self.protocol["GetBatteryLevel"])
+        self.packets = [
+            (SENT, packet)
+            for packet in acl_packets(
+                0x52, 12, set_mode.generate_request(mode=ModeOfOperation.AUTO)
+            )
+        ]
+        self.packets += [
+            (RECEIVED, packet)
+            for packet in acl_packets(0x1B, 14, set_mode.generate_response(), size=10)
+        ]
+        self.packets += [
+            (SENT, packet)
+            for packet in acl_packets(0x52, 12, battery.generate_request())
+        ]
+        # Notifications are limited by the MTU, so frames are split over them
+        response = battery.generate_response(response=80)
+        self.packets += [
+            (RECEIVED, packet)
+            for offset in range(0, len(response), 20)
+            for packet in acl_packets(0x1B, 14, response[offset : offset + 20])
+        ]
+
+    def check_records(self, records):
+        self.assertEqual(
+            [(r.packet_type, r.name, r.result) for r in records],
+            [
+                ("request", "SetMode", None),
+                ("response", "SetMode", "OK"),
+                ("request", "GetBatteryLevel", None),
+                ("response", "GetBatteryLevel", "OK"),
+            ],
+        )
+        self.assertEqual(records[0].data, {"mode": ModeOfOperation.AUTO})
+        self.assertEqual(records[3].data, {"response": 80})
+        self.assertTrue(all(r.channel_id == CHANNEL_ID for r in records))
+        self.assertTrue(all(r.connection == CONNECTION for r in records))
+        self.assertTrue(all(r.error is None for r in records))
+
+    def test_btsnoop(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "btsnoop_hci.log"
+            write_btsnoop(path, self.packets)
+
+            records = list(decode_capture(path))
+
+        self.check_records(records)
+        self.assertAlmostEqual(records[0].timestamp, 1_700_000_000, places=3)
+
+    def test_pcap(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "capture.pcap"
+            write_pcap(path, self.packets)
+
+            records = list(decode_capture(path))
+
+        self.check_records(records)
+
+    def test_decode_captures(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [Path(tmp) / "one.log", Path(tmp) / "two.pcap"]
+            write_btsnoop(paths[0], self.packets)
+            write_pcap(paths[1], self.packets)
+
+            results = dict(decode_captures(paths, max_workers=2))
+
+        self.assertEqual(set(results), {str(path) for path in paths})
+        for records in results.values():
+            self.check_records(records)
+
+    def test_setup_frames(self):
+        client = BLEClient(CHANNEL_ID, "00:00:00:00:00:00")
+        decoder = CaptureDecoder(self.protocol)
+
+        for frame in (
+            client.generate_request_setup_channel_id(),
+            client.generate_request_handshake(),
+        ):
+            # Byte 10 isn't a packet type in unlinked frames
+            frame[10] = 0x02
+            record = decoder.decode_frame(0.0, CONNECTION, frame)
+            self.assertEqual(record.packet_type, "setup")
+            self.assertIsNone(record.command_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
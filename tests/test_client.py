@@ -0,0 +1,548 @@
+import asyncio
+import contextlib
+import json
+import time
+import unittest
+from importlib.resources import files
+from types import SimpleNamespace
+from unittest.mock import patch
+from bleak import BleakError
+from automower_ble.helpers import crc
+from automower_ble.mower import KEEP_ALIVE_INTERVALS, Mower
+from automower_ble.protocol import (
+    DEFAULT_MAX_IN_FLIGHT,
+    BLEClient,
+    ModeOfOperation,
+    MowerActivity,
+    MowerState,
+    OverrideAction,
+    ResponseResult,
+)
+
+
+def response_frame(request: bytearray, payload: bytes) -> bytearray:
+    """Build the response the mower would send for a request"""
+    frame = bytearray(request[:16])
+    frame[10] = 0x01  # Response
+    frame += bytes([0x00]) + len(payload).to_bytes(2, "little") + payload
+    frame[2] = len(frame) - 2
+    frame[9] = crc(frame, 1, 8)
+    frame.append(crc(frame, 1, len(frame) - 1))
+    frame.append(0x03)
+    return frame
+
+
+class FakeBleakClient:
+    def __init__(self, responses: dict | None = None):
+        self.is_connected = True
+        self.written: list[bytes] = []
+        self.requests: list[bytearray] = []
+        self.notify = None
+        # Payload to answer with by command ID, requests for other commands
+        # are never answered
+        self.responses = responses or {}
+        self._request = bytearray()
+
+    async def write_gatt_char(self, char, data, response=False):
+        self.written.append(bytes(data))
+        self._request += data
+        if len(self._request) < self._request[2] + 4:
+            return
+        request, self._request = self._request, bytearray()
+        self.requests.append(request)
+        command_id = (request[12] | request[13] << 8, request[14])
+        if command_id in self.responses:
+            self.notify(None, response_frame(request, self.responses[command_id]))
+
+    async def disconnect(self):
+        self.is_connected = False
+
+
+class TestBLEClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            protocol = json.load(f)
+
+        self.client = BLEClient(0x13A51453, "00:00:00:00:00:00")
+        self.client.protocol = protocol
+        self.client.client = FakeBleakClient()  # type: ignore[assignment]
+        self.client.write_char = "write"  # type: ignore[assignment]
+
+    async def settle(self) -> None:
+        """Let the request tasks run until they wait for their responses"""
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    def notify(self, data: bytearray) -> None:
+        # Deliver the response in MTU sized notifications
+        for i in range(0, len(data), 17):
+            self.client._handle_notification(None, data[i : i + 17])  # type: ignore[arg-type]
+
+    async def test_pipelined_responses_out_of_order(self):
+        battery = (await self.client.get_command("GetBatteryLevel")).generate_request()
+        state = (await self.client.get_command("GetState")).generate_request()
+
+        first = asyncio.create_task(self.client._request_response(battery))
+        second = asyncio.create_task(self.client._request_response(state))
+        await self.settle()
+
+        # Both requests are written before either response arrives
+        self.assertEqual(b"".join(self.client.client.written), battery + state)
+        self.notify(response_frame(state, b"\x06"))
+        self.notify(response_frame(battery, b"\x64"))
+
+        self.assertEqual((await first)[19], 0x64)
+        self.assertEqual((await second)[19], 0x06)
+
+    async def test_same_command_keeps_order(self):
+        command = await self.client.get_command("GetTask")
+        requests = [command.generate_request(taskId=task_id) for task_id in range(2)]
+
+        tasks = [
+            asyncio.create_task(self.client._request_response(request))
+            for request in requests
+        ]
+        await self.settle()
+        self.notify(response_frame(requests[0], b"\x00"))
+        self.notify(response_frame(requests[1], b"\x01"))
+
+        self.assertEqual([(await task)[19] for task in tasks], [0, 1])
+
+    async def test_unmatched_response_is_discarded(self):
+        battery = (await self.client.get_command("GetBatteryLevel")).generate_request()
+        state = (await self.client.get_command("GetState")).generate_request()
+
+        task = asyncio.create_task(self.client._request_response(battery))
+        await self.settle()
+        self.notify(response_frame(state, b"\x06"))
+        await self.settle()
+
+        self.assertFalse(task.done())
+        self.assertEqual(self.client.unmatched_responses, 1)
+        self.notify(response_frame(battery, b"\x64"))
+        self.assertEqual((await task)[19], 0x64)
+
+    async def test_setup_answer_is_not_an_event(self):
+        setup = self.client.generate_request_setup_channel_id()
+        # Byte 10 isn't a packet type in unlinked frames, it can be 0x02
+        answer = bytearray(setup)
+        answer[10] = 0x02
+        answer[-2] = crc(answer, 1, len(answer) - 3)
+        self.assertTrue(self.client.validate_setup_response(answer))
+
+        task = asyncio.create_task(self.client._request_response(setup))
+        await self.settle()
+        self.notify(answer)
+
+        self.assertEqual(await task, answer)
+
+    async def test_timeout_keeps_partial_frames(self):
+        battery = (await self.client.get_command("GetBatteryLevel")).generate_request()
+        state = (await self.client.get_command("GetState")).generate_request()
+
+        second = asyncio.create_task(self.client._request_response(state))
+        await self.settle()
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.05):
+            first = asyncio.create_task(
+                self.client._request_response(battery, disconnect_on_error=False)
+            )
+            await self.settle()
+            # Part of the response to the other request arrives before this
+            # one times out
+            response = response_frame(state, b"\x06")
+            self.client._handle_notification(None, response[:10])  # type: ignore[arg-type]
+            self.assertIsNone(await first)
+
+        self.client._handle_notification(None, response[10:])  # type: ignore[arg-type]
+        self.assertEqual((await second)[19], 0x06)
+
+    async def test_late_answer_to_same_command(self):
+        command = await self.client.get_command("GetTask")
+        requests = [command.generate_request(taskId=task_id) for task_id in range(2)]
+
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.05):
+            first = asyncio.create_task(
+                self.client._request_response(requests[0], disconnect_on_error=False)
+            )
+            await self.settle()
+        second = asyncio.create_task(self.client._request_response(requests[1]))
+        await self.settle()
+        self.assertIsNone(await first)
+
+        # The mower answers in order, the first answer is the late one
+        self.notify(response_frame(requests[0], b"\xaa\xaa\xaa\xaa"))
+        await self.settle()
+        self.assertFalse(second.done())
+        self.notify(response_frame(requests[1], b"\x01"))
+        self.assertEqual((await second)[19], 0x01)
+        self.assertFalse(self.client._expired)
+
+    async def test_lost_answer_is_not_expected_forever(self):
+        request = (await self.client.get_command("GetBatteryLevel")).generate_request()
+
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.02):
+            self.assertIsNone(
+                await self.client._request_response(request, disconnect_on_error=False)
+            )
+            await asyncio.sleep(0.03)
+
+        task = asyncio.create_task(self.client._request_response(request))
+        await self.settle()
+        self.notify(response_frame(request, b"\x64"))
+        self.assertEqual((await task)[19], 0x64)
+
+    async def test_failed_write_releases_request(self):
+        request = (await self.client.get_command("GetBatteryLevel")).generate_request()
+
+        async def fail(char, data, response=False):
+            raise RuntimeError("D-Bus error")
+
+        write_gatt_char = self.client.client.write_gatt_char
+        self.client.client.write_gatt_char = fail
+        for _ in range(DEFAULT_MAX_IN_FLIGHT + 1):
+            with self.assertRaises(RuntimeError):
+                # A leaked request slot would make this wait forever
+                await asyncio.wait_for(self.client._request_response(request), 1)
+        self.assertFalse(self.client._pending)
+
+        self.client.client.write_gatt_char = write_gatt_char
+        task = asyncio.create_task(self.client._request_response(request))
+        await self.settle()
+        self.notify(response_frame(request, b"\x64"))
+        self.assertEqual((await task)[19], 0x64)
+
+    async def test_disconnect_fails_pending_requests(self):
+        request = (await self.client.get_command("GetBatteryLevel")).generate_request()
+
+        task = asyncio.create_task(self.client._request_response(request))
+        await self.settle()
+        await self.client.disconnect()
+
+        self.assertIsNone(await task)
+
+    async def test_requests_written_in_mtu_sized_chunks(self):
+        request = (await self.client.get_command("AddTask")).generate_request(
+            start=0,
+            duration=60,
+            useOnMonday=1,
+            useOnTuesday=0,
+            useOnWednesday=0,
+            useOnThursday=0,
+            useOnFriday=0,
+            useOnSaturday=0,
+            useOnSunday=0,
+            unknown=0,
+        )
+
+        await self.client._write_data(request)
+        self.assertEqual(
+            [len(chunk) for chunk in self.client.client.written], [17, 17, 3]
+        )
+
+        self.client.client.written.clear()
+        self.client.chunk_size = 244
+        await self.client._write_data(request)
+        self.assertEqual(self.client.client.written, [bytes(request)])
+
+    async def test_negotiated_mtu(self):
+        client = SimpleNamespace(mtu_size=247, _backend=SimpleNamespace())
+        self.assertEqual(await self.client._negotiated_mtu(client), 247)
+
+        async def acquire_mtu():
+            backend._mtu_size = 185
+
+        # BlueZ before and after acquiring the MTU
+        backend = SimpleNamespace(_mtu_size=None, _acquire_mtu=acquire_mtu)
+        client = SimpleNamespace(mtu_size=185, _backend=backend)
+        self.assertEqual(await self.client._negotiated_mtu(client), 185)
+
+        async def fail_acquire_mtu():
+            raise BleakError("Not supported")
+
+        backend = SimpleNamespace(_mtu_size=None, _acquire_mtu=fail_acquire_mtu)
+        client = SimpleNamespace(mtu_size=23, _backend=backend)
+        self.assertEqual(await self.client._negotiated_mtu(client), 20)
+
+    async def test_channel_setup_is_retried_until_answered(self):
+        fake = self.client.client
+        setup = self.client.generate_request_setup_channel_id()
+
+        write_gatt_char = fake.write_gatt_char
+
+        async def ignore_first_attempts(char, data, response=False):
+            count = len(fake.requests)
+            await write_gatt_char(char, data, response)
+            # The mower ignores the first two attempts
+            if len(fake.requests) > max(count, 2):
+                self.client._handle_notification(None, response_frame(setup, b""))
+
+        fake.write_gatt_char = ignore_first_attempts
+        with (
+            patch("automower_ble.protocol.READY_PROBE_TIMEOUT", 0.01),
+            patch("automower_ble.protocol.READY_BACKOFF", (0,)),
+        ):
+            response = await self.client._wait_until_ready("Test")
+
+        self.assertIsNotNone(response)
+        self.assertEqual(fake.requests, [setup] * 3)
+        self.assertFalse(self.client._pending)
+        # The ignored probes are never answered, the handshake answer must
+        # not be discarded as a late answer to them
+        self.assertFalse(self.client._expired)
+        self.assertIsNotNone(self.client.ready_time)
+
+    async def test_channel_setup_gives_up(self):
+        self.client.ready_timeout = 0.05
+        with patch("automower_ble.protocol.READY_PROBE_TIMEOUT", 0.01):
+            self.assertIsNone(await self.client._wait_until_ready("Test"))
+        self.assertFalse(self.client._pending)
+
+
+class TestMowerBatch(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            protocol = json.load(f)
+
+        self.mower = Mower(0x13A51453, "00:00:00:00:00:00", max_in_flight=2)
+        self.mower.protocol = protocol
+        fake = FakeBleakClient(
+            {
+                (4106, 20): b"\x64",  # GetBatteryLevel
+                (4586, 2): b"\x06",  # GetState
+                (4690, 5): bytes.fromhex("00e100003831000001000101000101"),  # GetTask
+            }
+        )
+        fake.notify = self.mower._handle_notification
+        self.mower.client = fake  # type: ignore[assignment]
+        self.mower.write_char = "write"  # type: ignore[assignment]
+
+    async def test_command_batch(self):
+        results = await self.mower.command_batch(
+            [
+                ("GetBatteryLevel", {}),
+                ("GetTask", {"taskId": 0}),
+                ("GetState", {}),
+            ]
+        )
+
+        self.assertEqual(results[0], (ResponseResult.OK, 100))
+        self.assertEqual(results[1][0], ResponseResult.OK)
+        self.assertEqual(results[1][1]["start"], 57600)
+        self.assertEqual(results[2], (ResponseResult.OK, 6))
+
+    async def test_command_batch_rejects_invalid_parameters(self):
+        with self.assertRaisesRegex(ValueError, "Missing request parameter"):
+            await self.mower.command_batch([("GetTask", {})])
+        self.assertEqual(self.mower.client.written, [])
+
+    async def test_command_batch_keeps_connection_on_failure(self):
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.05):
+            results = await self.mower.command_batch(
+                [("GetBatteryLevel", {}), ("GetActivity", {})]
+            )
+
+        self.assertEqual(results[0], (ResponseResult.OK, 100))
+        self.assertEqual(results[1], (ResponseResult.UNKNOWN_ERROR, None))
+        self.assertTrue(self.mower.is_connected())
+
+    async def test_command_batch_after_timeout_of_same_command(self):
+        fake = self.mower.client
+        del fake.responses[(4690, 5)]
+        write_gatt_char = fake.write_gatt_char
+        task = bytes.fromhex("00e100003831000001000101000101")
+
+        async def answer_late(char, data, response=False):
+            await write_gatt_char(char, data, response)
+            if len(fake.requests) == 2:
+                # The answer to GetTask 0 arrives after it timed out and
+                # before the answer to GetTask 1
+                first, second = fake.requests
+                late = response_frame(first, b"\xaa\xaa\xaa\xaa" + task[4:])
+                asyncio.get_running_loop().call_soon(fake.notify, None, late)
+                asyncio.get_running_loop().call_soon(
+                    fake.notify, None, response_frame(second, task)
+                )
+
+        fake.write_gatt_char = answer_late
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.05):
+            results = await self.mower.command_batch(
+                [("GetTask", {"taskId": 0}), ("GetTask", {"taskId": 1})],
+                max_in_flight=1,
+            )
+
+        self.assertEqual(results[0], (ResponseResult.UNKNOWN_ERROR, None))
+        self.assertEqual(results[1][0], ResponseResult.OK)
+        self.assertEqual(results[1][1]["start"], 57600)
+
+    async def test_poll_status(self):
+        self.mower.client.responses.update(
+            {
+                (4106, 21): b"\x01",  # IsCharging
+                (4586, 1): b"\x00",  # GetMode
+                (4658, 2): bytes(9),  # GetOverride
+                (4658, 1): bytes(4),  # GetNextStartTime
+            }
+        )
+
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.05):
+            status = await self.mower.poll_status()
+
+        self.assertEqual(status.battery_level, 100)
+        self.assertTrue(status.is_charging)
+        self.assertIs(status.state, MowerState.IN_OPERATION)
+        self.assertIs(status.mode, ModeOfOperation.AUTO)
+        self.assertIs(status.override["action"], OverrideAction.NONE)
+        self.assertIsNone(status.next_start_time)
+        self.assertIn("next_start_time", status.updated)
+        # GetActivity is never answered
+        self.assertIsNone(status.activity)
+        self.assertEqual(status.errors, {"activity": "UNKNOWN_ERROR"})
+
+        # The late answer to the first GetActivity isn't taken as the
+        # answer to the next one
+        (activity,) = [
+            r for r in self.mower.client.requests if r[12:15] == b"\xea\x11\x03"
+        ]
+        self.mower._handle_notification(None, response_frame(activity, b"\x05"))  # type: ignore[arg-type]
+        self.mower.client.responses[(4586, 3)] = b"\x03"  # GetActivity
+        del self.mower.client.responses[(4106, 20)]  # GetBatteryLevel
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.05):
+            refreshed = await self.mower.poll_status(previous=status)
+
+        self.assertIs(refreshed.activity, MowerActivity.MOWING)
+        self.assertEqual(refreshed.battery_level, 100)
+        self.assertEqual(refreshed.updated["battery_level"], status.timestamp)
+        self.assertGreater(refreshed.updated["activity"], status.timestamp)
+        self.assertEqual(refreshed.errors, {"battery_level": "UNKNOWN_ERROR"})
+
+    async def test_poll_status_unparsable_payload(self):
+        self.mower.client.responses.update(
+            {
+                (4106, 21): b"\x01",  # IsCharging
+                (4586, 1): b"\x00\x00",  # GetMode, one byte too long
+                (4586, 3): b"\x03",  # GetActivity
+                (4658, 2): bytes(9),  # GetOverride
+                (4658, 1): bytes(4),  # GetNextStartTime
+            }
+        )
+
+        status = await self.mower.poll_status()
+
+        self.assertIsNone(status.mode)
+        self.assertEqual(status.errors, {"mode": "UNPARSABLE"})
+
+
+class TestKeepAlive(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            protocol = json.load(f)
+
+        self.mower = Mower(0x13A51453, "00:00:00:00:00:00", keep_alive_interval=0.05)
+        self.mower.protocol = protocol
+        fake = FakeBleakClient({(4674, 2): b"", (4106, 20): b"\x64"})
+        fake.notify = self.mower._handle_notification
+        self.mower.client = fake  # type: ignore[assignment]
+        self.mower.write_char = "write"  # type: ignore[assignment]
+
+    async def run_keep_alive(self, seconds: float, traffic: bool = False) -> None:
+        task = asyncio.create_task(self.mower._keep_alive())
+        end = asyncio.get_running_loop().time() + seconds
+        while asyncio.get_running_loop().time() < end:
+            if traffic:
+                await self.mower.command("GetBatteryLevel")
+            await asyncio.sleep(0.01)
+        self.mower.keep_alive_event.set()
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    def keep_alives(self) -> int:
+        return sum(
+            request[12:15] == b"\x42\x12\x02" for request in self.mower.client.requests
+        )
+
+    async def test_sent_when_idle(self):
+        await self.run_keep_alive(0.2)
+
+        self.assertGreater(self.mower.keep_alive_sent, 0)
+        self.assertEqual(self.keep_alives(), self.mower.keep_alive_sent)
+        self.assertEqual(self.mower.keep_alive_failed, 0)
+
+    async def test_skipped_during_traffic(self):
+        await self.run_keep_alive(0.2, traffic=True)
+
+        self.assertEqual(self.keep_alives(), 0)
+        self.assertGreater(self.mower.keep_alive_skipped, 0)
+
+    async def test_skipped_while_lock_is_held(self):
+        async with self.mower.lock:
+            await self.run_keep_alive(0.1)
+
+        self.assertEqual(self.keep_alives(), 0)
+        self.assertGreater(self.mower.keep_alive_skipped, 0)
+
+    def model_reads(self) -> int:
+        return sum(
+            request[12:15] == b"\x5a\x12\x09" for request in self.mower.client.requests
+        )
+
+    async def test_model_read_as_first_keep_alive(self):
+        self.mower._keep_alive_override = None
+        self.mower.client.responses[(4698, 9)] = b"\x17\x01"
+
+        with patch.dict(
+            "automower_ble.mower.KEEP_ALIVE_INTERVALS", {"Automower 305": 0.05}
+        ):
+            await self.run_keep_alive(0.2)
+
+        self.assertEqual(self.mower.model_name, "Automower 305")
+        self.assertEqual(self.model_reads(), 1)
+        self.assertGreater(self.keep_alives(), 0)
+        self.assertEqual(self.mower.keep_alive_sent, self.keep_alives() + 1)
+
+    async def test_failed_model_read_falls_back_to_keep_alive(self):
+        self.mower._keep_alive_override = None
+
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.02):
+            await self.run_keep_alive(0.2)
+
+        self.assertIsNone(self.mower.model_name)
+        self.assertGreater(self.model_reads(), 0)
+        self.assertGreater(self.keep_alives(), 0)
+        self.assertEqual(self.mower.keep_alive_failed, 0)
+
+    async def test_interval_learned_before_model_is_known(self):
+        mower = Mower(0x13A51453, "00:00:00:00:00:00")
+        mower.last_activity = time.monotonic() - 10
+
+        with patch.dict("automower_ble.mower.KEEP_ALIVE_INTERVALS", clear=True):
+            mower._on_disconnected(None)
+            self.assertEqual(KEEP_ALIVE_INTERVALS, {})
+
+            mower._apply_model("Test")
+
+            self.assertAlmostEqual(mower.keep_alive_interval, 7.5, places=1)
+            self.assertAlmostEqual(KEEP_ALIVE_INTERVALS["Test"], 7.5, places=1)
+
+    async def test_interval_learned_from_disconnect(self):
+        mower = Mower(0x13A51453, "00:00:00:00:00:00")
+        mower.model_name = "Test"
+        mower.last_activity = time.monotonic() - 10
+
+        with patch.dict("automower_ble.mower.KEEP_ALIVE_INTERVALS", clear=True):
+            mower._on_disconnected(None)
+
+            self.assertAlmostEqual(mower.keep_alive_interval, 7.5, places=1)
+            self.assertAlmostEqual(KEEP_ALIVE_INTERVALS["Test"], 7.5, places=1)
+
+    async def test_own_disconnect_is_not_learned(self):
+        self.mower.keep_alive_event.set()
+        self.mower.last_activity = time.monotonic() - 0.02
+
+        self.mower._on_disconnected(None)
+
+        self.assertEqual(self.mower.keep_alive_interval, 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
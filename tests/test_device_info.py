@@ -0,0 +1,92 @@
+import datetime as dt
+import unittest
+from automower_ble.mower import Mower
+from automower_ble.protocol import ResponseResult
+from automower_ble.simulator import SimulatedMower
+
+CHANNEL_ID = 0x13A51453
+
+
+class TestDeviceInfo(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.simulator = SimulatedMower(
+            device_type=7,
+            device_variant=1,
+            responses={
+                "GetSwVersionStringAppl": "MSW 1.2.3",
+                "GetHardwareRevision": 4,
+                "GetProductionTime": 1600000000,
+            },
+        )
+        self.mower = Mower(CHANNEL_ID, self.simulator.address)
+        self.simulator.attach(self.mower)
+        await self.mower.connect(self.simulator.device)
+
+    async def asyncTearDown(self):
+        await self.mower.disconnect()
+
+    async def test_model_read_once(self):
+        for _ in range(3):
+            self.assertEqual(await self.mower.get_manufacturer(), "Husqvarna")
+            self.assertEqual(await self.mower.get_model(), "Automower 430XH")
+
+        self.assertEqual(self.simulator.requests["GetModel"], 1)
+
+    async def test_unknown_model(self):
+        self.simulator.device_type = 99
+        # The model was read on connect
+        self.mower.device_info.clear()
+
+        self.assertEqual(await self.mower.get_model(), "Unknown Model (99, 1)")
+        self.assertEqual(
+            await self.mower.get_manufacturer(), "Unknown Manufacturer (99, 1)"
+        )
+
+    async def test_load_reads_missing_fields(self):
+        info = self.mower.device_info
+        self.assertEqual(await info.serial_number(), 1234567)
+
+        values = await info.load()
+
+        self.assertEqual(values["software_version"], "MSW 1.2.3")
+        self.assertEqual(values["hardware_revision"], 4)
+        self.assertEqual(
+            values["production_time"],
+            dt.datetime(2020, 9, 13, 12, 26, 40, tzinfo=dt.UTC),
+        )
+        self.assertEqual(self.simulator.requests["GetSerialNumber"], 1)
+        await info.load()
+        self.assertEqual(self.simulator.requests["GetSwVersionStringAppl"], 1)
+
+    async def test_failed_field_is_read_again(self):
+        self.simulator.responses["GetHardwareRevision"] = ResponseResult.NOT_ALLOWED
+        self.assertIsNone(await self.mower.device_info.hardware_revision())
+
+        self.simulator.responses["GetHardwareRevision"] = 5
+        self.assertEqual(await self.mower.device_info.hardware_revision(), 5)
+
+    async def test_cleared_on_disconnect(self):
+        await self.mower.get_model()
+        await self.mower.disconnect()
+        self.assertEqual(self.mower.device_info.values, {})
+
+        await self.mower.connect(self.simulator.device)
+        await self.mower.get_model()
+        self.assertEqual(self.simulator.requests["GetModel"], 2)
+
+    async def test_cleared_when_serial_number_changes(self):
+        await self.mower.device_info.load()
+        await self.mower.command("GetSerialNumber")
+        self.assertIn("model_information", self.mower.device_info.values)
+
+        self.simulator.serial_number = 7654321
+        self.simulator.device_type = 12
+        self.simulator.device_variant = 0
+        await self.mower.command("GetSerialNumber")
+
+        self.assertEqual(self.mower.device_info.values, {"serial_number": 7654321})
+        self.assertEqual(await self.mower.get_model(), "Automower 315")
+
+
+if __name__ == "__main__":
+    unittest.main()
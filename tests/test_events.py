@@ -0,0 +1,87 @@
+import asyncio
+import json
+import unittest
+from importlib.resources import files
+from automower_ble.mower import Mower
+from automower_ble.protocol import Command, MowerEvent, ResponseResult
+from automower_ble.simulator import SimulatedMower
+
+CHANNEL_ID = 0x13A51453
+BATTERY_EVENT = (4106, 20)
+
+
+class TestEvents(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            self.protocol = json.load(f)
+        self.simulator = SimulatedMower(battery_level=42, latency=0.01)
+        self.mower = Mower(CHANNEL_ID, self.simulator.address)
+        self.simulator.attach(self.mower)
+        await self.mower.connect(self.simulator.device)
+        self.events: asyncio.Queue[MowerEvent] = asyncio.Queue()
+
+    async def asyncTearDown(self):
+        await self.mower.disconnect()
+
+    async def callback(self, event: MowerEvent) -> None:
+        self.events.put_nowait(event)
+
+    def test_event_round_trip(self):
+        command = Command(CHANNEL_ID, self.protocol["GetBatteryLevel"])
+        event = command.generate_event(response=80)
+
+        self.assertEqual(event[10], 0x02)
+        self.assertEqual(event[2] + 4, len(event))
+        self.assertEqual(command.parse_event(event), {"response": 80})
+        self.assertFalse(command.validate_command_response(event))
+
+    async def test_event_is_not_a_response(self):
+        self.mower.add_event_callback(BATTERY_EVENT, self.callback)
+        command = Command(CHANNEL_ID, self.protocol["GetBatteryLevel"])
+
+        battery = asyncio.create_task(self.mower.command("GetBatteryLevel"))
+        await asyncio.sleep(0)
+        # The event reaches the client before the response to the request
+        # for the same command ID
+        self.mower.client.send_event(command.generate_event(response=7))
+        self.assertEqual(await battery, 42)
+
+        event = await asyncio.wait_for(self.events.get(), 1)
+        self.assertEqual(event.event_id, BATTERY_EVENT)
+        self.assertEqual(event.name, "GetBatteryLevel")
+        self.assertEqual(event.data, {"response": 7})
+
+    async def test_unknown_event_is_raw(self):
+        self.mower.add_event_callback((9999, 1), self.callback)
+        command = Command(CHANNEL_ID, {"major": 9999, "minor": 1, "responseType": {}})
+        self.mower.client.send_event(command.generate_event())
+
+        event = await asyncio.wait_for(self.events.get(), 1)
+        self.assertIsNone(event.name)
+        self.assertEqual(event.data, b"")
+
+        self.mower.remove_event_callback((9999, 1), self.callback)
+        self.mower.client.send_event(command.generate_event())
+        await asyncio.sleep(0.05)
+        self.assertTrue(self.events.empty())
+
+    async def test_subscribe_events(self):
+        result = await self.mower.subscribe_events(
+            "SubscribeDrivingSettingsEvents", BATTERY_EVENT, self.callback
+        )
+        self.assertEqual(result, ResponseResult.OK)
+        self.assertEqual(self.simulator.requests["SubscribeDrivingSettingsEvents"], 1)
+
+        self.simulator.responses["SubscribeDrivingSettingsEvents"] = (
+            ResponseResult.NOT_ALLOWED
+        )
+        result = await self.mower.subscribe_events(
+            "SubscribeDrivingSettingsEvents", (4712, 10), self.callback
+        )
+        self.assertEqual(result, ResponseResult.NOT_ALLOWED)
+        self.assertNotIn((4712, 10), self.mower._event_callbacks)
+        self.assertIn(BATTERY_EVENT, self.mower._event_callbacks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+from automower_ble.fleet import MowerFleet
+from automower_ble.mower import Mower
+from automower_ble.protocol import ResponseResult
+from automower_ble.simulator import SimulatedMower
+
+CHANNEL_ID = 0x13A51453
+
+
+class TestMowerFleet(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fleet = MowerFleet(max_concurrency=2, connect_stagger=0.0)
+        self.simulators = {}
+        for i, latency in enumerate((0.03, 0.0, 0.01)):
+            simulator = SimulatedMower(
+                address=f"00:00:00:00:00:0{i}", battery_level=50 + i, latency=latency
+            )
+            simulator.attach(self.fleet.add(CHANNEL_ID, simulator.address))
+            self.simulators[simulator.address] = simulator
+
+        results = await self.fleet.connect_all(
+            {address: s.device for address, s in self.simulators.items()}
+        )
+        self.assertEqual(
+            {address: result.value for address, result in results.items()},
+            dict.fromkeys(self.simulators, ResponseResult.OK),
+        )
+
+    async def asyncTearDown(self):
+        await self.fleet.disconnect_all()
+
+    async def test_shares_protocol(self):
+        protocols = {id(mower.protocol) for mower in self.fleet}
+        self.assertEqual(len(protocols), 1)
+        self.assertIsNotNone(self.fleet.protocol)
+
+    async def test_keep_alives_are_staggered(self):
+        offsets = [mower.keep_alive_offset for mower in self.fleet]
+        self.assertEqual(len(set(offsets)), 3)
+        self.assertTrue(
+            all(
+                o < m.keep_alive_interval
+                for o, m in zip(offsets, self.fleet, strict=True)
+            )
+        )
+
+    async def test_poll_yields_as_completed(self):
+        results = [result async for result in self.fleet.poll()]
+
+        self.assertEqual(
+            [result.address for result in results],
+            ["00:00:00:00:00:01", "00:00:00:00:00:02", "00:00:00:00:00:00"],
+        )
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertEqual(
+                result.value.battery_level,
+                self.simulators[result.address].battery_level,
+            )
+        self.assertEqual(set(self.fleet.status), set(self.simulators))
+
+    async def test_bounded_concurrency(self):
+        running = 0
+        peak = 0
+
+        async def operation(mower: Mower) -> int | None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return await mower.battery_level()
+
+        results = await self.fleet.poll_all(operation)
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(
+            {address: result.value for address, result in results.items()},
+            {address: s.battery_level for address, s in self.simulators.items()},
+        )
+
+    async def test_failures_and_stats(self):
+        async def operation(mower: Mower) -> None:
+            if mower.address.endswith("1"):
+                raise ValueError("broken")
+            await mower.battery_level()
+
+        results = await self.fleet.poll_all(operation)
+        self.assertIsInstance(results["00:00:00:00:00:01"].error, ValueError)
+
+        stats = self.fleet.stats()
+        self.assertEqual(stats.mowers, 3)
+        self.assertEqual(stats.connected, 3)
+        health = stats.health["00:00:00:00:00:01"]
+        self.assertEqual((health.polls, health.poll_failures), (1, 1))
+        self.assertEqual(health.last_error, "broken")
+        self.assertEqual(stats.requests, sum(h.requests for h in stats.health.values()))
+        self.assertGreater(sum(stats.latency_buckets.values()), 0)
+        self.assertLessEqual(sum(stats.latency_buckets.values()), stats.requests)
+        self.assertIsNotNone(stats.latency_mean)
+
+    async def test_remove(self):
+        await self.fleet.remove("00:00:00:00:00:00")
+
+        self.assertEqual(len(self.fleet), 2)
+        with self.assertRaises(KeyError):
+            self.fleet["00:00:00:00:00:00"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import asyncio
+import tempfile
+import unittest
+from dataclasses import dataclass
+from pathlib import Path
+from automower_ble.helpers import (
+    Crc8,
+    crc,
+    load_json_entries,
+    save_json_entries,
+)
+
+FRAME = bytearray.fromhex("02fd150025be246a012e01af52120400000400010000004f03")
+
+
+class TestCrc(unittest.TestCase):
+    def test_incremental_matches_crc(self):
+        checksum = Crc8()
+        for i in range(1, len(FRAME) - 2, 7):
+            checksum.update(FRAME[i : min(i + 7, len(FRAME) - 2)])
+
+        self.assertEqual(checksum.value, crc(FRAME, 1, len(FRAME) - 3))
+        self.assertEqual(checksum.value, FRAME[-2])
+
+        checksum.reset()
+        self.assertEqual(checksum.update(FRAME, 1, 8), FRAME[9])
+
+
+@dataclass
+class Entry:
+    count: int
+    names: list[str]
+
+
+class TestJsonEntries(unittest.TestCase):
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "entries.json"
+            self.assertEqual(asyncio.run(load_json_entries(path, Entry, "test")), {})
+
+            asyncio.run(save_json_entries(path, {"a": Entry(1, ["x"])}, "test"))
+
+            self.assertEqual(
+                asyncio.run(load_json_entries(path, Entry, "test")),
+                {"a": Entry(1, ["x"])},
+            )
+            self.assertFalse(path.with_suffix(".tmp").exists())
+
+    def test_unreadable_file_is_empty(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "entries.json"
+            for content in ("not json", "[]", '{"a": {"other": 1}}'):
+                path.write_text(content)
+                with self.assertLogs("automower_ble.helpers", "WARNING"):
+                    self.assertEqual(
+                        asyncio.run(load_json_entries(path, Entry, "test")), {}
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
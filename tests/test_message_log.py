@@ -0,0 +1,146 @@
+import datetime as dt
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from automower_ble.error_codes import ErrorCodes
+from automower_ble.message_log import MessageCursor, MessageLog, error_code
+from automower_ble.mower import Mower
+from automower_ble.protocol import ResponseResult
+from automower_ble.simulator import SimulatedMower
+
+CHANNEL_ID = 0x13A51453
+SERIAL_NUMBER = 1234567
+
+
+def message(time: int, code: int) -> dict[str, int]:
+    return {"time": time, "code": code, "severity": 1}
+
+
+class TestMessageLog(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "message_log.json"
+        # The newest message is first
+        self.simulator = SimulatedMower(
+            serial_number=SERIAL_NUMBER,
+            messages=[message(1700000200, 9), message(1700000100, 2)],
+        )
+        self.mower = Mower(CHANNEL_ID, self.simulator.address)
+        self.simulator.attach(self.mower)
+        await self.mower.connect(self.simulator.device)
+
+    async def asyncTearDown(self):
+        await self.mower.disconnect()
+        self.directory.cleanup()
+
+    def add_message(self, time: int, code: int) -> None:
+        self.simulator.messages.insert(0, message(time, code))
+
+    async def test_only_new_messages_are_read(self):
+        log = MessageLog(self.path)
+        messages = await log.sync(self.mower)
+
+        self.assertEqual(
+            [(m.code, m.message_id) for m in messages],
+            [(ErrorCodes.NO_LOOP_SIGNAL, 1), (ErrorCodes.TRAPPED, 0)],
+        )
+        self.assertEqual(
+            messages[-1].time, dt.datetime.fromtimestamp(1700000200, dt.UTC)
+        )
+
+        # Only the newest message is read to see if the log moved on
+        self.assertEqual(await log.sync(self.mower), [])
+        self.assertEqual(self.simulator.requests["GetMessage"], 3)
+
+        self.add_message(1700000300, 10)
+        messages = await log.sync(self.mower)
+        self.assertEqual([m.code for m in messages], [ErrorCodes.UPSIDE_DOWN])
+        self.assertEqual(self.simulator.requests["GetMessage"], 4)
+
+    async def test_full_log(self):
+        log = MessageLog()
+        await log.sync(self.mower)
+
+        # The log keeps two messages, the oldest ones are dropped
+        for time, code in ((1700000300, 10), (1700000400, 13), (1700000500, 14)):
+            self.add_message(time, code)
+            self.simulator.messages.pop()
+            messages = await log.sync(self.mower)
+            self.assertEqual([m.code for m in messages], [ErrorCodes(code)])
+
+        self.add_message(1700000600, 15)
+        self.add_message(1700000700, 16)
+        del self.simulator.messages[2:]
+        messages = await log.sync(self.mower)
+        self.assertEqual(
+            [m.code for m in messages],
+            [ErrorCodes.LIFTED, ErrorCodes.STUCK_IN_CHARGING_STATION],
+        )
+        self.assertEqual(await log.get(SERIAL_NUMBER), MessageCursor(2, 1700000700))
+        self.assertEqual(await log.sync(self.mower), [])
+
+    async def test_cursor_is_persisted(self):
+        await MessageLog(self.path).sync(self.mower)
+
+        with self.path.open("r") as f:
+            self.assertEqual(
+                json.load(f),
+                {str(SERIAL_NUMBER): {"count": 2, "timestamp": 1700000200}},
+            )
+        self.add_message(1700000300, 10)
+        messages = await MessageLog(self.path).sync(self.mower)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(self.simulator.requests["GetMessage"], 3)
+
+    async def test_empty_log_is_not_read(self):
+        self.simulator.messages.clear()
+
+        self.assertEqual(await MessageLog().sync(self.mower), [])
+        self.assertNotIn("GetMessage", self.simulator.requests)
+
+    async def test_cleared_log(self):
+        log = MessageLog()
+        await log.set(SERIAL_NUMBER, MessageCursor(5, 1700000150))
+
+        messages = await log.sync(self.mower)
+
+        self.assertEqual([m.code for m in messages], [ErrorCodes.TRAPPED])
+        self.assertEqual(await log.get(SERIAL_NUMBER), MessageCursor(2, 1700000200))
+
+    async def test_failed_message_is_read_again(self):
+        log = MessageLog()
+        await log.sync(self.mower)
+        self.add_message(1700000300, 10)
+        self.add_message(1700000400, 13)
+        self.add_message(1700000500, 14)
+        handler = self.simulator.handlers["GetMessage"]
+        self.simulator.handlers["GetMessage"] = lambda parameters: (
+            ResponseResult.DEVICE_BUSY
+            if parameters["messageId"] == 1
+            else handler(parameters)
+        )
+
+        messages = await log.sync(self.mower)
+        # Only the messages older than the one that failed
+        self.assertEqual([m.code for m in messages], [ErrorCodes.UPSIDE_DOWN])
+
+        self.simulator.handlers["GetMessage"] = handler
+        messages = await log.sync(self.mower)
+        self.assertEqual(
+            [m.code for m in messages], [ErrorCodes.NO_DRIVE, ErrorCodes.MOWER_LIFTED]
+        )
+
+    async def test_max_messages(self):
+        messages = await MessageLog().sync(self.mower, max_messages=1)
+
+        self.assertEqual([m.code for m in messages], [ErrorCodes.TRAPPED])
+        self.assertEqual(self.simulator.requests["GetMessage"], 1)
+
+    def test_unknown_error_code(self):
+        self.assertEqual(error_code(2), ErrorCodes.NO_LOOP_SIGNAL)
+        self.assertEqual(error_code(99999), 99999)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+from automower_ble.metrics import Metrics
+from automower_ble.mower import Mower
+from automower_ble.protocol import ResponseResult
+from automower_ble.simulator import SimulatedMower
+
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.simulator = SimulatedMower()
+        self.metrics = Metrics({"address": self.simulator.address})
+        self.mower = Mower(0x13A51453, self.simulator.address, metrics=self.metrics)
+        self.simulator.attach(self.mower)
+        await self.mower.connect(self.simulator.device)
+
+    async def asyncTearDown(self):
+        if self.mower.is_connected():
+            await self.mower.disconnect()
+
+    async def test_requests_are_recorded(self):
+        await self.mower.battery_level()
+        await self.mower.battery_level()
+        await self.mower.command_response("GetTask", taskId=3)
+
+        metrics = self.metrics.as_dict()
+        battery = metrics["commands"]["GetBatteryLevel"]
+        self.assertEqual(battery["requests"], 2)
+        self.assertEqual(battery["results"], {"OK": 2})
+        self.assertEqual(battery["bytes_written"], 40)
+        self.assertEqual(battery["bytes_read"], 44)
+        self.assertEqual(battery["latency"]["count"], 2)
+        self.assertEqual(metrics["commands"]["GetTask"]["results"], {"INVALID_ID": 1})
+        self.assertEqual(metrics["commands"]["channel"]["requests"], 2)
+        self.assertGreater(metrics["reassembly"]["frames"], 0)
+
+    async def test_timeouts_are_recorded(self):
+        self.simulator.ready_after = 60
+        self.mower.client._ready_at = float("inf")
+
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.01):
+            result, _ = await self.mower.command_response("GetBatteryLevel")
+
+        self.assertIs(result, ResponseResult.UNKNOWN_ERROR)
+        self.assertEqual(
+            self.metrics.as_dict()["commands"]["GetBatteryLevel"]["timeouts"], 1
+        )
+
+    async def test_render(self):
+        await self.mower.battery_level()
+
+        text = self.metrics.render()
+
+        self.assertIn(
+            'automower_ble_requests_total{address="00:00:00:00:00:00",'
+            'command="GetBatteryLevel"} 1\n',
+            text,
+        )
+        self.assertIn(
+            'automower_ble_responses_total{address="00:00:00:00:00:00",'
+            'command="GetBatteryLevel",result="OK"} 1\n',
+            text,
+        )
+        self.assertIn(
+            'automower_ble_request_duration_seconds_bucket{address="00:00:00:00:00:00",'
+            'command="GetBatteryLevel",le="+Inf"} 1\n',
+            text,
+        )
+        self.assertIn("# TYPE automower_ble_request_duration_seconds histogram\n", text)
+
+
+class TestMetricsDisabled(unittest.IsolatedAsyncioTestCase):
+    async def test_nothing_recorded(self):
+        simulator = SimulatedMower()
+        mower = Mower(0x13A51453, simulator.address)
+        simulator.attach(mower)
+        await mower.connect(simulator.device)
+
+        self.assertIsNone(mower.metrics)
+        self.assertEqual(await mower.battery_level(), 100)
+        await mower.disconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from automower_ble.reassembler import FrameReassembler
+
+GET_MODEL_RESPONSE = bytes.fromhex("02fd1300b63b604701e601af5a1209000002001701c803")
+IS_CHARGING_RESPONSE = bytes.fromhex("02fd1200b63b604701db01af0a101500000100011603")
+
+
+class TestFrameReassembler(unittest.TestCase):
+    def test_single_frame(self):
+        reassembler = FrameReassembler()
+
+        self.assertEqual(reassembler.feed(GET_MODEL_RESPONSE), [GET_MODEL_RESPONSE])
+        self.assertEqual(len(reassembler), 0)
+        self.assertEqual(reassembler.frames, 1)
+
+    def test_split_frame(self):
+        reassembler = FrameReassembler()
+
+        self.assertEqual(reassembler.feed(GET_MODEL_RESPONSE[:2]), [])
+        self.assertEqual(reassembler.feed(GET_MODEL_RESPONSE[2:17]), [])
+        self.assertEqual(
+            reassembler.feed(GET_MODEL_RESPONSE[17:]), [GET_MODEL_RESPONSE]
+        )
+
+    def test_multiple_frames_in_one_chunk(self):
+        reassembler = FrameReassembler()
+
+        data = GET_MODEL_RESPONSE + IS_CHARGING_RESPONSE + GET_MODEL_RESPONSE[:5]
+        self.assertEqual(
+            reassembler.feed(data), [GET_MODEL_RESPONSE, IS_CHARGING_RESPONSE]
+        )
+        self.assertEqual(len(reassembler), 5)
+        self.assertEqual(reassembler.feed(GET_MODEL_RESPONSE[5:]), [GET_MODEL_RESPONSE])
+
+    def test_stale_prefix_is_dropped(self):
+        reassembler = FrameReassembler()
+
+        self.assertEqual(reassembler.feed(bytes.fromhex("c80301")), [])
+        self.assertEqual(reassembler.feed(IS_CHARGING_RESPONSE), [IS_CHARGING_RESPONSE])
+        self.assertEqual(reassembler.dropped_bytes, 3)
+        self.assertEqual(reassembler.resyncs, 1)
+
+    def test_corrupt_frame_is_dropped(self):
+        reassembler = FrameReassembler()
+
+        corrupt = bytearray(GET_MODEL_RESPONSE)
+        corrupt[19] ^= 0xFF
+        self.assertEqual(
+            reassembler.feed(bytes(corrupt) + IS_CHARGING_RESPONSE),
+            [IS_CHARGING_RESPONSE],
+        )
+        self.assertEqual(reassembler.crc_errors, 1)
+        self.assertEqual(reassembler.dropped_bytes, len(GET_MODEL_RESPONSE))
+
+    def test_too_short_length_is_dropped(self):
+        reassembler = FrameReassembler()
+
+        # The header CRC matches, but the length leaves no room for the
+        # frame CRC and end byte
+        short = bytes.fromhex("02fd06000000004c0003")
+        self.assertEqual(
+            reassembler.feed(short + IS_CHARGING_RESPONSE), [IS_CHARGING_RESPONSE]
+        )
+        self.assertEqual(reassembler.dropped_bytes, len(short))
+        self.assertEqual(reassembler.frames, 1)
+
+    def test_buffer_grows(self):
+        reassembler = FrameReassembler(size=8)
+
+        data = IS_CHARGING_RESPONSE * 4
+        frames = []
+        for i in range(0, len(data), 3):
+            frames += reassembler.feed(data[i : i + 3])
+        self.assertEqual(frames, [IS_CHARGING_RESPONSE] * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
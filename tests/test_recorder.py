@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from automower_ble.mower import Mower
+from automower_ble.recorder import NOTIFY, WRITE, FlightRecorder, HexBytes
+from automower_ble.simulator import SimulatedMower
+
+
+class TestFlightRecorder(unittest.TestCase):
+    def test_keeps_last_records(self):
+        recorder = FlightRecorder(size=2)
+        for i in range(3):
+            recorder.record(WRITE, bytes([i]))
+
+        self.assertEqual([data for _, _, data in recorder], [b"\x01", b"\x02"])
+
+    def test_dump_and_load(self):
+        recorder = FlightRecorder()
+        recorder.record(WRITE, bytearray(b"\x02\xfd"))
+        recorder.record(NOTIFY, b"\x03")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "dump.bin"
+            recorder.dump(path)
+
+            self.assertEqual(FlightRecorder.load(path), list(recorder))
+
+    def test_hex_is_lazy(self):
+        with patch("automower_ble.recorder.binascii.hexlify") as hexlify:
+            logging.getLogger("automower_ble.test").debug("%s", HexBytes(b"\x02"))
+        hexlify.assert_not_called()
+
+        self.assertEqual(str(HexBytes(b"\x02\xfd")), "b'02fd'")
+
+
+def dumps(directory: str, reason: str) -> list[Path]:
+    return sorted(Path(directory).glob(f"flight-*-{reason}.bin"))
+
+
+class TestRecorderTrigger(unittest.IsolatedAsyncioTestCase):
+    async def test_dumped_on_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = FlightRecorder(directory=tmp)
+            futures = []
+            trigger = recorder.trigger
+            recorder.trigger = lambda reason: futures.append(trigger(reason))
+
+            simulator = SimulatedMower()
+            mower = Mower(0x13A51453, simulator.address, recorder=recorder)
+            simulator.attach(mower)
+            await mower.connect(simulator.device)
+            await mower.battery_level()
+
+            mower.client._ready_at = float("inf")
+            with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.01):
+                await mower.command_response("GetBatteryLevel")
+            await asyncio.gather(*futures)
+
+            files = dumps(tmp, "timeout")
+            self.assertEqual(len(files), 1)
+            records = FlightRecorder.load(files[0])
+            directions = [direction for _, direction, _ in records]
+            self.assertIn(WRITE, directions)
+            self.assertIn(NOTIFY, directions)
+            self.assertEqual(records[-1][1], WRITE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from automower_ble.capture import RECEIVED, SENT
+from automower_ble.mower import Mower
+from automower_ble.recorder import NOTIFY, FlightRecorder
+from automower_ble.replay import Recording, Replay, ReplayDivergence
+from automower_ble.simulator import SimulatedMower
+from tests.test_capture import acl_packets, write_btsnoop
+
+CHANNEL_ID = 0x13A51453
+TASK = {
+    "next_start_time": 0,
+    "start": 36000,
+    "duration": 3600,
+    "useOnMonday": True,
+    "useOnTuesday": True,
+    "useOnWednesday": False,
+    "useOnThursday": False,
+    "useOnFriday": True,
+    "useOnSaturday": False,
+    "useOnSunday": False,
+}
+
+
+async def disconnect(mower: Mower) -> None:
+    # A timeout disconnects the mower
+    if mower.is_connected():
+        await mower.disconnect()
+
+
+class TestReplay(unittest.IsolatedAsyncioTestCase):
+    async def record(self, latency: float = 0.0) -> FlightRecorder:
+        recorder = FlightRecorder(size=4096)
+        simulator = SimulatedMower(
+            battery_level=42, tasks=[TASK, TASK], latency=latency
+        )
+        mower = Mower(CHANNEL_ID, simulator.address, recorder=recorder)
+        simulator.attach(mower)
+        await mower.connect(simulator.device)
+        self.assertEqual(await mower.battery_level(), 42)
+        self.assertEqual(len(await mower.get_tasks()), 2)
+        await mower.disconnect()
+        return recorder
+
+    async def replay(self, replay: Replay) -> Mower:
+        mower = Mower(replay.recording.channel_id, replay.address)
+        replay.attach(mower)
+        await mower.connect(replay.device)
+        self.addAsyncCleanup(disconnect, mower)
+        return mower
+
+    async def test_replays_session(self):
+        recording = Recording.from_records(await self.record())
+        self.assertEqual(recording.channel_id, CHANNEL_ID)
+
+        replay = Replay(recording, realtime=False)
+        mower = await self.replay(replay)
+        self.assertEqual(await mower.battery_level(), 42)
+        tasks = await mower.get_tasks()
+
+        self.assertEqual([task.duration_in_minutes for task in tasks], [60, 60])
+        self.assertEqual(replay.divergences, [])
+        self.assertEqual(replay.remaining, [])
+
+    async def test_realtime_keeps_timing(self):
+        recording = Recording.from_records(await self.record(latency=0.02))
+        battery = next(
+            exchange
+            for exchange in recording.exchanges
+            if exchange.request[12:15] == b"\x0a\x10\x14"
+        )
+        delay = battery.notifications[-1][0]
+        self.assertGreaterEqual(delay, 0.02)
+
+        for realtime in (True, False):
+            mower = await self.replay(Replay(recording, realtime=realtime))
+            start = time.monotonic()
+            await mower.battery_level()
+            elapsed = time.monotonic() - start
+            if realtime:
+                self.assertGreaterEqual(elapsed, delay * 0.9)
+            else:
+                self.assertLess(elapsed, delay)
+
+    async def test_divergence(self):
+        recording = Recording.from_records(await self.record())
+        replay = Replay(recording, realtime=False)
+        mower = await self.replay(replay)
+
+        # Tasks were read after the battery level in the recording
+        self.assertEqual(len(await mower.get_tasks()), 2)
+        self.assertEqual(replay.divergences[0].reason, "skipped 1 recorded requests")
+
+        with patch("automower_ble.protocol.RESPONSE_TIMEOUT", 0.05):
+            self.assertIsNone(await mower.command("GetMode"))
+        self.assertEqual(
+            [divergence.reason for divergence in replay.divergences],
+            ["skipped 1 recorded requests", "unexpected request"],
+        )
+
+    async def test_strict(self):
+        recording = Recording.from_records(await self.record())
+        mower = await self.replay(Replay(recording, realtime=False, strict=True))
+
+        with self.assertRaises(ReplayDivergence):
+            await mower.command("GetMode")
+
+    async def test_strict_with_extra_setup_probes(self):
+        recording = Recording.from_records(await self.record(latency=0.03))
+        replay = Replay(recording, strict=True)
+
+        # The recorded setup answer is slower than a probe waits, so more
+        # probes are sent than were recorded
+        with patch("automower_ble.protocol.READY_PROBE_TIMEOUT", 0.01):
+            mower = await self.replay(replay)
+
+        self.assertTrue(mower.is_connected())
+        self.assertEqual(
+            {divergence.reason for divergence in replay.divergences},
+            {"unexpected request"},
+        )
+        self.assertEqual(await mower.battery_level(), 42)
+        with self.assertRaises(ReplayDivergence):
+            await mower.command("GetMode")
+
+    async def test_load(self):
+        recorder = await self.record()
+        with tempfile.TemporaryDirectory() as tmp:
+            dump = Path(tmp) / "flight.bin"
+            recorder.dump(dump)
+            capture = Path(tmp) / "btsnoop_hci.log"
+            write_btsnoop(
+                capture,
+                [
+                    (
+                        RECEIVED if direction == NOTIFY else SENT,
+                        packet,
+                    )
+                    for _, direction, data in recorder
+                    for packet in acl_packets(
+                        0x1B if direction == NOTIFY else 0x52, 14, data
+                    )
+                ],
+            )
+
+            recordings = [Recording.load(dump), Recording.load(capture)]
+
+        for recording in recordings:
+            self.assertEqual(
+                [exchange.request for exchange in recording.exchanges],
+                [
+                    exchange.request
+                    for exchange in Recording.from_records(recorder).exchanges
+                ],
+            )
+            replay = Replay(recording, realtime=False)
+            mower = await self.replay(replay)
+            self.assertEqual(await mower.battery_level(), 42)
+            self.assertEqual(replay.divergences, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 import json
 from importlib.resources import files
@@ -172,6 +173,58 @@ class TestRequestMethods(unittest.TestCase):
             b"02fd10005314a513016900af3212020000004103",
         )
 
+    def test_generate_add_task_request(self):
+        command = Command(0x13A51453, parameter=self.protocol["AddTask"])
+
+        self.assertEqual(
+            binascii.hexlify(
+                command.generate_request(
+                    start=36000,
+                    duration=7200,
+                    useOnMonday=True,
+                    useOnTuesday=False,
+                    useOnWednesday=True,
+                    useOnThursday=False,
+                    useOnFriday=True,
+                    useOnSaturday=False,
+                    useOnSunday=True,
+                    unknown=0,
+                )
+            ),
+            b"02fd21005314a513014000af521207001100a08c0000201c0000010001000100010000e603",
+        )
+
+    def test_generate_request_is_repeatable(self):
+        command = Command(0x13A51453, parameter=self.protocol["GetTask"])
+
+        first = command.generate_request(taskId=1)
+        first[0] = 0x00  # Returned frames must not share the cached template
+        self.assertEqual(
+            binascii.hexlify(command.generate_request(taskId=0)),
+            b"02fd14005314a513019d00af52120500040000000000d203",
+        )
+
+        command = Command(0x13A51453, parameter=self.protocol["KeepAlive"])
+        command.generate_request()[0] = 0x00
+        self.assertEqual(
+            binascii.hexlify(command.generate_request()),
+            b"02fd10005314a513016900af421202000000d903",
+        )
+
+    def test_generate_request_missing_parameter(self):
+        command = Command(0x13A51453, parameter=self.protocol["SetOverrideMow"])
+
+        with self.assertRaisesRegex(ValueError, "Missing request parameter"):
+            command.generate_request()
+
+    def test_client_caches_commands(self):
+        client = BLEClient(0x13A51453, "00:00:00:00:00:00")
+        client.protocol = self.protocol
+
+        first = asyncio.run(client.get_command("GetBatteryLevel"))
+        second = asyncio.run(client.get_command("GetBatteryLevel"))
+        self.assertIs(first, second)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,26 @@
 import unittest
 import json
+import struct
 from importlib.resources import files
+from automower_ble.helpers import crc
 from automower_ble.protocol import Command, MowerState, MowerActivity
 from automower_ble.models import MowerModels
 
 
+def response_frame(command: Command, payload: bytes) -> bytearray:
+    """An OK response to `command` from channel 0x13A51453"""
+    length = 17 + len(payload)
+    data = bytearray(b"\x02\xfd") + length.to_bytes(2, "little")
+    data += (0x13A51453).to_bytes(4, "little") + b"\x01"
+    data.append(crc(data, 1, 8))
+    data += b"\x01\xaf" + command.major.to_bytes(2, "little")
+    data += bytes([command.minor, 0, 0]) + len(payload).to_bytes(2, "little")
+    data += payload
+    data.append(crc(data, 1, len(data) - 1))
+    data.append(0x03)
+    return data
+
+
 class TestRequestMethods(unittest.TestCase):
     def setUp(self):
         with files("automower_ble").joinpath("protocol.json").open("r") as f:
@@ -106,6 +122,110 @@ class TestRequestMethods(unittest.TestCase):
             1,
         )
 
+    def test_decode_get_override_response(self):
+        response = Command(0x13A51453, self.protocol["GetOverride"])
+        decoded = response.parse_response(
+            bytearray.fromhex(
+                "02fd1e005314a51301e501af32120200000d000210e5676f201c000000000000e703"
+            )
+        )
+
+        self.assertEqual(decoded["action"], 2)
+        self.assertEqual(decoded["startTime"], 0x6F67E510)
+        self.assertEqual(decoded["duration"], 7200)
+        self.assertEqual(decoded["reserved"], 0)
+
+    def test_decode_signed_response(self):
+        response = Command(0x13A51453, self.protocol["GetBatteryCurrent"])
+        self.assertEqual(
+            response.parse_response(
+                bytearray.fromhex("02fd13005314a51301e501af0a100800000200f0ff0003")
+            )["response"],
+            -16,
+        )
+
+    def test_decode_ascii_response(self):
+        response = Command(0x13A51453, self.protocol["GetUserMowerNameAsAsciiString"])
+        self.assertEqual(
+            response.parse_response(
+                bytearray.fromhex(
+                    "02fd17005314a51301e501af5a120500000600436f6d626f000003"
+                )
+            )["response"],
+            "Combo",
+        )
+
+    def test_decode_get_all_statistics_response(self):
+        command = Command(0x13A51453, self.protocol["GetAllStatistics"])
+        payload = struct.pack("<7I", 360000, 300000, 50000, 7200, 1234, 321, 250000)
+
+        self.assertEqual(
+            command.parse_response(response_frame(command, payload)),
+            {
+                "totalRunningTime": 360000,
+                "totalCuttingTime": 300000,
+                "totalChargingTime": 50000,
+                "totalSearchingTime": 7200,
+                "numberOfCollisions": 1234,
+                "numberOfChargingCycles": 321,
+                "cuttingBladeUsageTime": 250000,
+            },
+        )
+
+    def test_decode_get_message_response(self):
+        command = Command(0x13A51453, self.protocol["GetMessage"])
+        payload = struct.pack("<IIB", 1700000200, 10, 2)
+
+        self.assertEqual(
+            command.parse_response(response_frame(command, payload)),
+            {"time": 1700000200, "code": 10, "severity": 2},
+        )
+
+    def test_decode_get_signal_quality_response(self):
+        command = Command(0x13A51453, self.protocol["GetSignalQuality"])
+        payload = struct.pack(
+            "<BhhhhHBhh", 95, -120, 30, -2000, 1500, 0x0102, 1, -1, 300
+        )
+
+        self.assertEqual(
+            command.parse_response(response_frame(command, payload)),
+            {
+                "signalQuality": 95,
+                "a0Signal": -120,
+                "fSignal": 30,
+                "guide1Signal": -2000,
+                "guide2Signal": 1500,
+                "messageFromChargingStation": 0x0102,
+                "inChargingStation": 1,
+                "nSignal": -1,
+                "guide3Signal": 300,
+            },
+        )
+
+    def test_decode_get_comboard_sensor_data_response(self):
+        command = Command(0x13A51453, self.protocol["GetComboardSensorData"])
+        payload = struct.pack("<BBhhhBh", 0, 1, -15, 7, -980, 0, 235)
+
+        self.assertEqual(
+            command.parse_response(response_frame(command, payload)),
+            {
+                "collision": 0,
+                "lift": 1,
+                "pitch": -15,
+                "roll": 7,
+                "zAcceleration": -980,
+                "upsideDown": 0,
+                "mowerTemperature": 235,
+            },
+        )
+
+    def test_decode_response_length_mismatch(self):
+        response = Command(0x13A51453, self.protocol["GetNumberOfTasks"])
+        with self.assertRaisesRegex(ValueError, "Data length mismatch"):
+            response.parse_response(
+                bytearray.fromhex("02fd140025be246a012e01af521204000003000100004f03")
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from automower_ble.mower import Mower
+from automower_ble.protocol import ResponseResult
+from automower_ble.scheduler import (
+    DEFAULT_ADAPTER,
+    ConnectionScheduler,
+    SlotTimeout,
+    adapter_name,
+)
+from automower_ble.simulator import SimulatedMower
+
+
+class TestConnectionScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_priority_then_arrival_order(self):
+        scheduler = ConnectionScheduler(max_connections=1)
+        first = await scheduler.connection()
+        order = []
+
+        async def connect(name: str, priority: int) -> None:
+            slot = await scheduler.connection(priority=priority)
+            order.append(name)
+            slot.release()
+
+        tasks = [
+            asyncio.create_task(connect(name, priority))
+            for name, priority in (("low", 0), ("high", 1), ("low2", 0), ("high2", 1))
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.stats()[DEFAULT_ADAPTER]["connections"]["queued"], 4)
+
+        first.release()
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(order, ["high", "high2", "low", "low2"])
+        stats = scheduler.stats()[DEFAULT_ADAPTER]["connections"]
+        self.assertEqual((stats["used"], stats["queued"], stats["waits"]), (0, 0, 4))
+
+    async def test_timeout_gives_up_cleanly(self):
+        scheduler = ConnectionScheduler(max_connections=1, wait=0.01)
+        slot = await scheduler.connection()
+
+        with self.assertRaises(SlotTimeout):
+            await scheduler.connection()
+
+        stats = scheduler.stats()[DEFAULT_ADAPTER]["connections"]
+        self.assertEqual((stats["queued"], stats["timeouts"]), (0, 1))
+        slot.release()
+        slot.release()
+        # The slot is free again, not handed to the caller that timed out
+        (await scheduler.connection()).release()
+        self.assertEqual(scheduler.stats()[DEFAULT_ADAPTER]["connections"]["used"], 0)
+
+    async def test_attempts_are_serialised(self):
+        scheduler = ConnectionScheduler(max_connecting=1)
+        running = 0
+        peak = 0
+
+        async def attempt() -> None:
+            nonlocal running, peak
+            async with scheduler.attempt():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(attempt() for _ in range(3)))
+
+        self.assertEqual(peak, 1)
+        self.assertEqual(scheduler.stats()[DEFAULT_ADAPTER]["connecting"]["used"], 0)
+
+    async def test_connection_held_until_disconnect(self):
+        scheduler = ConnectionScheduler(max_connections=1, wait=0.05)
+        mowers = []
+        for i in range(2):
+            simulator = SimulatedMower(address=f"00:00:00:00:00:0{i}")
+            mower = Mower(0x13A51453, simulator.address)
+            mower.scheduler = scheduler
+            simulator.attach(mower)
+            mowers.append((mower, simulator))
+
+        self.assertEqual(
+            await mowers[0][0].connect(mowers[0][1].device), ResponseResult.OK
+        )
+        with self.assertRaises(SlotTimeout):
+            await mowers[1][0].connect(mowers[1][1].device)
+
+        await mowers[0][0].disconnect()
+        self.assertEqual(
+            await mowers[1][0].connect(mowers[1][1].device), ResponseResult.OK
+        )
+        # Dropped by the mower
+        await mowers[1][0].client.disconnect()
+        self.assertEqual(scheduler.stats()[DEFAULT_ADAPTER]["connections"]["used"], 0)
+        await mowers[1][0].disconnect()
+
+    async def test_no_scheduler_by_default(self):
+        mowers = []
+        for i in range(2):
+            simulator = SimulatedMower(address=f"00:00:00:00:00:0{i}")
+            mower = Mower(0x13A51453, simulator.address)
+            simulator.attach(mower)
+            mowers.append((mower, simulator))
+
+        self.assertIsNone(mowers[0][0].scheduler)
+        results = await asyncio.gather(
+            *(mower.connect(simulator.device) for mower, simulator in mowers)
+        )
+
+        self.assertEqual(results, [ResponseResult.OK, ResponseResult.OK])
+        for mower, _ in mowers:
+            self.assertIsNone(mower._connection_slot)
+            await mower.disconnect()
+
+    def test_adapter_name(self):
+        device = SimpleNamespace(details={"path": "/org/bluez/hci1/dev_60_98_66"})
+
+        self.assertEqual(adapter_name(device), "hci1")
+        self.assertEqual(adapter_name(SimpleNamespace(details=None)), DEFAULT_ADAPTER)
+
+
+if __name__ == "__main__":
+    unittest.main()
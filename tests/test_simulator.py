@@ -0,0 +1,317 @@
+import json
+import unittest
+from importlib.resources import files
+from unittest.mock import patch
+from automower_ble.mower import KEEP_ALIVE_INTERVALS, READY_TIMES, TASK_ID_BASES, Mower
+from automower_ble.protocol import (
+    GARDENA_PROTOCOL_DESCRIPTOR_CHAR,
+    Command,
+    MowerActivity,
+    MowerState,
+    ResponseResult,
+    TaskInformation,
+)
+from automower_ble.simulator import SimulatedMower
+
+
+class TestGenerateResponse(unittest.TestCase):
+    def setUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            self.protocol = json.load(f)
+
+    def test_matches_mower_response(self):
+        command = Command(1197489078, parameter=self.protocol["GetModel"])
+
+        self.assertEqual(
+            command.generate_response(deviceType=23, deviceVariant=1),
+            bytearray.fromhex("02fd1300b63b604701e601af5a1209000002001701c803"),
+        )
+
+        command = Command(0x6A24BE25, parameter=self.protocol["GetNumberOfTasks"])
+
+        self.assertEqual(
+            command.generate_response(response=1),
+            bytearray.fromhex("02fd150025be246a012e01af52120400000400010000004f03"),
+        )
+
+    def test_round_trip_for_every_command(self):
+        for name, parameter in self.protocol.items():
+            command = Command(0x13A51453, parameter=parameter)
+            response = command.generate_response()
+            self.assertTrue(command.validate_command_response(response), name)
+            command.parse_response(response)
+
+    def test_error_response_has_no_payload(self):
+        command = Command(0x13A51453, parameter=self.protocol["GetTask"])
+        response = command.generate_response(ResponseResult.INVALID_ID)
+
+        self.assertEqual(response[16], ResponseResult.INVALID_ID)
+        self.assertEqual(response[17:19], b"\x00\x00")
+
+
+class TestSimulator(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.simulator = SimulatedMower(battery_level=42, pin=1234)
+        self.mower = Mower(0x13A51453, self.simulator.address, pin=1234)
+        self.simulator.attach(self.mower)
+        self.assertEqual(
+            await self.mower.connect(self.simulator.device), ResponseResult.OK
+        )
+
+    async def asyncTearDown(self):
+        await self.mower.disconnect()
+
+    async def test_status(self):
+        self.assertEqual(await self.mower.battery_level(), 42)
+        self.assertIs(await self.mower.mower_state(), MowerState.IN_OPERATION)
+        self.assertEqual(await self.mower.get_model(), "Automower 315")
+
+        await self.mower.mower_pause()
+
+        self.assertIs(await self.mower.mower_state(), MowerState.PAUSED)
+        self.assertIs(
+            await self.mower.mower_activity(), MowerActivity.STOPPED_IN_GARDEN
+        )
+
+    async def test_tasks(self):
+        task = TaskInformation(600, 120, True, False, True, False, True, False, True)
+
+        await self.mower.set_tasks([task, task])
+
+        self.assertEqual(len(self.simulator.tasks), 2)
+        tasks = await self.mower.get_tasks()
+        self.assertEqual(len(tasks), 2)
+        self.assertEqual(tasks[1].start_time_in_minutes, 600)
+        self.assertEqual(tasks[1].duration_in_minutes, 120)
+        self.assertTrue(tasks[1].on_sunday)
+        self.assertFalse(tasks[1].on_saturday)
+
+    async def test_unchanged_tasks_are_not_written(self):
+        monday = TaskInformation(
+            600, 120, True, False, False, False, False, False, False
+        )
+        sunday = TaskInformation(60, 30, False, False, False, False, False, False, True)
+
+        report = await self.mower.set_tasks([monday, sunday])
+        self.assertTrue(report.changed)
+        self.assertEqual((report.added, report.removed), (2, 0))
+
+        report = await self.mower.set_tasks([sunday, monday])
+        self.assertFalse(report.changed)
+        self.assertEqual(report.written, ())
+        self.assertEqual(self.simulator.requests["StartTaskTransaction"], 1)
+
+        # The caller's own read of the schedule is used instead of reading it
+        tasks = await self.mower.get_tasks()
+        requests = self.simulator.requests["GetTask"]
+        report = await self.mower.set_tasks([monday, sunday], current=tasks)
+        self.assertFalse(report.changed)
+        self.assertEqual(self.simulator.requests["GetTask"], requests)
+        self.assertEqual(self.simulator.requests["StartTaskTransaction"], 1)
+
+        monday.duration_in_minutes = 90
+        report = await self.mower.set_tasks([monday, sunday])
+        self.assertTrue(report.changed)
+        self.assertEqual((report.added, report.removed), (1, 1))
+        self.assertEqual(self.simulator.tasks[0]["duration"], 90 * 60)
+
+        report = await self.mower.set_tasks([monday, sunday], force=True)
+        self.assertTrue(report.changed)
+        self.assertEqual(self.simulator.requests["StartTaskTransaction"], 3)
+
+    async def test_unchanged_tasks_resume_parked_mower(self):
+        task = TaskInformation(600, 120, True, False, False, False, False, False, False)
+        await self.mower.set_tasks([task])
+        await self.mower.mower_park_permanently()
+        self.assertTrue(await self.mower.mower_is_permanently_parked())
+
+        report = await self.mower.set_tasks([task])
+
+        self.assertFalse(report.changed)
+        self.assertTrue(report.resumed)
+        self.assertFalse(await self.mower.mower_is_permanently_parked())
+        self.assertEqual(self.simulator.requests["StartTaskTransaction"], 1)
+
+    async def test_settings_are_remembered(self):
+        await self.mower.command("SetCuttingHeight", height=5)
+
+        self.assertEqual(await self.mower.command("GetCuttingHeight"), 5)
+
+    async def test_fragmented_slow_notifications(self):
+        self.simulator.latency = 0.001
+        self.simulator.fragment_size = 3
+
+        statistics = await self.mower.command("GetAllStatistics")
+
+        self.assertEqual(statistics["numberOfCollisions"], 0)
+
+
+TASK = {
+    "start": 36000,
+    "duration": 3600,
+    "useOnMonday": True,
+    "useOnTuesday": False,
+    "useOnWednesday": False,
+    "useOnThursday": False,
+    "useOnFriday": False,
+    "useOnSaturday": False,
+    "useOnSunday": False,
+}
+
+
+@patch.dict("automower_ble.mower.TASK_ID_BASES", clear=True)
+class TestSimulatorTasks(unittest.IsolatedAsyncioTestCase):
+    async def connect(self, simulator: SimulatedMower) -> Mower:
+        mower = Mower(0x13A51453, simulator.address)
+        simulator.attach(mower)
+        await mower.connect(simulator.device)
+        self.addAsyncCleanup(mower.disconnect)
+        return mower
+
+    async def test_task_id_base_is_remembered(self):
+        tasks = [dict(TASK, start=i * 3600) for i in range(5)]
+        simulator = SimulatedMower(tasks=tasks, task_id_base=1)
+        mower = await self.connect(simulator)
+
+        first = await mower.get_tasks()
+        self.assertEqual(
+            [t.start_time_in_minutes for t in first], [0, 60, 120, 180, 240]
+        )
+        # Task 0 is tried once to find the first task ID
+        self.assertEqual(simulator.requests["GetTask"], 6)
+        self.assertEqual(mower.task_id_base, 1)
+
+        self.assertEqual(len(await mower.get_tasks()), 5)
+        self.assertEqual(simulator.requests["GetTask"], 11)
+
+        self.assertEqual(TASK_ID_BASES, {"Automower 315": 1})
+
+        # Other mowers of the same model start with the known first task ID,
+        # whatever name they advertise
+        other = SimulatedMower(name="Front lawn", tasks=tasks, task_id_base=1)
+        self.assertEqual(len(await (await self.connect(other)).get_tasks()), 5)
+        self.assertEqual(other.requests["GetTask"], 5)
+
+        # A different model with the same name has to find it again
+        other = SimulatedMower(
+            device_type=7, device_variant=1, tasks=tasks, task_id_base=1
+        )
+        self.assertEqual(len(await (await self.connect(other)).get_tasks()), 5)
+        self.assertEqual(other.requests["GetTask"], 6)
+
+    async def test_wrong_task_id_base_is_corrected(self):
+        simulator = SimulatedMower(tasks=[TASK, TASK])
+        mower = await self.connect(simulator)
+        mower.task_id_base = 1
+
+        self.assertEqual(len(await mower.get_tasks()), 2)
+        self.assertEqual(mower.task_id_base, 0)
+
+    async def test_iter_tasks(self):
+        tasks = [dict(TASK, start=i * 3600) for i in range(3)]
+        for task_id_base in (0, 1):
+            simulator = SimulatedMower(
+                tasks=tasks, task_id_base=task_id_base, latency=0.001
+            )
+            mower = await self.connect(simulator)
+
+            starts = [task.start_time_in_minutes async for task in mower.iter_tasks()]
+
+            self.assertEqual(starts, [0, 60, 120])
+            self.assertEqual(mower.task_id_base, task_id_base)
+
+
+class TestSimulatorConnect(unittest.IsolatedAsyncioTestCase):
+    async def test_invalid_pin(self):
+        simulator = SimulatedMower(pin=1234)
+        mower = Mower(0x13A51453, simulator.address, pin=4321)
+        simulator.attach(mower)
+
+        self.assertEqual(
+            await mower.connect(simulator.device), ResponseResult.INVALID_PIN
+        )
+        await mower.disconnect()
+
+    async def test_waits_until_ready(self):
+        simulator = SimulatedMower(ready_after=0.05)
+        mower = Mower(0x13A51453, simulator.address)
+        simulator.attach(mower)
+
+        with patch("automower_ble.protocol.READY_PROBE_TIMEOUT", 0.01):
+            self.assertEqual(await mower.connect(simulator.device), ResponseResult.OK)
+        self.assertGreaterEqual(mower.ready_time, 0.05)
+        self.assertEqual(mower.chunk_size, 20)
+        await mower.disconnect()
+
+    async def test_characteristics_only_read_when_dumped(self):
+        for dump in (False, True):
+            simulator = SimulatedMower()
+            mower = Mower(0x13A51453, simulator.address)
+            mower.dump_characteristics = dump
+            simulator.attach(mower)
+
+            self.assertEqual(await mower.connect(simulator.device), ResponseResult.OK)
+            self.assertEqual(
+                mower.client.reads, [GARDENA_PROTOCOL_DESCRIPTOR_CHAR] if dump else []
+            )
+            await mower.disconnect()
+
+    @patch.dict("automower_ble.mower.KEEP_ALIVE_INTERVALS", clear=True)
+    async def test_keep_alive_interval_of_model(self):
+        KEEP_ALIVE_INTERVALS["Automower 315"] = 5.0
+        for name in ("Simulated Automower", "Front lawn"):
+            simulator = SimulatedMower(name=name)
+            mower = Mower(0x13A51453, simulator.address)
+            simulator.attach(mower)
+
+            self.assertEqual(await mower.connect(simulator.device), ResponseResult.OK)
+            # The model is read later, not on connect
+            self.assertNotIn("GetModel", simulator.requests)
+            self.assertEqual(await mower._load_model(), "Automower 315")
+            self.assertEqual(mower.keep_alive_interval, 5.0)
+            await mower.disconnect()
+
+            # A reconnect uses the model it already read
+            self.assertEqual(await mower.connect(simulator.device), ResponseResult.OK)
+            self.assertEqual(mower.keep_alive_interval, 5.0)
+            self.assertEqual(simulator.requests["GetModel"], 1)
+            await mower.disconnect()
+
+    @patch.dict("automower_ble.mower.READY_TIMES", clear=True)
+    async def test_ready_time_of_model(self):
+        for name, ready_after in (("Simulated Automower", 0.05), ("Front lawn", 0.0)):
+            simulator = SimulatedMower(name=name, ready_after=ready_after)
+            mower = Mower(0x13A51453, simulator.address)
+            simulator.attach(mower)
+
+            with patch("automower_ble.protocol.READY_PROBE_TIMEOUT", 0.01):
+                self.assertEqual(
+                    await mower.connect(simulator.device), ResponseResult.OK
+                )
+            await mower._load_model()
+            await mower.disconnect()
+
+        # Recorded by the model the mower reports, not the advertised name
+        self.assertEqual(list(READY_TIMES), ["Automower 315"])
+        self.assertGreaterEqual(READY_TIMES["Automower 315"], 0.05)
+
+    async def test_slow_channel_setup_answers(self):
+        for pin in (None, 1234):
+            # The setup answer takes two notifications, longer than a probe
+            # waits, so every probe is answered after the next one is sent
+            simulator = SimulatedMower(pin=pin, latency=0.03)
+            mower = Mower(0x13A51453, simulator.address, pin=pin)
+            simulator.attach(mower)
+
+            with patch("automower_ble.protocol.READY_PROBE_TIMEOUT", 0.02):
+                self.assertEqual(
+                    await mower.connect(simulator.device), ResponseResult.OK
+                )
+            self.assertEqual(await mower.battery_level(), 100)
+            self.assertEqual(mower.unmatched_responses, 0)
+            self.assertFalse(mower._expired)
+            await mower.disconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()